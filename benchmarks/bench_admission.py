@@ -0,0 +1,72 @@
+import os
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+
+from pynim.datatypes import Transaction
+from pynim.transaction_pool import TransactionPool
+
+
+def make_transactions(count: int, senders: int) -> list[Transaction]:
+    # fresh objects each round, so every run pays for hashing
+    now = int(time.time())
+    addresses = [i.to_bytes(20, "big") for i in range(senders)]
+    return [
+        Transaction(
+            timestamp=now,
+            hash=None,
+            nonce=i // senders,
+            recipient=b"\x01" * 20,
+            sender=addresses[i % senders],
+            value=10**15 + i,
+            input_data=os.urandom(128),
+            signature=os.urandom(64),
+            gas=21_000,
+            gas_price=1 + i % 100,
+        )
+        for i in range(count)
+    ]
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--transactions", type=int, default=10_000)
+    parser.add_argument("--senders", type=int, default=1_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    pool_size = args.transactions * 2
+
+    transactions = make_transactions(args.transactions, args.senders)
+    pool = TransactionPool(max_size=pool_size)
+    start = time.perf_counter()
+    for transaction in transactions:
+        pool.add(transaction)
+    serial = time.perf_counter() - start
+
+    transactions = make_transactions(args.transactions, args.senders)
+    pool = TransactionPool(max_size=pool_size)
+    start = time.perf_counter()
+    pool.add_batch(transactions)
+    inline = time.perf_counter() - start
+
+    with ProcessPoolExecutor(args.workers) as executor:
+        # warm the workers up so process start-up is not measured
+        list(executor.map(abs, range(args.workers)))
+        transactions = make_transactions(args.transactions, args.senders)
+        pool = TransactionPool(max_size=pool_size)
+        start = time.perf_counter()
+        results = pool.add_batch(transactions, executor)
+        parallel = time.perf_counter() - start
+    admitted = sum(1 for r in results if r is None)
+
+    print(f"{'add() one at a time':<28} {args.transactions / serial:>12.0f} tx/s")
+    print(f"{'add_batch() inline':<28} {args.transactions / inline:>12.0f} tx/s")
+    print(
+        f"{f'add_batch() {args.workers} workers':<28}"
+        f" {args.transactions / parallel:>12.0f} tx/s ({admitted} admitted)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import os
+import random
+import time
+from argparse import ArgumentParser
+
+from pynim.batch import TransactionBatch
+from pynim.datatypes import Transaction
+
+
+def make_transactions(count: int, senders: int) -> list[Transaction]:
+    addresses = [os.urandom(20) for _ in range(senders)]
+    return [
+        Transaction(
+            timestamp=1_700_000_000,
+            hash=None,
+            nonce=i // senders,
+            recipient=os.urandom(20),
+            sender=addresses[i % senders],
+            value=10**15 + i,
+            input_data=None,
+            signature=None,
+            gas=21_000,
+            gas_price=random.randrange(1, 200),
+        )
+        for i in range(count)
+    ]
+
+
+def loop_validate(transactions: list[Transaction]) -> bool:
+    seen_nonces = {}
+    for tx in transactions:
+        if tx.sender in seen_nonces and tx.nonce <= seen_nonces[tx.sender]:
+            return False
+        seen_nonces[tx.sender] = tx.nonce
+    return True
+
+
+def loop_pack(transactions: list[Transaction], gas_limit: int) -> list[Transaction]:
+    # same ordering rule as TransactionBatch.fee_order, done per object
+    by_sender: dict[bytes, list[Transaction]] = {}
+    for tx in transactions:
+        by_sender.setdefault(tx.sender, []).append(tx)
+    ranked = []
+    for queue in by_sender.values():
+        queue.sort(key=lambda t: t.nonce)
+        price = None
+        for tx in queue:
+            price = tx.gas_price if price is None else min(price, tx.gas_price)
+            ranked.append((-price, len(ranked), tx))
+    ranked.sort(key=lambda r: (r[0], r[1]))
+    packed, gas = [], 0
+    for _, _, tx in ranked:
+        if gas + tx.gas > gas_limit:
+            break
+        gas += tx.gas
+        packed.append(tx)
+    return packed
+
+
+def timed(rounds: int, fn) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--transactions", type=int, default=10_000)
+    parser.add_argument("--senders", type=int, default=1_000)
+    parser.add_argument("--gas-limit", type=int, default=30_000_000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    transactions = make_transactions(args.transactions, args.senders)
+    batch = TransactionBatch.from_transactions(transactions)
+
+    def batch_pack() -> TransactionBatch:
+        ordered = batch.take(batch.fee_order())
+        return ordered.head(ordered.gas_prefix(args.gas_limit))
+
+    build = timed(args.rounds, lambda: TransactionBatch.from_transactions(transactions))
+    print(f"{'operation':<24} {'objects ms':>12} {'batch ms':>12}")
+    print(f"{'build batch':<24} {'':>12} {build:>12.2f}")
+    print(
+        f"{'validate nonces':<24} {timed(args.rounds, lambda: loop_validate(transactions)):>12.2f}"
+        f" {timed(args.rounds, batch.nonces_increasing):>12.2f}"
+    )
+    print(
+        f"{'total value':<24} {timed(args.rounds, lambda: sum(t.value for t in transactions)):>12.2f}"
+        f" {timed(args.rounds, batch.total_value):>12.2f}"
+    )
+    print(
+        f"{'fee-order and pack':<24} {timed(args.rounds, lambda: loop_pack(transactions, args.gas_limit)):>12.2f}"
+        f" {timed(args.rounds, batch_pack):>12.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import os
+import pickle
+import time
+from argparse import ArgumentParser
+
+from pynim.datatypes import Block, Header, Transaction
+
+
+def make_block(transactions: int) -> Block:
+    header = Header(
+        timestamp=1_700_000_000,
+        parent_hash=os.urandom(32),
+        number=1_000_000,
+        gas_limit=30_000_000,
+        gas_used=21_000 * transactions,
+        base_fee=7,
+    )
+    return Block(
+        header=header,
+        transactions=[
+            Transaction(
+                timestamp=1_700_000_000 + i,
+                hash=None,
+                nonce=i,
+                recipient=os.urandom(20),
+                sender=os.urandom(20),
+                value=10**18 + i,
+                input_data=os.urandom(64),
+                signature=os.urandom(64),
+                gas=21_000,
+                gas_price=10 + i % 50,
+            )
+            for i in range(transactions)
+        ],
+        cached_hash=None,
+    )
+
+
+def timed(rounds: int, fn) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return rounds / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--transactions", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    block = make_block(args.transactions)
+
+    pickled = pickle.dumps(block.to_dict())
+    encoded = block.serialize()
+
+    pickle_encode = timed(args.rounds, lambda: pickle.dumps(block.to_dict()))
+    pickle_decode = timed(
+        args.rounds, lambda: Block.from_dict(pickle.loads(pickled))
+    )
+    rlp_encode = timed(args.rounds, block.serialize)
+    rlp_decode = timed(args.rounds, lambda: Block.deserialize(encoded))
+
+    rows = [
+        ("codec", "size", "encode/s", "decode/s"),
+        ("pickle", len(pickled), f"{pickle_encode:.1f}", f"{pickle_decode:.1f}"),
+        ("rlp", len(encoded), f"{rlp_encode:.1f}", f"{rlp_decode:.1f}"),
+    ]
+    for codec, size, encode, decode in rows:
+        print(f"{codec:<8} {size:>10} {encode:>12} {decode:>12}")
+    # both decoders leave transaction hashes to be computed on first use
+
+
+if __name__ == "__main__":
+    main()
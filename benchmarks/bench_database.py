@@ -0,0 +1,91 @@
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from pynim.database import NS_BLOCKS, NS_TX_INDEX, Database, DatabaseConfig
+from pynim.datatypes import Block, Header, Transaction
+
+
+def make_blocks(count: int, transactions_per_block: int) -> list[Block]:
+    blocks = []
+    parent_hash = b"\x00" * 32
+    for number in range(count):
+        transactions = []
+        for i in range(transactions_per_block):
+            transaction = Transaction(
+                timestamp=number,
+                hash=None,
+                nonce=i,
+                recipient=b"\x01" * 20,
+                sender=number.to_bytes(20, "big"),
+                value=i,
+                input_data=None,
+                signature=None,
+                gas=21_000,
+                gas_price=1,
+            )
+            transactions.append(transaction)
+        header = Header(
+            timestamp=number,
+            parent_hash=parent_hash,
+            number=number,
+            gas_limit=30_000_000,
+            gas_used=0,
+            base_fee=1,
+        )
+        block = Block(header=header, transactions=transactions, cached_hash=None)
+        parent_hash = block.hash()
+        blocks.append(block)
+    return blocks
+
+
+def write_unbatched(db: Database, blocks: list[Block]) -> None:
+    for block in blocks:
+        h = block.hash()
+        db.write(h, block.serialize(), NS_BLOCKS)
+        for transaction in block.transactions:
+            db.write(transaction.hash, h, NS_TX_INDEX)
+
+
+def write_batched(db: Database, blocks: list[Block]) -> None:
+    for block in blocks:
+        with db.write_batch() as batch:
+            h = block.hash()
+            batch.write(h, block.serialize(), NS_BLOCKS)
+            for transaction in block.transactions:
+                batch.write(transaction.hash, h, NS_TX_INDEX)
+
+
+def run(name: str, config: DatabaseConfig, writer, blocks: list[Block]) -> float:
+    with tempfile.TemporaryDirectory() as d:
+        db = Database(os.path.join(d, "chain.db"), config)
+        start = time.perf_counter()
+        writer(db, blocks)
+        elapsed = time.perf_counter() - start
+        db.close()
+    rate = len(blocks) / elapsed
+    print(f"{name:<32} {rate:>10.1f} blocks/s")
+    return rate
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--blocks", type=int, default=500)
+    parser.add_argument("--transactions", type=int, default=20)
+    args = parser.parse_args()
+
+    blocks = make_blocks(args.blocks, args.transactions)
+
+    before = run(
+        "per-key commit (rollback journal)",
+        DatabaseConfig(journal_mode="DELETE", synchronous="FULL"),
+        write_unbatched,
+        blocks,
+    )
+    after = run("batched commit (WAL)", DatabaseConfig(), write_batched, blocks)
+    print(f"speed-up: {after / before:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import os
+import random
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+
+from pynim.datatypes import Transaction
+from pynim.vm.executor import WorldState, execute_block
+from pynim.vm.opcode import OP_ADD, OP_LOAD, OP_MUL, OP_PUSH, OP_STOP, OP_STORE, OP_SUB
+
+HOT_CONTRACT = b"\xff" * 20
+
+
+def make_code(rng: random.Random, work: int) -> bytes:
+    # reads slot 0, burns through some arithmetic and writes slot 0 back
+    code = [OP_PUSH, 0, OP_LOAD]
+    for _ in range(work):
+        code += [OP_PUSH, rng.randrange(1, 256), rng.choice((OP_ADD, OP_SUB, OP_MUL))]
+    code += [OP_PUSH, 0, OP_STORE, OP_STOP]
+    return bytes(code)
+
+
+def make_block(
+    count: int, conflict_ratio: float, work: int, seed: int
+) -> tuple[WorldState, list[Transaction]]:
+    rng = random.Random(seed)
+    code = make_code(rng, work)
+    state = WorldState(storage={HOT_CONTRACT: {0: 0}})
+    transactions = []
+    for i in range(count):
+        sender = b"\x01" + i.to_bytes(19, "big")
+        # conflicting transactions all call the same contract; the rest each
+        # call a contract of their own
+        if rng.random() < conflict_ratio:
+            recipient = HOT_CONTRACT
+        else:
+            recipient = b"\x02" + i.to_bytes(19, "big")
+            state.storage[recipient] = {0: i}
+        state.balances[sender] = 10**18
+        transactions.append(
+            Transaction(
+                timestamp=0,
+                hash=None,
+                nonce=0,
+                recipient=recipient,
+                sender=sender,
+                value=1,
+                input_data=code,
+                signature=None,
+                gas=work * 8 + 100,
+                gas_price=1,
+            )
+        )
+    return state, transactions
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--transactions", type=int, default=2_000)
+    parser.add_argument("--work", type=int, default=300)
+    parser.add_argument(
+        "--conflict-ratios", type=float, nargs="+", default=[0.0, 0.1, 0.5, 1.0]
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(
+        f"{'conflicts':>9} {'sequential tx/s':>16} {'parallel tx/s':>14} "
+        f"{'re-executed':>12} {'speedup':>8} {'identical':>10}"
+    )
+    with ProcessPoolExecutor(args.workers) as executor:
+        # warm the workers up so process start-up is not measured
+        list(executor.map(abs, range(args.workers)))
+        for ratio in args.conflict_ratios:
+            state, transactions = make_block(
+                args.transactions, ratio, args.work, args.seed
+            )
+            start = time.perf_counter()
+            expected = execute_block(state, transactions)
+            sequential = time.perf_counter() - start
+
+            parallel_state, transactions = make_block(
+                args.transactions, ratio, args.work, args.seed
+            )
+            start = time.perf_counter()
+            result = execute_block(parallel_state, transactions, executor=executor)
+            parallel = time.perf_counter() - start
+
+            identical = (
+                state.balances == parallel_state.balances
+                and state.storage == parallel_state.storage
+                and [(r.success, r.gas_used, r.writes) for r in expected.results]
+                == [(r.success, r.gas_used, r.writes) for r in result.results]
+            )
+            print(
+                f"{ratio:>9.0%} {args.transactions / sequential:>16.0f} "
+                f"{args.transactions / parallel:>14.0f} {result.reexecuted:>12} "
+                f"{sequential / parallel:>7.2f}x {str(identical):>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import os
+import random
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from pynim.database import NS_BLOCKS, Database
+from pynim.flatfile import FlatFileBlockStore
+from pynim.hashes import keccak256
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--blocks", type=int, default=20_000)
+    parser.add_argument("--block-size", type=int, default=16_384)
+    parser.add_argument("--reads", type=int, default=20_000)
+    args = parser.parse_args()
+
+    payload = os.urandom(args.block_size)
+    hashes = [keccak256(i.to_bytes(8, "big")) for i in range(args.blocks)]
+
+    with tempfile.TemporaryDirectory() as d:
+        db = Database(os.path.join(d, "chain.db"))
+        bodies = FlatFileBlockStore(os.path.join(d, "blocks"))
+        with db.write_batch() as batch:
+            for height, h in enumerate(hashes):
+                batch.write(h, payload, NS_BLOCKS)
+                bodies.append(height, h, payload)
+        bodies.flush()
+
+        heights = [random.randrange(args.blocks) for _ in range(args.reads)]
+
+        start = time.perf_counter()
+        for height in heights:
+            db.read(hashes[height], NS_BLOCKS)
+        sqlite_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for height in heights:
+            bodies.get_by_height(height)
+        flat_elapsed = time.perf_counter() - start
+
+        bodies.close()
+        db.close()
+
+    print(f"sqlite blob read   {args.reads / sqlite_elapsed:>12.0f} reads/s")
+    print(f"flat-file mmap     {args.reads / flat_elapsed:>12.0f} reads/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from pynim.datatypes import Transaction
+from pynim.journal import JOURNAL_FILE, TransactionJournal
+from pynim.transaction_pool import TransactionPool
+
+
+def make_transaction(i: int, senders: int) -> Transaction:
+    return Transaction(
+        timestamp=int(time.time()),
+        hash=None,
+        nonce=i // senders,
+        recipient=os.urandom(20),
+        sender=(i % senders).to_bytes(20, "big"),
+        value=10**18 + i,
+        input_data=None,
+        signature=os.urandom(64),
+        gas=21_000,
+        gas_price=10 + i % 50,
+    )
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--transactions", type=int, default=10_000)
+    parser.add_argument("--senders", type=int, default=1_000)
+    parser.add_argument("--removed", type=float, default=0.2)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), JOURNAL_FILE)
+    pool = TransactionPool(
+        max_size=args.transactions, journal=TransactionJournal(path)
+    )
+    transactions = [
+        make_transaction(i, args.senders) for i in range(args.transactions)
+    ]
+
+    start = time.perf_counter()
+    for transaction in transactions:
+        pool.add(transaction)
+    admit = time.perf_counter() - start
+
+    # remove from the tail of each sender's queue so no dependents go with it
+    removed = transactions[len(transactions) - int(len(transactions) * args.removed) :]
+    for transaction in removed:
+        pool.remove(transaction.hash)
+    pool.journal.close()  # type: ignore
+    size = os.path.getsize(path)
+
+    restored_pool = TransactionPool(
+        max_size=args.transactions, journal=TransactionJournal(path)
+    )
+    start = time.perf_counter()
+    restored = restored_pool.restore()
+    restore = time.perf_counter() - start
+
+    print(f"journaled admit {len(transactions) / admit:>12.0f} tx/s")
+    print(f"journal size    {size / 1024:>12.0f} KiB")
+    print(
+        f"restore         {restore * 1000:>12.1f} ms"
+        f"  ({restored} transactions, {restored / restore:.0f} tx/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
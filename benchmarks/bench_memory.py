@@ -0,0 +1,120 @@
+import gc
+import os
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+from pynim.blockstore import BlockCacheConfig, BlockStore
+from pynim.database import Database
+from pynim.datatypes import Block, Header, Transaction
+from pynim.transaction_pool import TransactionPool
+
+
+def make_transaction(i: int, sender: bytes) -> Transaction:
+    return Transaction(
+        timestamp=int(time.time()),
+        hash=None,
+        nonce=i,
+        recipient=os.urandom(20),
+        sender=sender,
+        value=10**18 + i,
+        input_data=None,
+        signature=os.urandom(64),
+        gas=21_000,
+        gas_price=10 + i % 50,
+    )
+
+
+def make_blocks(count: int, transactions_per_block: int) -> list[Block]:
+    blocks = []
+    parent_hash = b"\x00" * 32
+    for number in range(count):
+        sender = number.to_bytes(20, "big")
+        header = Header(
+            timestamp=number,
+            parent_hash=parent_hash,
+            number=number,
+            gas_limit=30_000_000,
+            gas_used=21_000 * transactions_per_block,
+            base_fee=1,
+        )
+        block = Block(
+            header=header,
+            transactions=[
+                make_transaction(i, sender) for i in range(transactions_per_block)
+            ],
+            cached_hash=None,
+        )
+        parent_hash = block.hash()
+        blocks.append(block)
+    return blocks
+
+
+def measure(fn) -> int:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+
+def pool_footprint(transactions: int, senders: int) -> int:
+    # the transactions are built inside the measurement, so the figure covers
+    # the objects, their field values, cached hashes and the pool's indexes
+    def fill() -> TransactionPool:
+        pool = TransactionPool()
+        for i in range(transactions):
+            sender = (i % senders).to_bytes(20, "big")
+            pool.add(make_transaction(i // senders, sender))
+        return pool
+
+    return measure(fill)
+
+
+def block_cache_footprint(blocks: list[Block]) -> int:
+    store = BlockStore(
+        Database(":memory:"),
+        BlockCacheConfig(block_cache_bytes=1 << 40, header_cache_entries=1 << 30),
+    )
+    with store.db.write_batch() as batch:
+        for block in blocks:
+            store.put_block(block, batch)
+    hashes = [block.hash() for block in blocks]
+    store.blocks.clear()
+    store.headers.clear()
+
+    def load() -> None:
+        for h in hashes:
+            store.get_block(h)
+
+    footprint = measure(load)
+    store.db.close()
+    return footprint
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--transactions", type=int, default=10_000)
+    parser.add_argument("--senders", type=int, default=100)
+    parser.add_argument("--blocks", type=int, default=200)
+    parser.add_argument("--transactions-per-block", type=int, default=100)
+    args = parser.parse_args()
+
+    pool_bytes = pool_footprint(args.transactions, args.senders)
+    blocks = make_blocks(args.blocks, args.transactions_per_block)
+    encoded = sum(len(block.serialize()) for block in blocks) / len(blocks)
+    cache_bytes = block_cache_footprint(blocks)
+
+    print(f"pooled transaction {pool_bytes / args.transactions:>12.0f} bytes")
+    print(
+        f"cached block       {cache_bytes / args.blocks:>12.0f} bytes"
+        f"  ({args.transactions_per_block} txs, {encoded:.0f} bytes encoded)"
+    )
+
+
+if __name__ == "__main__":
+    main()
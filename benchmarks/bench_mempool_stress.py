@@ -0,0 +1,128 @@
+import threading
+import time
+from argparse import ArgumentParser
+
+from pynim.datatypes import Transaction
+from pynim.transaction_pool import ShardedTransactionPool, TransactionPool
+
+
+class LockedPool:
+    # the simplest safe option: one lock around a single pool
+    def __init__(self, max_size: int) -> None:
+        self.pool = TransactionPool(max_size)
+        self.lock = threading.Lock()
+
+    def add(self, transaction: Transaction) -> bool:
+        transaction.hash
+        with self.lock:
+            return self.pool.add(transaction)
+
+    def get_pending(self, limit: int) -> list[Transaction]:
+        with self.lock:
+            return self.pool.get_pending(limit)
+
+    def remove_batch(self, tx_hashes: list[bytes]) -> int:
+        with self.lock:
+            return self.pool.remove_batch(tx_hashes)
+
+    def __len__(self) -> int:
+        return len(self.pool)
+
+
+def make_transactions(producer: int, count: int, senders: int) -> list[Transaction]:
+    now = int(time.time())
+    return [
+        Transaction(
+            timestamp=now,
+            hash=None,
+            nonce=i // senders,
+            recipient=b"\x01" * 20,
+            sender=(producer * senders + i % senders).to_bytes(20, "big"),
+            value=1 + i,
+            input_data=None,
+            signature=None,
+            gas=21_000,
+            gas_price=1 + i % 97,
+        )
+        for i in range(count)
+    ]
+
+
+def run(
+    pool,
+    producers: int,
+    per_producer: int,
+    senders: int,
+    block_size: int,
+    block_interval: float,
+):
+    workloads = [make_transactions(p, per_producer, senders) for p in range(producers)]
+    admitted = [0] * producers
+    included = [0]
+    done = threading.Event()
+
+    def produce(index: int) -> None:
+        for transaction in workloads[index]:
+            try:
+                pool.add(transaction)
+                admitted[index] += 1
+            except Exception:
+                pass
+
+    def build_blocks() -> None:
+        # block production drains the pool concurrently with admissions
+        while not done.is_set():
+            pending = pool.get_pending(block_size)
+            included[0] += pool.remove_batch([t.hash for t in pending])
+            time.sleep(block_interval)
+
+    threads = [threading.Thread(target=produce, args=(i,)) for i in range(producers)]
+    builder = threading.Thread(target=build_blocks)
+    start = time.perf_counter()
+    builder.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    builder.join()
+
+    total = sum(admitted)
+    # every admitted transaction is either still pooled or was included
+    assert total == included[0] + len(pool), "pool lost or duplicated entries"
+    return total / elapsed, included[0] / elapsed
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--producers", type=int, default=16)
+    parser.add_argument("--per-producer", type=int, default=5_000)
+    parser.add_argument("--senders", type=int, default=50)
+    parser.add_argument("--block-size", type=int, default=1_000)
+    parser.add_argument("--block-interval", type=float, default=0.05)
+    parser.add_argument("--shards", type=int, default=16)
+    args = parser.parse_args()
+
+    # headroom, so per-shard caps never evict and every admission is accounted for
+    max_size = 2 * args.producers * args.per_producer
+    for name, pool in (
+        ("single lock", LockedPool(max_size)),
+        (f"{args.shards} shards", ShardedTransactionPool(args.shards, max_size)),
+    ):
+        rate, included = run(
+            pool,
+            args.producers,
+            args.per_producer,
+            args.senders,
+            args.block_size,
+            args.block_interval,
+        )
+        print(
+            f"{name:<12} {rate:>10.0f} admitted tx/s"
+            f" {included:>10.0f} included tx/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import os
+import random
+import time
+from argparse import ArgumentParser
+
+from pynim.consensus import ConsensusEngine
+from pynim.hashes import keccak256
+
+
+class LinearEngine:
+    # the previous selection: a full cumulative scan per call and
+    # list.remove on slashing
+    def __init__(
+        self, validator_stakes: dict[bytes, int], validators: list[bytes]
+    ) -> None:
+        self.validator_stakes = validator_stakes
+        self.validators = validators
+        self.current_head = None
+        self.slash_penalty = 10
+
+    def select_proposer(self) -> bytes:
+        total = sum(max(1, self.validator_stakes.get(v, 0)) for v in self.validators)
+        seed = keccak256(
+            self.current_head if self.current_head is not None else b"\x00" * 32
+        )
+        r = int.from_bytes(seed, "big") % total
+        cum = 0
+        for v in self.validators:
+            cum += max(1, self.validator_stakes.get(v, 0))
+            if r < cum:
+                return v
+        return self.validators[0]
+
+    def slash(self, validator: bytes) -> None:
+        stake = self.validator_stakes.get(validator, 0)
+        new_stake = max(0, stake - self.slash_penalty)
+        self.validator_stakes[validator] = new_stake
+        if new_stake == 0 and validator in self.validators:
+            self.validators.remove(validator)
+
+
+def per_call(fn, args: list) -> float:
+    start = time.perf_counter()
+    for arg in args:
+        fn(arg)
+    return (time.perf_counter() - start) / len(args)
+
+
+def run(engine, validators: list[bytes], rounds: int) -> tuple[float, float]:
+    heads = [os.urandom(32) for _ in range(rounds)]
+
+    def select(head: bytes) -> None:
+        engine.current_head = head
+        engine.select_proposer()
+
+    # each slash takes a validator with stake 10 down to zero, the case
+    # that removes it from the set
+    victims = random.sample(validators, min(rounds, len(validators)))
+    return per_call(select, heads), per_call(engine.slash, victims)
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10, 1_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument(
+        "--linear-max",
+        type=int,
+        default=1_000_000,
+        help="skip the linear baseline above this many validators",
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'validators':>10} {'engine':>7} {'build ms':>9} "
+        f"{'select us':>11} {'slash us':>11}"
+    )
+    for size in args.sizes:
+        validators = [i.to_bytes(20, "big") for i in range(size)]
+        # one validator in ten is at the slashing threshold
+        stakes = {
+            v: 10 if i % 10 == 0 else 32 + i % 100 for i, v in enumerate(validators)
+        }
+        at_threshold = validators[::10]
+
+        # the linear baseline is O(n) per call, so it gets fewer rounds
+        linear_rounds = max(1, min(args.rounds, 20_000_000 // max(size, 1)))
+        engines = [("fenwick", ConsensusEngine, args.rounds)]
+        if size <= args.linear_max:
+            engines.append(("linear", None, linear_rounds))
+
+        for name, engine_class, rounds in engines:
+            random.seed(size)
+            start = time.perf_counter()
+            if engine_class is None:
+                engine = LinearEngine(dict(stakes), list(validators))
+            else:
+                engine = engine_class(1, dict(stakes), list(validators), {})
+            build = time.perf_counter() - start
+            select, slash = run(engine, at_threshold, rounds)
+            print(
+                f"{size:>10} {name:>7} {build * 1000:>9.1f} "
+                f"{select * 1e6:>11.1f} {slash * 1e6:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
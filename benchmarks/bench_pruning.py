@@ -0,0 +1,144 @@
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from typing import Optional
+
+from pynim.account import Account
+from pynim.blockchain import Blockchain
+from pynim.chainstore import BLOCKS_DIR, CHAINDATA_DIR, ChainStore
+from pynim.consensus import ConsensusEngine, FinalityConfig
+from pynim.database import DatabaseConfig, open_database
+from pynim.datatypes import Block, Header, Transaction
+from pynim.flatfile import FlatFileBlockStore
+from pynim.genesis import GenesisBlock
+from pynim.vm.machine import Machine
+
+
+def make_transaction(nonce: int, sender: bytes) -> Transaction:
+    return Transaction(
+        timestamp=int(time.time()),
+        hash=None,
+        nonce=nonce,
+        recipient=os.urandom(20),
+        sender=sender,
+        value=10**18,
+        input_data=None,
+        signature=os.urandom(64),
+        gas=21_000,
+        gas_price=10,
+    )
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def run(
+    blocks: int,
+    transactions_per_block: int,
+    fork_every: int,
+    finality: FinalityConfig,
+    segment_size: Optional[int],
+) -> tuple[int, int, int, float]:
+    datadir = tempfile.mkdtemp()
+    db = open_database(
+        os.path.join(datadir, CHAINDATA_DIR), DatabaseConfig(auto_vacuum="INCREMENTAL")
+    )
+    bodies = None
+    if segment_size is not None:
+        # small segments, so that pruning has whole segments to delete
+        bodies = FlatFileBlockStore(os.path.join(datadir, BLOCKS_DIR), segment_size)
+    store = ChainStore(db, bodies=bodies)
+    account = Account(None, {}, public_key=os.urandom(32))
+    genesis = GenesisBlock(int(time.time()), account, transactions=[])
+    consensus = ConsensusEngine(
+        0, {account.address: 10}, [account.address], store, finality=finality
+    )
+
+    gc.collect()
+    tracemalloc.start()
+    chain = Blockchain(
+        "bench", genesis, None, store, store.db, [account], Machine(), consensus
+    )
+    senders = [os.urandom(20) for _ in range(transactions_per_block)]
+    parent: Block = genesis
+    start = time.perf_counter()
+    for i in range(blocks):
+        children = 2 if fork_every and i % fork_every == 0 else 1
+        for child in range(children):
+            header = Header(
+                timestamp=parent.header.timestamp + 1 + child,
+                parent_hash=parent.hash(),
+                number=parent.header.number + 1,
+                gas_limit=30_000_000,
+                gas_used=0,
+                base_fee=1,
+            )
+            block = Block(
+                header=header,
+                transactions=[make_transaction(i, s) for s in senders],
+                cached_hash=None,
+            )
+            chain.add_block(block)
+            if child == 0:
+                head = block
+        parent = head
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    store.close()
+    return directory_size(datadir), memory, len(consensus.block_tree), blocks / elapsed
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--blocks", type=int, default=3_000)
+    parser.add_argument("--transactions-per-block", type=int, default=50)
+    parser.add_argument("--fork-every", type=int, default=10)
+    parser.add_argument("--checkpoint-interval", type=int, default=32)
+    parser.add_argument("--finality-depth", type=int, default=64)
+    parser.add_argument("--prune-epochs", type=int, default=4)
+    parser.add_argument(
+        "--flat-file-segment-kib",
+        type=int,
+        help="keep bodies in flat files with segments of this size",
+    )
+    args = parser.parse_args()
+
+    # "unfinal" never reaches finality, which is how every node ran before
+    # checkpoints existed: the block tree and the store only ever grow
+    modes: list[tuple[str, int, Optional[int]]] = [
+        ("unfinal", args.blocks + 1, None),
+        ("archive", args.finality_depth, None),
+        ("pruned", args.finality_depth, args.prune_epochs),
+    ]
+    print(
+        f"{'mode':>8} {'disk MiB':>9} {'memory MiB':>11} "
+        f"{'tree nodes':>11} {'blocks/s':>9}"
+    )
+    for name, depth, prune_epochs in modes:
+        finality = FinalityConfig(args.checkpoint_interval, depth, prune_epochs)
+        disk, memory, nodes, rate = run(
+            args.blocks,
+            args.transactions_per_block,
+            args.fork_every,
+            finality,
+            args.flat_file_segment_kib * 1024 if args.flat_file_segment_kib else None,
+        )
+        print(
+            f"{name:>8} {disk / 2**20:>9.1f} {memory / 2**20:>11.1f} "
+            f"{nodes:>11} {rate:>9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import copy
+import time
+from argparse import ArgumentParser
+
+from pynim.vm.state import JournaledState, WorldState
+
+CONTRACT = b"\x02" * 20
+
+
+def make_state(slots: int) -> WorldState:
+    return WorldState({CONTRACT: 10**18}, {CONTRACT: {i: i for i in range(slots)}})
+
+
+def failed_transaction_copy(state: WorldState, writes: int) -> None:
+    # what rolling back takes without a journal: copy, write, throw away
+    backup = copy.deepcopy(state.storage)
+    for key in range(writes):
+        state.storage[CONTRACT][key] = 0
+    state.storage = backup
+
+
+def failed_transaction_journal(state: JournaledState, writes: int) -> None:
+    state.checkpoint()
+    for key in range(writes):
+        state.store(CONTRACT, key, 0)
+    state.revert()
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--slots", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--writes", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'slots':>8} {'deep copy us':>13} {'journal us':>11}")
+    for slots in args.slots:
+        state = make_state(slots)
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            failed_transaction_copy(state, args.writes)
+        copied = (time.perf_counter() - start) / args.rounds
+
+        journal = JournaledState(make_state(slots))
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            failed_transaction_journal(journal, args.writes)
+        journaled = (time.perf_counter() - start) / args.rounds
+        print(f"{slots:>8} {copied * 1e6:>13.0f} {journaled * 1e6:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
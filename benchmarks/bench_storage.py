@@ -0,0 +1,67 @@
+import os
+import random
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from pynim.database import (
+    NS_BLOCKS,
+    NS_CANONICAL,
+    DatabaseConfig,
+    encode_height,
+    open_database,
+)
+from pynim.hashes import keccak256
+
+
+def bench_engine(engine: str, blocks: int, block_size: int, batch_size: int) -> None:
+    payload = os.urandom(block_size)
+    hashes = [keccak256(encode_height(i)) for i in range(blocks)]
+
+    with tempfile.TemporaryDirectory() as d:
+        db = open_database(os.path.join(d, "chain"), DatabaseConfig(engine=engine))
+
+        start = time.perf_counter()
+        for offset in range(0, blocks, batch_size):
+            with db.write_batch() as batch:
+                for height in range(offset, min(offset + batch_size, blocks)):
+                    batch.write(hashes[height], payload, NS_BLOCKS)
+                    batch.write(encode_height(height), hashes[height], NS_CANONICAL)
+        write_elapsed = time.perf_counter() - start
+
+        sample = random.sample(hashes, min(len(hashes), 10_000))
+        start = time.perf_counter()
+        for h in sample:
+            db.read(h, NS_BLOCKS)
+        read_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        walked = sum(1 for _ in db.iterate(NS_CANONICAL))
+        iterate_elapsed = time.perf_counter() - start
+
+        db.close()
+
+    print(
+        f"{engine:<8} "
+        f"write {blocks / write_elapsed:>10.0f} blocks/s  "
+        f"read {len(sample) / read_elapsed:>10.0f} reads/s  "
+        f"iterate {walked / iterate_elapsed:>10.0f} keys/s"
+    )
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--blocks", type=int, default=50_000)
+    parser.add_argument("--block-size", type=int, default=2_048)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument(
+        "--engine", action="append", choices=["sqlite", "leveldb"], default=None
+    )
+    args = parser.parse_args()
+
+    for engine in args.engine or ["sqlite", "leveldb"]:
+        bench_engine(engine, args.blocks, args.block_size, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
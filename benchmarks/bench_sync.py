@@ -0,0 +1,124 @@
+import os
+import socket
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from pynim.account import Account
+from pynim.blockchain import Blockchain
+from pynim.chainstore import ChainStore
+from pynim.consensus import ConsensusEngine
+from pynim.datatypes import Block, Header, Transaction
+from pynim.genesis import GenesisBlock
+from pynim.net.node import Node
+from pynim.net.peer import Peer
+from pynim.net.sync import SyncConfig
+from pynim.vm.machine import Machine
+
+GENESIS_TIME = 1_700_000_000
+
+
+def make_transaction(nonce: int, sender: bytes) -> Transaction:
+    return Transaction(
+        timestamp=GENESIS_TIME,
+        hash=None,
+        nonce=nonce,
+        recipient=os.urandom(20),
+        sender=sender,
+        value=10**18,
+        input_data=None,
+        signature=os.urandom(64),
+        gas=21_000,
+        gas_price=10,
+    )
+
+
+def build_source(
+    datadir: str, genesis: GenesisBlock, blocks: int, transactions_per_block: int
+) -> bytes:
+    store = ChainStore.open(datadir)
+    senders = [os.urandom(20) for _ in range(transactions_per_block)]
+    parent: Block = genesis
+    batch_size = 500
+    for start in range(0, blocks, batch_size):
+        with store.db.write_batch() as batch:
+            for i in range(start, min(start + batch_size, blocks)):
+                header = Header(
+                    timestamp=parent.header.timestamp + 1,
+                    parent_hash=parent.hash(),
+                    number=parent.header.number + 1,
+                    gas_limit=30_000_000,
+                    gas_used=0,
+                    base_fee=1,
+                )
+                parent = Block(
+                    header=header,
+                    transactions=[make_transaction(i, s) for s in senders],
+                    cached_hash=None,
+                )
+                store.put_block(parent, batch)
+            store.set_head(parent.hash(), batch)
+        store.blocks.clear()
+    store.close()
+    return parent.hash()
+
+
+def wait_listening(port: int) -> None:
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"node on port {port} never started listening")
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--blocks", type=int, default=10_000)
+    parser.add_argument("--transactions-per-block", type=int, default=10)
+    parser.add_argument("--peers", type=int, nargs="+", default=[1, 3])
+    parser.add_argument("--base-port", type=int, default=47_100)
+    parser.add_argument("--max-in-flight", type=int, default=16)
+    parser.add_argument("--commit-batch", type=int, default=256)
+    args = parser.parse_args()
+
+    account = Account(None, {}, public_key=b"\x01" * 32)
+    genesis = GenesisBlock(GENESIS_TIME, account, transactions=[])
+
+    source = tempfile.mkdtemp()
+    start = time.perf_counter()
+    head = build_source(source, genesis, args.blocks, args.transactions_per_block)
+    print(f"built {args.blocks} blocks in {time.perf_counter() - start:.1f} s")
+
+    # every serving node reads the same chain through its own store
+    servers = []
+    for i in range(max(args.peers)):
+        node = Node("127.0.0.1", args.base_port + i, ChainStore.open(source))
+        node.start()
+        wait_listening(node.port)
+        servers.append(node)
+
+    config = SyncConfig(
+        max_in_flight=args.max_in_flight, commit_batch=args.commit_batch
+    )
+    for peers in args.peers:
+        store = ChainStore.open(tempfile.mkdtemp())
+        consensus = ConsensusEngine(0, {account.address: 1}, [account.address], store)
+        chain = Blockchain(
+            "bench", genesis, None, store, store.db, [account], Machine(), consensus
+        )
+        client = Node("127.0.0.1", 0)
+        client.peers = [Peer("127.0.0.1", node.port) for node in servers[:peers]]
+
+        stats = client.sync(chain, config)
+        synced = chain.current_block.hash() == head
+        print(
+            f"{peers} peer(s): {stats.blocks} blocks in {stats.seconds:.2f} s, "
+            f"{stats.blocks_per_second:.0f} blocks/s (head matches: {synced})"
+        )
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
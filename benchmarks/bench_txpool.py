@@ -0,0 +1,172 @@
+import random
+import time
+from argparse import ArgumentParser
+from typing import Optional
+
+from pynim.datatypes import Transaction
+from pynim.transaction_pool import SenderQueue, TransactionPool
+
+
+class ListQueue:
+    # the previous layout: a list re-sorted on every insert and scanned or
+    # rebuilt for every lookup and removal
+    def __init__(self) -> None:
+        self.transactions: list[Transaction] = []
+
+    def get(self, nonce: int) -> Optional[Transaction]:
+        for transaction in self.transactions:
+            if transaction.nonce == nonce:
+                return transaction
+        return None
+
+    def put(self, transaction: Transaction) -> None:
+        existing = self.get(transaction.nonce)
+        if existing is not None:
+            self.remove(existing.nonce)
+        self.transactions.append(transaction)
+        self.transactions.sort(key=lambda t: t.nonce)
+
+    def remove(self, nonce: int) -> None:
+        self.transactions = [t for t in self.transactions if t.nonce != nonce]
+
+    def executable(self, nonce: int) -> list[Transaction]:
+        pending = []
+        for transaction in self.transactions:
+            if transaction.nonce == nonce:
+                pending.append(transaction)
+                nonce += 1
+            elif transaction.nonce > nonce:
+                break
+        return pending
+
+
+def sorted_pending(
+    pool: TransactionPool, limit: int, account_nonces: dict[bytes, int]
+) -> list[Transaction]:
+    # the previous get_pending: collect every executable run, then sort all
+    pending = []
+    for sender, transactions in pool.transactions_by_sender.items():
+        pending.extend(transactions.executable(account_nonces.get(sender, 0)))
+    pending.sort(key=lambda t: (t.gas_price, t.value), reverse=True)
+    return pending[:limit]
+
+
+def bench_pending(senders: int, nonces: int, limit: int, rounds: int) -> None:
+    pool = TransactionPool()
+    for s in range(senders):
+        sender = s.to_bytes(20, "big")
+        for nonce in range(nonces):
+            pool.add(
+                Transaction(
+                    timestamp=int(time.time()),
+                    hash=None,
+                    nonce=nonce,
+                    recipient=b"\x01" * 20,
+                    sender=sender,
+                    value=random.randrange(1, 10**18),
+                    input_data=None,
+                    signature=None,
+                    gas=21_000,
+                    gas_price=random.randrange(1, 500),
+                )
+            )
+    account_nonces = {s.to_bytes(20, "big"): 0 for s in range(senders)}
+
+    timings = {}
+    for name, fn in (
+        ("full sort", lambda: sorted_pending(pool, limit, account_nonces)),
+        ("priority index", lambda: pool.get_pending(limit, account_nonces)),
+    ):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        timings[name] = (time.perf_counter() - start) / rounds * 1000
+
+    print(f"get_pending(limit={limit}) over {len(pool)} pooled transactions (ms)")
+    for name, elapsed in timings.items():
+        print(f"{name:<16} {elapsed:>10.3f}")
+
+
+def make_transactions(nonces: int) -> list[Transaction]:
+    # shared across senders: the queues only look at the nonce
+    return [
+        Transaction(
+            timestamp=0,
+            hash=None,
+            nonce=nonce,
+            recipient=b"\x01" * 20,
+            sender=b"\x02" * 20,
+            value=1,
+            input_data=None,
+            signature=None,
+            gas=21_000,
+            gas_price=1,
+        )
+        for nonce in range(nonces)
+    ]
+
+
+def run(queue_type, senders: int, transactions: list[Transaction]) -> dict[str, float]:
+    shuffled = transactions[:]
+    timings = {"insert": 0.0, "replace": 0.0, "executable": 0.0, "remove": 0.0}
+    for _ in range(senders):
+        random.shuffle(shuffled)
+        queue = queue_type()
+
+        start = time.perf_counter()
+        for transaction in shuffled:
+            queue.put(transaction)
+        timings["insert"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        for transaction in shuffled[:16]:
+            queue.put(transaction)
+        timings["replace"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(16):
+            for _ in queue.executable(0):
+                pass
+        timings["executable"] += time.perf_counter() - start
+
+        # block inclusion drains each sender from its lowest nonce
+        start = time.perf_counter()
+        for transaction in transactions:
+            queue.remove(transaction.nonce)
+        timings["remove"] += time.perf_counter() - start
+
+    counts = {
+        "insert": senders * len(transactions),
+        "replace": senders * 16,
+        "executable": senders * 16,
+        "remove": senders * len(transactions),
+    }
+    return {op: timings[op] / counts[op] * 1e6 for op in timings}
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--senders", type=int, default=10_000)
+    parser.add_argument("--nonces", type=int, default=1_000)
+    # the old layout is quadratic per sender, so it only runs on a sample
+    parser.add_argument("--baseline-senders", type=int, default=20)
+    parser.add_argument("--pool-senders", type=int, default=2_500)
+    parser.add_argument("--pool-nonces", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=1_000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    transactions = make_transactions(args.nonces)
+    queued = run(SenderQueue, args.senders, transactions)
+    listed = run(ListQueue, min(args.baseline_senders, args.senders), transactions)
+
+    print(f"{args.senders} senders x {args.nonces} nonces (us per operation)")
+    print(f"{'operation':<12} {'sorted list':>12} {'nonce queue':>12}")
+    for op in queued:
+        print(f"{op:<12} {listed[op]:>12.2f} {queued[op]:>12.2f}")
+    print()
+    bench_pending(args.pool_senders, args.pool_nonces, args.limit, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import random
+import time
+from argparse import ArgumentParser
+
+from pynim.vm.machine import Machine
+from pynim.vm.opcode import (
+    OP_ADD,
+    OP_BASEFEE,
+    OP_DIV,
+    OP_LOAD,
+    OP_MOD,
+    OP_MUL,
+    OP_NUMBER,
+    OP_PUSH,
+    OP_SELFBALANCE,
+    OP_STOP,
+    OP_STORE,
+    OP_SUB,
+    OP_TIMESTAMP,
+)
+from pynim.vm.tracer import Tracer
+
+
+def arithmetic(rng: random.Random, blocks: int) -> bytes:
+    code = [OP_PUSH, 1]
+    for _ in range(blocks):
+        op = rng.choice((OP_ADD, OP_SUB, OP_MUL, OP_DIV, OP_MOD))
+        code += [OP_PUSH, rng.randrange(1, 256), op]
+    return bytes(code + [OP_STOP])
+
+
+def storage(rng: random.Random, blocks: int) -> bytes:
+    # STORE and LOAD come last in the interpreter's chain of comparisons
+    code = []
+    for _ in range(blocks):
+        key = rng.randrange(64)
+        code += [OP_PUSH, rng.randrange(256), OP_PUSH, key, OP_STORE]
+        code += [OP_PUSH, key, OP_LOAD, OP_PUSH, key, OP_STORE]
+    return bytes(code + [OP_STOP])
+
+
+def environment(rng: random.Random, blocks: int) -> bytes:
+    code = []
+    for _ in range(blocks):
+        code += [OP_TIMESTAMP, OP_NUMBER, OP_ADD, OP_BASEFEE, OP_SELFBALANCE]
+        code += [OP_ADD, OP_ADD, OP_PUSH, rng.randrange(64), OP_STORE]
+    return bytes(code + [OP_STOP])
+
+
+def count_instructions(code: bytes) -> int:
+    machine = Machine(predecode=False)
+    machine.load(code, 10**12)
+    count = 0
+    while not machine.stopped and machine.pc < len(machine.code):
+        machine.step()
+        count += 1
+    return count
+
+
+def measure(code: bytes, runs: int, predecode: bool, traced: bool = False) -> float:
+    machine = Machine(predecode=predecode)
+    if traced:
+        machine.tracer = Tracer()
+    start = time.perf_counter()
+    for _ in range(runs):
+        machine.load(code, 10**12)
+        machine.stack.clear()
+        machine.run()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--blocks", type=int, default=2_000)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    workloads = {
+        "arithmetic": arithmetic(rng, args.blocks),
+        "storage": storage(rng, args.blocks),
+        "environment": environment(rng, args.blocks),
+    }
+    print(
+        f"{'workload':>12} {'interpreter Mop/s':>18} "
+        f"{'predecoded Mop/s':>17} {'speedup':>8} {'traced Mop/s':>13}"
+    )
+    for name, code in workloads.items():
+        ops = count_instructions(code) * args.runs
+        interpreted = measure(code, args.runs, predecode=False)
+        # the first run decodes; every later one hits the program cache
+        predecoded = measure(code, args.runs, predecode=True)
+        traced = measure(code, args.runs, predecode=True, traced=True)
+        print(
+            f"{name:>12} {ops / interpreted / 1e6:>18.2f} "
+            f"{ops / predecoded / 1e6:>17.2f} {interpreted / predecoded:>7.2f}x "
+            f"{ops / traced / 1e6:>13.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
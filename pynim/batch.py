@@ -0,0 +1,184 @@
+from operator import attrgetter
+from typing import Iterable, Optional, Sequence, Union
+
+import numpy as np
+
+from pynim.datatypes import Transaction
+from pynim.views import TransactionView
+
+AnyTransaction = Union[Transaction, TransactionView]
+
+_timestamps = attrgetter("timestamp")
+_nonces = attrgetter("nonce")
+_values = attrgetter("value")
+_gas = attrgetter("gas")
+_gas_prices = attrgetter("gas_price")
+_senders = attrgetter("sender")
+_recipients = attrgetter("recipient")
+
+
+def _int_column(values: list[int]) -> np.ndarray:
+    # wei amounts can exceed 64 bits, in which case the column falls back to
+    # python ints so totals stay exact
+    try:
+        return np.array(values, dtype=np.uint64)
+    except OverflowError:
+        return np.array(values, dtype=object)
+
+
+def _bytes_column(values: list[bytes]) -> np.ndarray:
+    width = max((len(v) for v in values), default=0)
+    return np.array(values, dtype=f"V{max(width, 1)}")
+
+
+def _exact_sum(column: np.ndarray) -> int:
+    if column.dtype == object:
+        return int(column.sum())
+    # uint64 sums wrap silently, so split off the high bits before adding
+    high = int((column >> np.uint64(32)).sum()) << 32
+    return high + int((column & np.uint64(0xFFFFFFFF)).sum())
+
+
+def _running_min_by_group(values: np.ndarray, group: np.ndarray) -> np.ndarray:
+    # values must already be ordered by group; offsetting each group keeps a
+    # single running maximum from leaking across group boundaries
+    if (
+        values.dtype != object
+        and int(values.max()) < 2**32
+        and int(group[-1]) < 2**30
+    ):
+        span = np.int64(2**32)
+        keyed = group * span + (span - 1 - values.astype(np.int64))
+        return (span - 1) - (np.maximum.accumulate(keyed) - group * span)
+
+    ranked = np.array(values, dtype=object)
+    bounds = np.flatnonzero(np.r_[True, group[1:] != group[:-1], True]).tolist()
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        ranked[start:end] = np.minimum.accumulate(values[start:end])
+    return ranked
+
+
+class TransactionBatch:
+    def __init__(
+        self,
+        timestamps: np.ndarray,
+        nonces: np.ndarray,
+        values: np.ndarray,
+        gas: np.ndarray,
+        gas_prices: np.ndarray,
+        senders: np.ndarray,
+        recipients: np.ndarray,
+        sender_ids: np.ndarray,
+        transactions: Optional[Sequence[AnyTransaction]] = None,
+    ) -> None:
+        self.timestamps = timestamps
+        self.nonces = nonces
+        self.values = values
+        self.gas = gas
+        self.gas_prices = gas_prices
+        self.senders = senders
+        self.recipients = recipients
+        self.sender_ids = sender_ids
+        self.transactions = transactions
+
+    @classmethod
+    def from_transactions(
+        cls, transactions: Iterable[AnyTransaction]
+    ) -> "TransactionBatch":
+        transactions = list(transactions)
+        senders = list(map(_senders, transactions))
+
+        # senders are numbered in order of first appearance, which keeps
+        # grouping exact for addresses of any length
+        ids: dict[bytes, int] = {}
+        sender_ids = [ids.setdefault(s, len(ids)) for s in senders]
+
+        return cls(
+            timestamps=_int_column(list(map(_timestamps, transactions))),
+            nonces=_int_column(list(map(_nonces, transactions))),
+            values=_int_column(list(map(_values, transactions))),
+            gas=_int_column(list(map(_gas, transactions))),
+            gas_prices=_int_column(list(map(_gas_prices, transactions))),
+            senders=_bytes_column(senders),
+            recipients=_bytes_column(list(map(_recipients, transactions))),
+            sender_ids=np.array(sender_ids, dtype=np.int64),
+            transactions=transactions,
+        )
+
+    def __len__(self) -> int:
+        return len(self.nonces)
+
+    def take(self, indices: np.ndarray) -> "TransactionBatch":
+        transactions = None
+        if self.transactions is not None:
+            transactions = [self.transactions[i] for i in indices.tolist()]
+        return TransactionBatch(
+            timestamps=self.timestamps[indices],
+            nonces=self.nonces[indices],
+            values=self.values[indices],
+            gas=self.gas[indices],
+            gas_prices=self.gas_prices[indices],
+            senders=self.senders[indices],
+            recipients=self.recipients[indices],
+            sender_ids=self.sender_ids[indices],
+            transactions=transactions,
+        )
+
+    def head(self, count: int) -> "TransactionBatch":
+        return self.take(np.arange(min(count, len(self))))
+
+    def total_value(self) -> int:
+        return _exact_sum(self.values)
+
+    def total_gas(self) -> int:
+        return _exact_sum(self.gas)
+
+    def fees(self) -> np.ndarray:
+        if self.gas.dtype == object or self.gas_prices.dtype == object:
+            return self.gas.astype(object) * self.gas_prices.astype(object)
+        # gas * gas_price only overflows 64 bits for absurd prices
+        if len(self) and int(self.gas.max()) * int(self.gas_prices.max()) >= 2**64:
+            return self.gas.astype(object) * self.gas_prices.astype(object)
+        return self.gas * self.gas_prices
+
+    def total_fees(self) -> int:
+        return _exact_sum(self.fees())
+
+    def nonces_increasing(self) -> bool:
+        # stable sort by sender keeps each sender's transactions in list
+        # order, so every adjacent pair of the same sender must step up
+        if len(self) < 2:
+            return True
+        order = np.argsort(self.sender_ids, kind="stable")
+        senders = self.sender_ids[order]
+        nonces = self.nonces[order]
+        same_sender = senders[1:] == senders[:-1]
+        return bool(np.all(nonces[1:][same_sender] > nonces[:-1][same_sender]))
+
+    def fee_order(self) -> np.ndarray:
+        # highest gas price first, without ever placing a transaction ahead
+        # of a lower nonce from the same sender: each one is ranked at the
+        # lowest price among its sender's earlier nonces
+        n = len(self)
+        if n == 0:
+            return np.arange(0)
+        by_sender = np.lexsort((self.nonces, self.sender_ids))
+        senders = self.sender_ids[by_sender]
+        prices = self.gas_prices[by_sender]
+        group = np.cumsum(np.r_[False, senders[1:] != senders[:-1]])
+        ranked = _running_min_by_group(prices, group)
+        order = np.lexsort((np.arange(n), -ranked))
+        return by_sender[order]
+
+    def gas_prefix(self, gas_limit: int) -> int:
+        # number of leading transactions whose cumulative gas fits the limit
+        if self.gas.dtype == object:
+            cumulative = np.cumsum(self.gas)
+        else:
+            cumulative = np.cumsum(self.gas, dtype=np.uint64)
+        return int(np.searchsorted(cumulative, gas_limit, side="right"))
+
+    def to_transactions(self) -> list[AnyTransaction]:
+        if self.transactions is None:
+            raise ValueError("batch was built without transaction objects")
+        return list(self.transactions)
@@ -1,13 +1,21 @@
+import multiprocessing
+import threading
+from collections.abc import MutableMapping
+from concurrent.futures import ProcessPoolExecutor
+
 from pynim.account import Account
+from pynim.batch import TransactionBatch
+from pynim.blockstore import BlockStore, delete_block, reindex_head, write_block
+from pynim.blocktree import HeadChange
+from pynim.chainstore import HEAD_KEY, ChainStore
 from pynim.consensus import ConsensusEngine
-from pynim.database import Database
+from pynim.database import NS_METADATA, BaseDatabase, WriteBatch
 from pynim.datatypes import Block, Header, Transaction
 from pynim.genesis import GenesisBlock
 from pynim.vm.machine import Machine
-from pynim.hashes import keccak256
-from pynim.transaction_pool import TransactionPool
+from pynim.transaction_pool import ShardedTransactionPool, TransactionPool
 import time
-from typing import Optional
+from typing import Optional, Sequence, Union
 
 
 class Blockchain:
@@ -16,13 +24,36 @@ class Blockchain:
             chain_id: str,
             genesis_block: GenesisBlock,
             current_block: Optional[Block],
-            block_by_hash: dict[bytes, Block],
-            disk: Database,
+            block_by_hash: MutableMapping[bytes, Block],
+            disk: BaseDatabase,
             accounts: list[Account],
             machine: Machine,
             consensus: ConsensusEngine,
-            transaction_pool: Optional[TransactionPool] = None,
+            transaction_pool: Optional[
+                Union[TransactionPool, ShardedTransactionPool]
+            ] = None,
     ) -> None:
+        if current_block is None and isinstance(block_by_hash, ChainStore):
+            # resume from the persisted head instead of replaying history
+            current_block = block_by_hash.head_block()
+            if current_block is not None:
+                consensus.current_head = block_by_hash.head_hash
+                # genesis hashes its whole encoding, which a decoded Block
+                # does not, so the chain keeps the genesis it was given
+                if block_by_hash.head_hash == genesis_block.hash():
+                    current_block = genesis_block
+            else:
+                # a new store starts with genesis as its first canonical
+                # block, so it resolves by hash and number like any other
+                with block_by_hash.db.write_batch() as batch:
+                    block_by_hash.put_block(genesis_block, batch)
+                    block_by_hash.set_head(genesis_block.hash(), batch)
+            finalized = block_by_hash.finalized_hash
+            header = block_by_hash.get_header(finalized) if finalized else None
+            if header is not None and consensus.finalized_hash is None:
+                consensus.finalized_hash = finalized
+                consensus.finalized_number = header.number
+
         self.chain_id = chain_id
         self.genesis_block = genesis_block
         self.current_block = current_block or genesis_block
@@ -32,6 +63,26 @@ class Blockchain:
         self.machine = machine
         self.consensus = consensus
         self.transaction_pool = transaction_pool or TransactionPool()
+        # held while the store is written, so that a node serving the same
+        # store to peers never reads it mid-update
+        self.lock = (
+            block_by_hash.lock
+            if isinstance(block_by_hash, BlockStore)
+            else threading.RLock()
+        )
+        if consensus.block_tree.root is None:
+            # the tree starts at the head; older history is reached through
+            # the store's canonical index
+            consensus.block_tree.set_root(
+                self.current_block.hash(), self.current_block.header
+            )
+        # created before the node starts its network and sync threads, and
+        # spawned rather than forked: a forked worker could inherit a lock
+        # that one of those threads held. Workers start on the first large
+        # add_batch.
+        self._validation_executor: Optional[ProcessPoolExecutor] = (
+            ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+        )
 
     def generate_new_block(self, gas_limit: int = 30_000_000, base_fee: int = 1) -> Block:
         parent_hash = self.current_block.hash() if self.current_block else None
@@ -40,7 +91,13 @@ class Blockchain:
         account_nonces = {acc.address: acc.nonce for acc in self.accounts}
         pending_transactions = self.transaction_pool.get_pending(limit=1000, account_nonces=account_nonces)
 
-        gas_used = sum(transaction.value for transaction in pending_transactions)
+        # pack by gas price, keeping per-sender nonce order, up to the gas limit
+        batch = TransactionBatch.from_transactions(pending_transactions)
+        batch = batch.take(batch.fee_order())
+        batch = batch.head(batch.gas_prefix(gas_limit))
+        pending_transactions = batch.to_transactions()
+
+        gas_used = batch.total_value()
         timestamp = int(time.time())
         number = 0 if parent_hash is None else self.current_block.header.number + 1
 
@@ -53,36 +110,157 @@ class Blockchain:
             base_fee=base_fee,
         )
 
-        block_hash = keccak256(header.serialize())
+        block_hash = header.hash()
         block = Block(
             header=header,
             transactions=pending_transactions,
             cached_hash=block_hash
         )
 
-        self.block_by_hash[block_hash] = block
-        self.current_block = block
-        self.consensus.current_head = block_hash
-
-        self.disk.write(block.hash(), block.serialize())
-
-        transaction_hashes = [transaction.hash for transaction in pending_transactions if transaction.hash]
-        self.transaction_pool.remove_batch(transaction_hashes)
+        self.import_blocks([block], verify=False)
 
         return block
     
     def add_block(self, block: Block) -> bool:
-        if not self.consensus.verify_block(block):
-            return False
-        h = block.hash()
+        return self.import_blocks([block]) == 1
+
+    def import_blocks(self, blocks: Sequence[Block], verify: bool = True) -> int:
+        # imports blocks in order under a single database commit, stopping
+        # at the first invalid one or orphan; returns how many were imported
+        with self.lock:
+            return self._import_blocks(blocks, verify)
+
+    def _import_blocks(self, blocks: Sequence[Block], verify: bool) -> int:
+        tree = self.consensus.block_tree
+        imported = 0
+        reverted: list[Transaction] = []
+        included: list[Transaction] = []
+        # blocks of this batch are not on disk until it commits, and may
+        # already have left the store's cache
+        pending: dict[bytes, Block] = {}
+        new_blocks: list[bytes] = []
+        head = tree.head
+        current_block = self.current_block
+        current_head = self.consensus.current_head
+        store = self.block_by_hash
+        store_head = store.head_hash if isinstance(store, ChainStore) else None
+        try:
+            with self.disk.write_batch() as batch:
+                for block in blocks:
+                    if verify and not self.consensus.verify_block(block):
+                        break
+                    if block.header.parent_hash not in tree:
+                        # orphans are dropped until their parent is known
+                        break
+                    h = self._store_block(block, batch)
+                    pending[h] = block
+                    if h not in tree:
+                        new_blocks.append(h)
+                    change = tree.add(h, block.header)
+                    imported += 1
+                    if change is None:
+                        continue
+                    removed, added = self._write_head_change(change, pending, batch)
+                    reverted.extend(removed)
+                    included.extend(added)
+                    self.current_block = block
+                    self.consensus.current_head = h
+        except BaseException:
+            # nothing reached the disk, so fork choice goes back to match it
+            tree.rollback(new_blocks, head)
+            self.current_block = current_block
+            self.consensus.current_head = current_head
+            if isinstance(store, BlockStore):
+                store.forget(pending)
+            if isinstance(store, ChainStore):
+                store.head_hash = store_head
+            raise
+        if not imported:
+            return 0
+
+        self._evict_included(included)
+        # transactions of blocks that left the canonical chain go back to
+        # the pool unless the new chain includes them too
+        included_hashes = {transaction.hash for transaction in included}
+        for transaction in reverted:
+            if transaction.hash not in included_hashes:
+                self.add_transaction(transaction)
+
+        self._finalize()
+        return imported
+
+    def _finalize(self) -> None:
+        finalized = self.consensus.finalized_hash
+        checkpoint = self.consensus.finalize_block()
+        if checkpoint is None or checkpoint == finalized:
+            return
+
+        abandoned, self.consensus.abandoned = self.consensus.abandoned, []
+        prune_height = self.consensus.prune_height()
+        with self.disk.write_batch() as batch:
+            for block_hash in abandoned:
+                if isinstance(self.block_by_hash, BlockStore):
+                    self.block_by_hash.drop_block(block_hash, batch)
+                else:
+                    delete_block(batch, block_hash)
+                    self.block_by_hash.pop(block_hash, None)
+            if isinstance(self.block_by_hash, ChainStore):
+                self.block_by_hash.set_finalized(checkpoint, batch)
+                if prune_height is not None:
+                    self.block_by_hash.prune_history(prune_height, batch)
+        if prune_height is not None:
+            if isinstance(self.block_by_hash, ChainStore):
+                self.block_by_hash.finish_pruning()
+            self.disk.compact()
+
+    def _write_head_change(
+        self, change: HeadChange, pending: dict[bytes, Block], batch: WriteBatch
+    ) -> tuple[list[Transaction], list[Transaction]]:
+        def load(block_hash: bytes) -> Block:
+            block = pending.get(block_hash)
+            return block if block is not None else self.block_by_hash[block_hash]
+
+        old_header = self.consensus.block_tree.header(change.old_head or b"")
+        old_number = old_header.number if old_header is not None else None
+        if isinstance(self.block_by_hash, BlockStore):
+            removed, added = self.block_by_hash.set_canonical(
+                batch, change, load, old_number
+            )
+        else:
+            removed, added = reindex_head(batch, change, load, old_number)
+        reverted = [transaction for b in removed for transaction in b.transactions]
+        included = [transaction for b in added for transaction in b.transactions]
+        if isinstance(self.block_by_hash, BlockStore):
+            for transaction in reverted:
+                self.block_by_hash.transactions.pop(transaction.hash)
+
+        if isinstance(self.block_by_hash, ChainStore):
+            self.block_by_hash.set_head(change.new_head, batch)
+        else:
+            batch.write(HEAD_KEY, change.new_head, NS_METADATA)
+        return reverted, included
+
+    def _evict_included(self, transactions: list[Transaction]) -> None:
+        self.transaction_pool.remove_batch(
+            [transaction.hash for transaction in transactions]
+        )
+
+        # pooled transactions at or below an included nonce can never execute
+        next_nonces: dict[bytes, int] = {}
+        for transaction in transactions:
+            next_nonces[transaction.sender] = max(
+                next_nonces.get(transaction.sender, 0), transaction.nonce + 1
+            )
+        for sender, nonce in next_nonces.items():
+            self.transaction_pool.advance_nonce(sender, nonce)
+
+    def _store_block(self, block: Block, batch: WriteBatch) -> bytes:
+        # every known block is stored; only a head change indexes it
+        if isinstance(self.block_by_hash, BlockStore):
+            return self.block_by_hash.put_block(block, batch, canonical=False)
+        h = write_block(batch, block, canonical=False)
         self.block_by_hash[h] = block
-        self.current_block = block
-        self.consensus.current_head = h
-        
-        transaction_hashes = [transaction.hash for transaction in block.transactions if transaction.hash]
-        self.transaction_pool.remove_batch(transaction_hashes)
-        
-        return True
+        return h
 
     def add_transaction(self, transaction: Transaction) -> bool:
         try:
@@ -90,16 +268,39 @@ class Blockchain:
         except Exception as e:
             return False
 
+    def add_batch(self, transactions: Sequence[Transaction]) -> list[bool]:
+        results = self.transaction_pool.add_batch(
+            transactions, self._validation_executor
+        )
+        return [error is None for error in results]
+
+    def close(self) -> None:
+        if self._validation_executor is not None:
+            self._validation_executor.shutdown()
+            self._validation_executor = None
+
     def get_pending_transactions(self, limit: Optional[int] = None) -> list[Transaction]:
         account_nonces = {acc.address: acc.nonce for acc in self.accounts}
         return self.transaction_pool.get_pending(limit=limit, account_nonces=account_nonces)
 
     def get_transaction(self, transaction_hash: bytes) -> Optional[Transaction]:
-        return self.transaction_pool.get(transaction_hash)
+        transaction = self.transaction_pool.get(transaction_hash)
+        if transaction is None and isinstance(self.block_by_hash, BlockStore):
+            transaction = self.block_by_hash.get_transaction(transaction_hash)
+        return transaction
 
     def get_block_by_hash(self, block_hash: bytes) -> Optional[Block]:
         return self.block_by_hash.get(block_hash)
 
+    def get_block_by_number(self, number: int) -> Optional[Block]:
+        block_hash = self.consensus.block_tree.canonical_hash(number)
+        if block_hash is None and isinstance(self.block_by_hash, BlockStore):
+            block_hash = self.block_by_hash.get_block_hash(number)
+        return self.block_by_hash.get(block_hash) if block_hash is not None else None
+
+    def common_ancestor(self, a: bytes, b: bytes) -> Optional[bytes]:
+        return self.consensus.block_tree.common_ancestor(a, b)
+
     def get_latest_block(self) -> Block:
         return self.current_block
 
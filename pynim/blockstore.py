@@ -0,0 +1,306 @@
+import threading
+from collections.abc import MutableMapping
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, Optional
+
+from pynim.blocktree import HeadChange
+from pynim.cache import CacheStats, LRUCache
+from pynim.database import (
+    NS_BLOCKS,
+    NS_CANONICAL,
+    NS_HEADERS,
+    NS_TX_INDEX,
+    BaseDatabase,
+    WriteBatch,
+    encode_height,
+)
+from pynim.datatypes import Block, Header, Transaction
+from pynim.flatfile import FlatFileBlockStore
+from pynim.views import BlockView
+
+
+@dataclass
+class BlockCacheConfig:
+    header_cache_entries: int = 8_192
+    block_cache_bytes: int = 64 * 1024 * 1024
+    transaction_cache_entries: int = 65_536
+
+
+def write_block(
+    batch: WriteBatch,
+    block: Block,
+    raw: Optional[bytes] = None,
+    include_body: bool = True,
+    canonical: bool = True,
+) -> bytes:
+    h = block.hash()
+    if include_body:
+        batch.write(h, raw if raw is not None else block.serialize(), NS_BLOCKS)
+    batch.write(h, block.header.serialize(), NS_HEADERS)
+    if canonical:
+        index_block(batch, block, h)
+    return h
+
+
+def index_block(batch: WriteBatch, block: Block, block_hash: bytes) -> None:
+    # height and transaction lookups only ever resolve to canonical blocks
+    batch.write(encode_height(block.header.number), block_hash, NS_CANONICAL)
+    for transaction in block.transactions:
+        if transaction.hash:
+            batch.write(transaction.hash, block_hash, NS_TX_INDEX)
+
+
+def delete_block(batch: WriteBatch, block_hash: bytes) -> None:
+    # for blocks that were never canonical, so there is no index to undo
+    batch.delete(block_hash, NS_BLOCKS)
+    batch.delete(block_hash, NS_HEADERS)
+
+
+def unindex_block(batch: WriteBatch, block: Block) -> None:
+    for transaction in block.transactions:
+        if transaction.hash:
+            batch.delete(transaction.hash, NS_TX_INDEX)
+
+
+def reindex_head(
+    batch: WriteBatch,
+    change: HeadChange,
+    load: Callable[[bytes], Block],
+    old_number: Optional[int],
+) -> tuple[list[Block], list[Block]]:
+    # moves the height and transaction indexes from the blocks leaving the
+    # canonical chain to the ones joining it; returns both sets of blocks
+    removed = [load(block_hash) for block_hash in change.removed]
+    for block in removed:
+        unindex_block(batch, block)
+    added = [load(block_hash) for block_hash in change.added]
+    for block_hash, block in zip(change.added, added):
+        index_block(batch, block, block_hash)
+
+    # a heavier but shorter chain leaves stale heights above its head
+    if old_number is not None:
+        for number in range(added[-1].header.number + 1, old_number + 1):
+            batch.delete(encode_height(number), NS_CANONICAL)
+    return removed, added
+
+
+class BlockStore(MutableMapping):
+    def __init__(
+        self,
+        db: BaseDatabase,
+        config: Optional[BlockCacheConfig] = None,
+        bodies: Optional[FlatFileBlockStore] = None,
+    ) -> None:
+        self.db = db
+        self.config = config or BlockCacheConfig()
+        self.bodies = bodies
+        # the caches and the database connection are not thread-safe; the
+        # chain holds this while it writes and sync serving while it reads
+        self.lock = threading.RLock()
+        self.headers: LRUCache[Header] = LRUCache(
+            max_entries=self.config.header_cache_entries
+        )
+        self.blocks: LRUCache[Block] = LRUCache(
+            max_bytes=self.config.block_cache_bytes
+        )
+        self.transactions: LRUCache[Transaction] = LRUCache(
+            max_entries=self.config.transaction_cache_entries
+        )
+        if bodies is not None:
+            self._recover_bodies()
+
+    def _recover_bodies(self) -> None:
+        # a body is appended to the flat files, and flushed, before the
+        # batch that records its block commits. A crash in between leaves
+        # bodies at the tail that the database never recorded; they are
+        # cut off so the next blocks can take their heights
+        bodies = self.bodies
+        count = len(bodies)  # type: ignore
+        while count > 0:
+            block_hash = bodies.hash_at(bodies.base_height + count - 1)  # type: ignore
+            if self.db.contains(block_hash, NS_HEADERS):  # type: ignore
+                break
+            count -= 1
+        bodies.truncate(count)  # type: ignore
+
+    def get_block(self, block_hash: bytes) -> Optional[Block]:
+        block = self.blocks.get(block_hash)
+        if block is not None:
+            return block
+
+        raw = self.get_block_bytes(block_hash)
+        if raw is None:
+            return None
+        block = Block.deserialize(raw)
+        self.blocks.put(block_hash, block, len(raw))
+        self.headers.put(block_hash, block.header)
+        return block
+
+    def get_block_bytes(self, block_hash: bytes) -> Optional[bytes | memoryview]:
+        if self.bodies is not None:
+            header = self.get_header(block_hash)
+            if header is None:
+                return None
+            if self.bodies.hash_at(header.number) == block_hash:
+                return self.bodies.get_by_height(header.number)
+        return self.db.read(block_hash, NS_BLOCKS)
+
+    def get_block_view(self, block_hash: bytes) -> Optional[BlockView]:
+        raw = self.get_block_bytes(block_hash)
+        return BlockView(raw) if raw is not None else None
+
+    def get_header(self, block_hash: bytes) -> Optional[Header]:
+        header = self.headers.get(block_hash)
+        if header is not None:
+            return header
+
+        # a cached body already carries its header, so avoid another disk read
+        block = self.blocks.peek(block_hash)
+        if block is not None:
+            header = block.header
+        else:
+            raw = self.db.read(block_hash, NS_HEADERS)
+            if raw is None:
+                return None
+            header = Header.deserialize(raw)
+        self.headers.put(block_hash, header)
+        return header
+
+    def get_header_bytes(self, block_hash: bytes) -> Optional[bytes]:
+        return self.db.read(block_hash, NS_HEADERS)
+
+    def get_transaction(self, transaction_hash: bytes) -> Optional[Transaction]:
+        transaction = self.transactions.get(transaction_hash)
+        if transaction is not None:
+            return transaction
+
+        block_hash = self.db.read(transaction_hash, NS_TX_INDEX)
+        if block_hash is None:
+            return None
+        block = self.get_block(block_hash)
+        if block is None:
+            return None
+        for transaction in block.transactions:
+            if transaction.hash == transaction_hash:
+                self.transactions.put(transaction_hash, transaction)
+                return transaction
+        return None
+
+    def get_block_hash(self, height: int) -> Optional[bytes]:
+        return self.db.read(encode_height(height), NS_CANONICAL)
+
+    def put_block(
+        self,
+        block: Block,
+        batch: Optional[WriteBatch] = None,
+        canonical: bool = True,
+    ) -> bytes:
+        raw = block.serialize()
+        # a block put before fork choice has seen it keeps its body in the
+        # database until it joins the canonical chain
+        include_body = not (canonical and self._append_body(block, raw))
+        if batch is None:
+            with self.db.write_batch() as batch:
+                h = write_block(batch, block, raw, include_body, canonical)
+        else:
+            h = write_block(batch, block, raw, include_body, canonical)
+
+        self.blocks.put(h, block, len(raw))
+        self.headers.put(h, block.header)
+        return h
+
+    def set_canonical(
+        self,
+        batch: WriteBatch,
+        change: HeadChange,
+        load: Callable[[bytes], Block],
+        old_number: Optional[int],
+    ) -> tuple[list[Block], list[Block]]:
+        # reindex_head, also moving the bodies of blocks joining the
+        # canonical chain into the flat files where they extend them
+        removed, added = reindex_head(batch, change, load, old_number)
+        if self.bodies is not None:
+            for block_hash, block in zip(change.added, added):
+                if self._append_body(block, block.serialize()):
+                    batch.delete(block_hash, NS_BLOCKS)
+        return removed, added
+
+    def _append_body(self, block: Block, raw: bytes) -> bool:
+        # only canonical bodies are appended. Those that do not extend the
+        # flat files, such as the new branch after a reorg, are kept in the
+        # database instead; a reorg leaves the old branch's bodies in the
+        # files, where lookups by hash no longer match them
+        if self.bodies is None:
+            return False
+        next_height = self.bodies.next_height
+        if next_height is not None and block.header.number != next_height:
+            return False
+        self.bodies.append(block.header.number, block.hash(), raw)
+        # the body must be out of this process before the batch can commit,
+        # or a crash could leave the block recorded without its body
+        self.bodies.flush()
+        return True
+
+    def forget(self, block_hashes: Iterable[bytes]) -> None:
+        # for blocks put in a batch that never committed: drops them from
+        # the caches and cuts their bodies off the flat files
+        for block_hash in block_hashes:
+            self.blocks.pop(block_hash)
+            self.headers.pop(block_hash)
+        if self.bodies is not None:
+            self._recover_bodies()
+
+    def drop_block(self, block_hash: bytes, batch: WriteBatch) -> None:
+        delete_block(batch, block_hash)
+        self.blocks.pop(block_hash)
+        self.headers.pop(block_hash)
+
+    def has_block(self, block_hash: bytes) -> bool:
+        if block_hash in self.headers or block_hash in self.blocks:
+            return True
+        return self.db.contains(block_hash, NS_HEADERS)
+
+    def has_transaction(self, transaction_hash: bytes) -> bool:
+        if transaction_hash in self.transactions:
+            return True
+        return self.db.contains(transaction_hash, NS_TX_INDEX)
+
+    def stats(self) -> dict[str, CacheStats]:
+        return {
+            "headers": self.headers.stats,
+            "blocks": self.blocks.stats,
+            "transactions": self.transactions.stats,
+        }
+
+    def __getitem__(self, block_hash: bytes) -> Block:
+        block = self.get_block(block_hash)
+        if block is None:
+            raise KeyError(block_hash)
+        return block
+
+    def __setitem__(self, block_hash: bytes, block: Block) -> None:
+        self.put_block(block)
+
+    def __delitem__(self, block_hash: bytes) -> None:
+        block = self.get_block(block_hash)
+        if block is None:
+            raise KeyError(block_hash)
+        with self.db.write_batch() as batch:
+            batch.delete(block_hash, NS_BLOCKS)
+            batch.delete(block_hash, NS_HEADERS)
+            for transaction in block.transactions:
+                if transaction.hash:
+                    batch.delete(transaction.hash, NS_TX_INDEX)
+                    self.transactions.pop(transaction.hash)
+        self.blocks.pop(block_hash)
+        self.headers.pop(block_hash)
+
+    def __contains__(self, block_hash: object) -> bool:
+        return isinstance(block_hash, bytes) and self.has_block(block_hash)
+
+    def __iter__(self) -> Iterator[bytes]:
+        for block_hash, _ in self.db.iterate(NS_HEADERS):
+            yield block_hash
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.db.iterate(NS_HEADERS))
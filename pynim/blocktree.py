@@ -0,0 +1,264 @@
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, Optional
+
+from pynim.datatypes import Header
+
+
+class UnknownParentError(Exception):
+    """Raised when a block's parent is not in the block tree"""
+
+    pass
+
+
+def longest_chain(header: Header) -> int:
+    return 1
+
+
+def heaviest_chain(header: Header) -> int:
+    # blocks that did more work weigh more; every block weighs at least one
+    # so an empty block still extends its chain
+    return max(1, header.gas_used)
+
+
+def _clear_lowest_bit(n: int) -> int:
+    return n & (n - 1)
+
+
+def _skip_depth(depth: int) -> int:
+    # depth that a node's skip pointer jumps to; odd and even depths jump to
+    # different targets so that walks combine long and short jumps, keeping
+    # any ancestor lookup to O(log n) hops
+    if depth < 2:
+        return 0
+    if depth & 1:
+        return _clear_lowest_bit(_clear_lowest_bit(depth - 1)) + 1
+    return _clear_lowest_bit(depth)
+
+
+class TreeNode:
+    __slots__ = ("hash", "header", "parent", "skip", "depth", "total_weight")
+
+    def __init__(
+        self,
+        block_hash: bytes,
+        header: Header,
+        parent: Optional["TreeNode"],
+        total_weight: int,
+    ) -> None:
+        self.hash = block_hash
+        self.header = header
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.total_weight = total_weight
+        self.skip = (
+            parent.ancestor(_skip_depth(self.depth)) if parent is not None else None
+        )
+
+    def ancestor(self, depth: int) -> Optional["TreeNode"]:
+        if depth > self.depth or depth < 0:
+            return None
+        walk = self
+        walk_depth = self.depth
+        while walk_depth > depth:
+            skip_depth = _skip_depth(walk_depth)
+            prev_skip_depth = _skip_depth(walk_depth - 1)
+            # take the skip pointer unless the parent's skip would land
+            # closer to the target without overshooting it
+            if walk.skip is not None and (
+                skip_depth == depth
+                or (
+                    skip_depth > depth
+                    and not (
+                        prev_skip_depth < skip_depth - 2 and prev_skip_depth >= depth
+                    )
+                )
+            ):
+                walk = walk.skip
+                walk_depth = skip_depth
+            else:
+                walk = walk.parent  # type: ignore
+                walk_depth -= 1
+        return walk
+
+
+@dataclass
+class HeadChange:
+    old_head: Optional[bytes]
+    new_head: bytes
+    common_ancestor: Optional[bytes]
+    # blocks leaving the canonical chain, highest first, and blocks joining
+    # it, lowest first
+    removed: list[bytes] = field(default_factory=list)
+    added: list[bytes] = field(default_factory=list)
+
+
+class BlockTree:
+    def __init__(self, weight: Callable[[Header], int] = longest_chain) -> None:
+        self.weight = weight
+        self.nodes: dict[bytes, TreeNode] = {}
+        self.root: Optional[TreeNode] = None
+        self.head_node: Optional[TreeNode] = None
+        # canonical block hashes indexed by depth above the root
+        self.canonical: list[bytes] = []
+
+    @property
+    def head(self) -> Optional[bytes]:
+        return self.head_node.hash if self.head_node is not None else None
+
+    @property
+    def base_number(self) -> int:
+        return self.root.header.number if self.root is not None else 0
+
+    def __contains__(self, block_hash: object) -> bool:
+        return block_hash in self.nodes
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(self.nodes)
+
+    def header(self, block_hash: bytes) -> Optional[Header]:
+        node = self.nodes.get(block_hash)
+        return node.header if node is not None else None
+
+    def set_root(self, block_hash: bytes, header: Header) -> None:
+        # the root's own parent need not be known; it anchors heights for
+        # every block added after it
+        node = TreeNode(block_hash, header, None, self.weight(header))
+        self.nodes = {block_hash: node}
+        self.root = node
+        self.head_node = node
+        self.canonical = [block_hash]
+
+    def add(self, block_hash: bytes, header: Header) -> Optional[HeadChange]:
+        # returns the change of canonical head when the block wins fork
+        # choice; ties keep the head that was seen first
+        if block_hash in self.nodes:
+            return None
+        if self.root is None:
+            self.set_root(block_hash, header)
+            return HeadChange(None, block_hash, None, [], [block_hash])
+
+        parent = self.nodes.get(header.parent_hash)
+        if parent is None:
+            raise UnknownParentError(header.parent_hash.hex())
+        node = TreeNode(
+            block_hash, header, parent, parent.total_weight + self.weight(header)
+        )
+        self.nodes[block_hash] = node
+
+        head = self.head_node
+        if node.total_weight <= head.total_weight:  # type: ignore
+            return None
+        return self._set_head(node)
+
+    def rollback(self, added: list[bytes], head: Optional[bytes]) -> None:
+        # forgets blocks added since the given head, making it the head
+        # again; for when the writes that went with them never committed
+        for block_hash in added:
+            self.nodes.pop(block_hash, None)
+        node = self.nodes.get(head) if head is not None else None
+        if node is not None and node is not self.head_node:
+            self._set_head(node)
+
+    def prune(self, block_hash: bytes) -> list[bytes]:
+        # re-roots the tree at a canonical block once it is final; blocks
+        # that do not descend from it can never become canonical again, and
+        # the ones that were never canonical are returned
+        root = self.nodes[block_hash]
+        if not self._is_canonical_node(root):
+            raise ValueError("only a canonical block can become the root")
+        survivors = []
+        abandoned = []
+        for h, node in self.nodes.items():
+            if node.depth >= root.depth and node.ancestor(root.depth) is root:
+                survivors.append(node)
+            elif not self._is_canonical_node(node):
+                abandoned.append(h)
+
+        # the survivors are rebuilt so that no parent or skip pointer keeps
+        # pruned nodes alive
+        survivors.sort(key=lambda node: node.depth)
+        nodes: dict[bytes, TreeNode] = {}
+        for node in survivors:
+            parent = None if node is root else nodes[node.parent.hash]  # type: ignore
+            nodes[node.hash] = TreeNode(
+                node.hash, node.header, parent, node.total_weight
+            )
+        self.nodes = nodes
+        self.root = nodes[block_hash]
+        self.head_node = nodes[self.head_node.hash]  # type: ignore
+        self.canonical = self.canonical[root.depth :]
+        return abandoned
+
+    def _set_head(self, node: TreeNode) -> HeadChange:
+        old_head = self.head_node
+        canonical = self.canonical
+
+        # walk back to the canonical chain; only the fork's own blocks are
+        # visited, so a plain extension costs O(1)
+        added = []
+        walk: Optional[TreeNode] = node
+        while walk is not None and not self._is_canonical_node(walk):
+            added.append(walk.hash)
+            walk = walk.parent
+        added.reverse()
+        if walk is None:
+            raise UnknownParentError("fork does not meet the canonical chain")
+
+        removed = canonical[walk.depth + 1 :]
+        removed.reverse()
+        del canonical[walk.depth + 1 :]
+        canonical.extend(added)
+        self.head_node = node
+        return HeadChange(
+            old_head.hash if old_head is not None else None,
+            node.hash,
+            walk.hash,
+            removed,
+            added,
+        )
+
+    def _is_canonical_node(self, node: TreeNode) -> bool:
+        canonical = self.canonical
+        return node.depth < len(canonical) and canonical[node.depth] == node.hash
+
+    def is_canonical(self, block_hash: bytes) -> bool:
+        node = self.nodes.get(block_hash)
+        return node is not None and self._is_canonical_node(node)
+
+    def canonical_hash(self, number: int) -> Optional[bytes]:
+        depth = number - self.base_number
+        if 0 <= depth < len(self.canonical):
+            return self.canonical[depth]
+        return None
+
+    def ancestor(self, block_hash: bytes, number: int) -> Optional[bytes]:
+        # the block's ancestor at the given height, on whichever branch
+        # the block is
+        node = self.nodes.get(block_hash)
+        if node is None:
+            return None
+        found = node.ancestor(number - self.base_number)
+        return found.hash if found is not None else None
+
+    def common_ancestor(self, a: bytes, b: bytes) -> Optional[bytes]:
+        node_a = self.nodes.get(a)
+        node_b = self.nodes.get(b)
+        if node_a is None or node_b is None:
+            return None
+        depth = min(node_a.depth, node_b.depth)
+        node_a = node_a.ancestor(depth)  # type: ignore
+        node_b = node_b.ancestor(depth)  # type: ignore
+
+        # at equal depths the skip pointers land at equal depths too, so
+        # both nodes walk up in step: by skip pointer while those still
+        # differ, which never passes the common ancestor, and by parent
+        # otherwise
+        while node_a is not node_b:
+            if node_a.skip is not node_b.skip:
+                node_a, node_b = node_a.skip, node_b.skip  # type: ignore
+            else:
+                node_a, node_b = node_a.parent, node_b.parent  # type: ignore
+        return node_a.hash
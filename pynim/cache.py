@@ -0,0 +1,90 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Generic, Hashable, Optional, TypeVar
+
+V = TypeVar("V")
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+
+class LRUCache(Generic[V]):
+    def __init__(
+        self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None
+    ) -> None:
+        if max_entries is None and max_bytes is None:
+            raise ValueError("cache needs an entry or byte budget")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[Hashable, tuple[V, int]] = OrderedDict()
+        self.current_bytes = 0
+        self.stats = CacheStats()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.stats.hits += 1
+        return entry[0]
+
+    def peek(self, key: Hashable) -> Optional[V]:
+        entry = self.entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def put(self, key: Hashable, value: V, size: int = 1) -> None:
+        if self.max_bytes is not None and size > self.max_bytes:
+            # never let a single oversized entry flush the whole cache
+            self.pop(key)
+            return
+
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.current_bytes -= old[1]
+        self.entries[key] = (value, size)
+        self.current_bytes += size
+        self._evict()
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return None
+        self.current_bytes -= entry[1]
+        return entry[0]
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.current_bytes = 0
+
+    def _evict(self) -> None:
+        while self.entries and (
+            (self.max_entries is not None and len(self.entries) > self.max_entries)
+            or (self.max_bytes is not None and self.current_bytes > self.max_bytes)
+        ):
+            _, (_, size) = self.entries.popitem(last=False)
+            self.current_bytes -= size
+            self.stats.evictions += 1
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1,147 @@
+import os
+from typing import Optional
+
+from pynim.blockstore import BlockCacheConfig, BlockStore
+from pynim.database import (
+    NS_BLOCKS,
+    NS_CANONICAL,
+    NS_METADATA,
+    NS_TX_INDEX,
+    BaseDatabase,
+    DatabaseConfig,
+    WriteBatch,
+    decode_height,
+    encode_height,
+    open_database,
+)
+from pynim.datatypes import Block, Header
+from pynim.flatfile import FlatFileBlockStore
+from pynim.views import BlockView
+
+CHAINDATA_DIR = "chaindata"
+BLOCKS_DIR = "blocks"
+HEAD_KEY = b"head"
+FINALIZED_KEY = b"finalized"
+# bodies below this height have been pruned
+PRUNED_KEY = b"pruned-below"
+RECENT_HEADER_WINDOW = 256
+
+
+class ChainStore(BlockStore):
+    def __init__(
+        self,
+        db: BaseDatabase,
+        config: Optional[BlockCacheConfig] = None,
+        recent_headers: int = RECENT_HEADER_WINDOW,
+        bodies: Optional[FlatFileBlockStore] = None,
+    ) -> None:
+        super().__init__(db, config, bodies)
+        self.head_hash: Optional[bytes] = db.read(HEAD_KEY, NS_METADATA)
+        self.finalized_hash: Optional[bytes] = db.read(FINALIZED_KEY, NS_METADATA)
+        pruned = db.read(PRUNED_KEY, NS_METADATA)
+        self.pruned_below = decode_height(pruned) if pruned is not None else 0
+        # set by prune_history until its batch commits
+        self.pruning_below: Optional[int] = None
+        if self.bodies is not None and self.pruned_below:
+            # finishes a prune whose batch committed before a crash
+            self.bodies.prune_below(self.pruned_below)
+        self._load_recent_headers(recent_headers)
+
+    @classmethod
+    def open(
+        cls,
+        datadir: str,
+        db_config: Optional[DatabaseConfig] = None,
+        cache_config: Optional[BlockCacheConfig] = None,
+        recent_headers: int = RECENT_HEADER_WINDOW,
+        flat_files: bool = False,
+    ) -> "ChainStore":
+        os.makedirs(datadir, exist_ok=True)
+        db = open_database(os.path.join(datadir, CHAINDATA_DIR), db_config)
+        bodies = (
+            FlatFileBlockStore(os.path.join(datadir, BLOCKS_DIR))
+            if flat_files
+            else None
+        )
+        return cls(db, cache_config, recent_headers, bodies)
+
+    def _load_recent_headers(self, count: int) -> None:
+        head = self.head_header()
+        if head is None or count <= 1:
+            return
+
+        # only the tail of the canonical index is touched, so the cost of
+        # opening the store does not depend on the length of the chain
+        loaded = 1
+        for _, block_hash in self.db.iterate(
+            NS_CANONICAL, stop=encode_height(head.number), reverse=True
+        ):
+            if loaded >= count:
+                break
+            self.get_header(block_hash)
+            loaded += 1
+
+    def head_header(self) -> Optional[Header]:
+        if self.head_hash is None:
+            return None
+        return self.get_header(self.head_hash)
+
+    def head_block(self) -> Optional[Block]:
+        if self.head_hash is None:
+            return None
+        return self.get_block(self.head_hash)
+
+    def head_number(self) -> Optional[int]:
+        header = self.head_header()
+        return header.number if header else None
+
+    def set_head(self, block_hash: bytes, batch: Optional[WriteBatch] = None) -> None:
+        if batch is None:
+            self.db.write(HEAD_KEY, block_hash, NS_METADATA)
+        else:
+            batch.write(HEAD_KEY, block_hash, NS_METADATA)
+        self.head_hash = block_hash
+
+    def set_finalized(self, block_hash: bytes, batch: WriteBatch) -> None:
+        batch.write(FINALIZED_KEY, block_hash, NS_METADATA)
+        self.finalized_hash = block_hash
+
+    def prune_history(self, below: int, batch: WriteBatch) -> int:
+        # drops the bodies and transaction index of canonical blocks below
+        # the height, keeping their headers and height index; returns the
+        # body bytes released from the database. Bodies in the flat files
+        # stay until finish_pruning is called after the batch commits
+        freed = 0
+        for number in range(self.pruned_below, below):
+            block_hash = self.get_block_hash(number)
+            if block_hash is None:
+                continue
+            raw = self.get_block_bytes(block_hash)
+            if raw is None:
+                continue
+            for transaction_hash in BlockView(raw).tx_hashes:
+                batch.delete(transaction_hash, NS_TX_INDEX)
+                self.transactions.pop(transaction_hash)
+            self.blocks.pop(block_hash)
+            if self.bodies is None or self.bodies.hash_at(number) != block_hash:
+                batch.delete(block_hash, NS_BLOCKS)
+                freed += len(raw)
+        if below > self.pruned_below:
+            batch.write(PRUNED_KEY, encode_height(below), NS_METADATA)
+            self.pruning_below = below
+        return freed
+
+    def finish_pruning(self) -> int:
+        # deletes the flat-file segments of a committed prune, a whole
+        # segment at a time, and returns the bytes released. A crash before
+        # the commit leaves every body in place
+        below, self.pruning_below = self.pruning_below, None
+        if below is None:
+            return 0
+        self.pruned_below = max(self.pruned_below, below)
+        return self.bodies.prune_below(below) if self.bodies is not None else 0
+
+    def close(self) -> None:
+        if self.bodies is not None:
+            self.bodies.close()
+        self.db.close()
@@ -1,7 +1,25 @@
-from typing import Optional
+from collections.abc import MutableMapping
+from dataclasses import dataclass
+from typing import Optional, Sequence, Union
 
+from pynim.batch import TransactionBatch
+from pynim.blockstore import BlockStore
+from pynim.blocktree import BlockTree
 from pynim.datatypes import Block, Header, Transaction
 from pynim.hashes import keccak256
+from pynim.stake import StakeTree
+from pynim.views import BlockView, HeaderView, TransactionView
+
+
+@dataclass
+class FinalityConfig:
+    # every checkpoint_interval-th block becomes final once finality_depth
+    # blocks are built on top of it
+    checkpoint_interval: int = 32
+    finality_depth: int = 64
+    # when set, bodies more than this many checkpoint intervals below the
+    # latest checkpoint are pruned, keeping headers
+    prune_epochs: Optional[int] = None
 
 
 class ConsensusEngine:
@@ -10,73 +28,195 @@ class ConsensusEngine:
         block_time: int,
         validator_stakes: dict[bytes, int],
         validators: list[bytes],
-        block_by_hash: dict[bytes, Block],
+        block_by_hash: MutableMapping[bytes, Block],
+        block_tree: Optional[BlockTree] = None,
+        finality: Optional[FinalityConfig] = None,
     ) -> None:
         self.block_time = block_time
         self.validator_stakes = validator_stakes
-        self.validators = validators
+        # every validator carries at least weight 1, in list order, so the
+        # tree picks the same proposer a cumulative scan over the list would
+        self.stakes = StakeTree.from_weights(
+            (v, max(1, validator_stakes.get(v, 0))) for v in validators
+        )
         self.block_by_hash = block_by_hash
+        # an empty tree is falsy, so it is checked against None
+        self.block_tree = block_tree if block_tree is not None else BlockTree()
         self.current_head: Optional[bytes] = None
+        self.finality = finality or FinalityConfig()
+        self.finalized_hash: Optional[bytes] = None
+        self.finalized_number: Optional[int] = None
+        # fork blocks cut off by finality, for the caller to delete
+        self.abandoned: list[bytes] = []
         self.slash_penalty = 10
 
+    @property
+    def validators(self) -> list[bytes]:
+        return list(self.stakes)
+
     def select_proposer(self) -> bytes:
-        total = sum(max(1, self.validator_stakes.get(v, 0)) for v in self.validators)
         seed = keccak256(
             self.current_head if self.current_head is not None else b"\x00" * 32
         )
-        r = int.from_bytes(seed, "big") % total
-        cum = 0
-        for v in self.validators:
-            st = max(1, self.validator_stakes.get(v, 0))
-            cum += st
-            if r < cum:
-                return v
-        return self.validators[0]
-
-    def validate_block_header(self, header: Header) -> bool:
-        if self.current_head:
-            parent = self.block_by_hash.get(self.current_head)
+        return self.stakes.find(int.from_bytes(seed, "big") % self.stakes.total)
+
+    def set_stake(self, validator: bytes, stake: int) -> None:
+        self.validator_stakes[validator] = stake
+        if validator in self.stakes or stake > 0:
+            self.stakes.add(validator, max(1, stake))
+
+    def validate_block_header(self, header: Union[Header, HeaderView]) -> bool:
+        # blocks on a known fork are checked against their own parent
+        parent_hash = header.parent_hash
+        if parent_hash not in self.block_tree:
+            parent_hash = self.current_head
+        if parent_hash:
+            parent = self._get_header(parent_hash)
             if not parent:
                 return False
-            if header.number != parent.header.number + 1:
-                return False
-            if header.timestamp < parent.header.timestamp + self.block_time:
+            return self._follows(parent, header)
+        return True
+
+    def _follows(
+        self, parent: Union[Header, HeaderView], header: Union[Header, HeaderView]
+    ) -> bool:
+        if header.number != parent.number + 1:
+            return False
+        if header.timestamp < parent.timestamp + self.block_time:
+            return False
+        return True
+
+    def validate_header_range(
+        self,
+        parent_hash: bytes,
+        parent: Header,
+        headers: Sequence[Header],
+        hashes: Optional[Sequence[bytes]] = None,
+    ) -> bool:
+        # a contiguous run of headers checked in one pass, for sync: each
+        # must link to and follow the one before it, starting from parent
+        if hashes is None:
+            hashes = [header.hash() for header in headers]
+        for header, block_hash in zip(headers, hashes):
+            if header.parent_hash != parent_hash or not self._follows(parent, header):
                 return False
+            parent_hash, parent = block_hash, header
         return True
 
-    def validate_transactions(self, txs: list[Transaction]) -> bool:
-        seen_nonces = {}
+    def _get_header(self, block_hash: bytes) -> Optional[Header]:
+        header = self.block_tree.header(block_hash)
+        if header is not None:
+            return header
+        if isinstance(self.block_by_hash, BlockStore):
+            return self.block_by_hash.get_header(block_hash)
+        block = self.block_by_hash.get(block_hash)
+        return block.header if block else None
+
+    def validate_transactions(
+        self,
+        txs: Union[Sequence[Transaction], Sequence[TransactionView], TransactionBatch],
+    ) -> bool:
+        if isinstance(txs, TransactionBatch):
+            return txs.nonces_increasing()
+        if not txs or not isinstance(txs[0], TransactionView):
+            # decoded transactions already hold every field, so the check
+            # runs over columns
+            return TransactionBatch.from_transactions(txs).nonces_increasing()
+        # building a batch from views would decode every field; this loop
+        # reads only the sender and nonce, and stops at the first
+        # transaction out of order
+        last_nonces: dict[bytes, int] = {}
         for tx in txs:
-            if tx.sender not in seen_nonces:
-                seen_nonces[tx.sender] = tx.nonce
-            else:
-                if tx.nonce <= seen_nonces[tx.sender]:
-                    return False
-                seen_nonces[tx.sender] = tx.nonce
+            sender = tx.sender
+            nonce = tx.nonce
+            last = last_nonces.get(sender)
+            if last is not None and nonce <= last:
+                return False
+            last_nonces[sender] = nonce
         return True
 
-    def verify_block(self, block: Block) -> bool:
+    def verify_block(self, block: Union[Block, BlockView]) -> bool:
         if not self.validate_block_header(block.header):
             return False
         if not self.validate_transactions(block.transactions):
             return False
         return True
 
+    def verify_block_bytes(self, raw: bytes) -> bool:
+        # checks run against a lazy view, so only the header fields and the
+        # sender/nonce of each transaction are ever decoded
+        return self.verify_block(BlockView(raw))
+
     def apply_block(self, block: Block) -> bool:
         if not self.verify_block(block):
             self.slash(self.select_proposer())
             return False
+        tree = self.block_tree
+        if tree.root is not None and block.header.parent_hash not in tree:
+            return False
         h = block.hash()
-        self.block_by_hash[h] = block
-        self.current_head = h
+        store = self.block_by_hash
+        if not isinstance(store, BlockStore):
+            store[h] = block
+            tree.add(h, block.header)
+            self.current_head = tree.head
+            return True
+
+        # the block is stored unindexed; heights and transactions are only
+        # indexed, in the same batch, when it moves the canonical head
+        with store.db.write_batch() as batch:
+            store.put_block(block, batch, canonical=False)
+            old_head = tree.header(tree.head) if tree.head is not None else None
+            change = tree.add(h, block.header)
+            if change is not None:
+
+                def load(block_hash: bytes) -> Block:
+                    return block if block_hash == h else store[block_hash]
+
+                store.set_canonical(
+                    batch,
+                    change,
+                    load,
+                    old_head.number if old_head is not None else None,
+                )
+        self.current_head = tree.head
         return True
 
     def finalize_block(self) -> Optional[bytes]:
-        return self.current_head
+        # the newest checkpoint buried deep enough under the canonical head
+        # becomes final, and the block tree is cut back to it so fork choice
+        # can never revert it
+        tree = self.block_tree
+        head = tree.header(tree.head) if tree.head is not None else None
+        if head is None:
+            return self.finalized_hash
+        interval = self.finality.checkpoint_interval
+        number = head.number - self.finality.finality_depth
+        number -= number % interval
+        if self.finalized_number is not None and number <= self.finalized_number:
+            return self.finalized_hash
+        checkpoint = tree.canonical_hash(number)
+        if checkpoint is None:
+            return self.finalized_hash
+
+        self.abandoned.extend(tree.prune(checkpoint))
+        self.finalized_hash = checkpoint
+        self.finalized_number = number
+        return checkpoint
+
+    def prune_height(self) -> Optional[int]:
+        # bodies below this height may be dropped
+        epochs = self.finality.prune_epochs
+        if epochs is None or self.finalized_number is None:
+            return None
+        return self.finalized_number - epochs * self.finality.checkpoint_interval
 
     def slash(self, validator: bytes) -> None:
         stake = self.validator_stakes.get(validator, 0)
         new_stake = max(0, stake - self.slash_penalty)
         self.validator_stakes[validator] = new_stake
-        if new_stake == 0 and validator in self.validators:
-            self.validators.remove(validator)
+        if validator in self.stakes:
+            if new_stake == 0:
+                self.stakes.remove(validator)
+            else:
+                self.stakes.update(validator, max(1, new_stake))
@@ -1,27 +1,366 @@
 import sqlite3
-from typing import Optional
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, Optional
 
+NS_DEFAULT = "default"
+NS_BLOCKS = "blocks"
+NS_HEADERS = "headers"
+NS_CANONICAL = "canonical"
+NS_TX_INDEX = "tx-index"
+NS_STATE = "state"
+NS_METADATA = "metadata"
 
-class Database:
-    def __init__(self, path: str) -> None:
-        self.conn = sqlite3.connect(path)
+NAMESPACES = (
+    NS_DEFAULT,
+    NS_BLOCKS,
+    NS_HEADERS,
+    NS_CANONICAL,
+    NS_TX_INDEX,
+    NS_STATE,
+    NS_METADATA,
+)
+
+
+def encode_height(height: int) -> bytes:
+    # big-endian so that byte order matches numeric order when iterating
+    return height.to_bytes(8, "big")
+
+
+def decode_height(b: bytes) -> int:
+    return int.from_bytes(b, "big")
+
+
+def prefix_upper_bound(prefix: bytes) -> Optional[bytes]:
+    b = bytearray(prefix)
+    while b:
+        if b[-1] < 0xFF:
+            b[-1] += 1
+            return bytes(b)
+        b.pop()
+    return None
+
+
+def key_range(
+    prefix: Optional[bytes], start: Optional[bytes], stop: Optional[bytes]
+) -> tuple[Optional[bytes], Optional[bytes]]:
+    if prefix is not None:
+        start = prefix if start is None else max(start, prefix)
+        upper = prefix_upper_bound(prefix)
+        if upper is not None:
+            stop = upper if stop is None else min(stop, upper)
+    return start, stop
+
+
+# pragma values are spliced into SQL, so only these keywords are accepted
+JOURNAL_MODES = ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+AUTO_VACUUM_MODES = ("NONE", "FULL", "INCREMENTAL")
+
+
+def _pragma_keyword(name: str, value: str, allowed: tuple[str, ...]) -> str:
+    keyword = str(value).upper()
+    if keyword not in allowed:
+        raise ValueError(f"invalid {name} {value!r}, expected one of {allowed}")
+    return keyword
+
+
+@dataclass
+class DatabaseConfig:
+    engine: str = "sqlite"
+    # sqlite
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    cache_size: int = -64_000  # negative values are KiB, positive values are pages
+    # only takes effect when the database is created; INCREMENTAL lets
+    # compact() hand pages freed by pruning back to the filesystem
+    auto_vacuum: str = "NONE"
+    # leveldb
+    leveldb_cache_size: int = 64 * 1024 * 1024
+    leveldb_write_buffer_size: int = 16 * 1024 * 1024
+    leveldb_bloom_filter_bits: int = 10
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "DatabaseConfig":
+        return cls(
+            engine=d.get("engine", cls.engine),
+            journal_mode=d.get("journal_mode", cls.journal_mode),
+            synchronous=d.get("synchronous", cls.synchronous),
+            cache_size=int(d.get("cache_size", cls.cache_size)),
+            auto_vacuum=d.get("auto_vacuum", cls.auto_vacuum),
+            leveldb_cache_size=int(
+                d.get("leveldb_cache_size", cls.leveldb_cache_size)
+            ),
+            leveldb_write_buffer_size=int(
+                d.get("leveldb_write_buffer_size", cls.leveldb_write_buffer_size)
+            ),
+            leveldb_bloom_filter_bits=int(
+                d.get("leveldb_bloom_filter_bits", cls.leveldb_bloom_filter_bits)
+            ),
+        )
+
+
+class WriteBatch:
+    def __init__(self) -> None:
+        self.operations: list[tuple[str, bytes, Optional[bytes]]] = []
+
+    def write(self, k: bytes, v: bytes, namespace: str = NS_DEFAULT) -> None:
+        self.operations.append((namespace, k, v))
+
+    def delete(self, k: bytes, namespace: str = NS_DEFAULT) -> None:
+        self.operations.append((namespace, k, None))
+
+    def __len__(self) -> int:
+        return len(self.operations)
+
+
+class KeyValueReader(ABC):
+    @abstractmethod
+    def read(self, k: bytes, namespace: str = NS_DEFAULT) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def iterate(
+        self,
+        namespace: str = NS_DEFAULT,
+        prefix: Optional[bytes] = None,
+        start: Optional[bytes] = None,
+        stop: Optional[bytes] = None,
+        reverse: bool = False,
+    ) -> Iterator[tuple[bytes, bytes]]:
+        ...
+
+    @abstractmethod
+    def close(self) -> None:
+        ...
+
+    def contains(self, k: bytes, namespace: str = NS_DEFAULT) -> bool:
+        return self.read(k, namespace) is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class BaseDatabase(KeyValueReader):
+    @abstractmethod
+    def write(self, k: bytes, v: bytes, namespace: str = NS_DEFAULT) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, k: bytes, namespace: str = NS_DEFAULT) -> None:
+        ...
+
+    @abstractmethod
+    def apply_batch(self, batch: WriteBatch) -> None:
+        ...
+
+    @abstractmethod
+    def snapshot(self) -> KeyValueReader:
+        ...
+
+    def compact(self) -> None:
+        # engines that can return freed space to the filesystem override this
+        pass
+
+    @contextmanager
+    def write_batch(self) -> Iterator[WriteBatch]:
+        batch = WriteBatch()
+        yield batch
+        self.apply_batch(batch)
+
+
+def _sqlite_read(
+    conn: sqlite3.Connection, k: bytes, namespace: str
+) -> Optional[bytes]:
+    cursor = conn.execute(
+        "SELECT value FROM kv WHERE namespace = ? AND key = ?", (namespace, k)
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _sqlite_iterate(
+    conn: sqlite3.Connection,
+    namespace: str,
+    prefix: Optional[bytes],
+    start: Optional[bytes],
+    stop: Optional[bytes],
+    reverse: bool,
+) -> Iterator[tuple[bytes, bytes]]:
+    start, stop = key_range(prefix, start, stop)
+
+    query = "SELECT key, value FROM kv WHERE namespace = ?"
+    params: list = [namespace]
+    if start is not None:
+        query += " AND key >= ?"
+        params.append(start)
+    if stop is not None:
+        query += " AND key < ?"
+        params.append(stop)
+    query += " ORDER BY key DESC" if reverse else " ORDER BY key"
+
+    # a dedicated cursor streams rows instead of materialising the range
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    try:
+        for key, value in cursor:
+            yield key, value
+    finally:
+        cursor.close()
+
+
+class SQLiteSnapshot(KeyValueReader):
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+
+    def read(self, k: bytes, namespace: str = NS_DEFAULT) -> Optional[bytes]:
+        return _sqlite_read(self.conn, k, namespace)
+
+    def iterate(
+        self,
+        namespace: str = NS_DEFAULT,
+        prefix: Optional[bytes] = None,
+        start: Optional[bytes] = None,
+        stop: Optional[bytes] = None,
+        reverse: bool = False,
+    ) -> Iterator[tuple[bytes, bytes]]:
+        return _sqlite_iterate(self.conn, namespace, prefix, start, stop, reverse)
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class Database(BaseDatabase):
+    def __init__(self, path: str, config: Optional[DatabaseConfig] = None) -> None:
         self.path = path
+        self.config = config or DatabaseConfig()
+        # checked before anything is created on disk
+        pragmas = self._pragmas()
 
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        for pragma in pragmas:
+            self.conn.execute(pragma)
         self._ensure_schema()
 
+    def _pragmas(self) -> list[str]:
+        config = self.config
+        auto_vacuum = _pragma_keyword(
+            "auto_vacuum", config.auto_vacuum, AUTO_VACUUM_MODES
+        )
+        journal_mode = _pragma_keyword(
+            "journal_mode", config.journal_mode, JOURNAL_MODES
+        )
+        synchronous = _pragma_keyword(
+            "synchronous", config.synchronous, SYNCHRONOUS_MODES
+        )
+        return [
+            f"PRAGMA auto_vacuum = {auto_vacuum}",
+            f"PRAGMA journal_mode = {journal_mode}",
+            f"PRAGMA synchronous = {synchronous}",
+            f"PRAGMA cache_size = {int(config.cache_size)}",
+        ]
+
     def _ensure_schema(self) -> None:
-        self.conn.execute("CREATE TABLE IF NOT EXISTS database (key BLOB, value BLOB)")
-        self.conn.commit()
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                "namespace TEXT NOT NULL, "
+                "key BLOB NOT NULL, "
+                "value BLOB NOT NULL, "
+                "PRIMARY KEY (namespace, key)"
+                ") WITHOUT ROWID"
+            )
+            self._migrate_legacy_table()
+
+    def _migrate_legacy_table(self) -> None:
+        cursor = self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'database'"
+        )
+        if cursor.fetchone() is None:
+            return
+        # the old table had no key constraint, so the latest insert of a key wins
+        self.conn.execute(
+            "INSERT OR REPLACE INTO kv (namespace, key, value) "
+            "SELECT ?, key, value FROM database "
+            "WHERE key IS NOT NULL AND value IS NOT NULL ORDER BY rowid",
+            (NS_DEFAULT,),
+        )
+        self.conn.execute("DROP TABLE database")
+
+    def write(self, k: bytes, v: bytes, namespace: str = NS_DEFAULT) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO kv (namespace, key, value) VALUES (?, ?, ?)",
+                (namespace, k, v),
+            )
+
+    def read(self, k: bytes, namespace: str = NS_DEFAULT) -> Optional[bytes]:
+        return _sqlite_read(self.conn, k, namespace)
+
+    def delete(self, k: bytes, namespace: str = NS_DEFAULT) -> None:
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, k)
+            )
+
+    def iterate(
+        self,
+        namespace: str = NS_DEFAULT,
+        prefix: Optional[bytes] = None,
+        start: Optional[bytes] = None,
+        stop: Optional[bytes] = None,
+        reverse: bool = False,
+    ) -> Iterator[tuple[bytes, bytes]]:
+        return _sqlite_iterate(self.conn, namespace, prefix, start, stop, reverse)
+
+    def apply_batch(self, batch: WriteBatch) -> None:
+        with self.conn:
+            for namespace, k, v in batch.operations:
+                if v is None:
+                    self.conn.execute(
+                        "DELETE FROM kv WHERE namespace = ? AND key = ?",
+                        (namespace, k),
+                    )
+                else:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO kv (namespace, key, value) "
+                        "VALUES (?, ?, ?)",
+                        (namespace, k, v),
+                    )
+
+    def snapshot(self) -> SQLiteSnapshot:
+        if self.path == ":memory:" or self.config.journal_mode.upper() != "WAL":
+            # without WAL a long-lived reader would block writers, so copy instead
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+            self.conn.backup(conn)
+            return SQLiteSnapshot(conn)
+
+        conn = sqlite3.connect(
+            self.path, isolation_level=None, check_same_thread=False
+        )
+        conn.execute("BEGIN")
+        # the read transaction pins the snapshot at its first read
+        conn.execute("SELECT 1 FROM kv LIMIT 1").fetchall()
+        return SQLiteSnapshot(conn)
+
+    def compact(self) -> None:
+        # a no-op unless the database was created with auto_vacuum enabled
+        self.conn.execute("PRAGMA incremental_vacuum").fetchall()
+
+    def close(self) -> None:
+        self.conn.close()
 
-    def write(self, k: bytes, v: bytes) -> None:
-        self.conn.execute("INSERT INTO database (key, value) VALUES (?, ?)", (k, v))
-        self.conn.commit()
 
-    def read(self, k: bytes) -> Optional[bytes]:
-        cursor = self.conn.execute("SELECT value FROM database WHERE key = ?", (k,))
-        row = cursor.fetchone()
-        return row[0] if row else None
+def open_database(path: str, config: Optional[DatabaseConfig] = None) -> BaseDatabase:
+    config = config or DatabaseConfig()
+    if config.engine == "sqlite":
+        return Database(path, config)
+    if config.engine == "leveldb":
+        from pynim.leveldb import LevelDBDatabase
 
-    def delete(self, k: bytes) -> None:
-        self.conn.execute("DELETE FROM database WHERE key = ?", (k,))
-        self.conn.commit()
+        return LevelDBDatabase(path, config)
+    raise ValueError(f"unknown database engine: {config.engine}")
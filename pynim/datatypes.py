@@ -1,10 +1,47 @@
-from typing import Optional
+from typing import Optional, Sequence
 
+from pynim import rlp
 from pynim.hashes import keccak256
-from pynim.serialization import Serializable
+from pynim.rlp import decode_int, encode_int
+from pynim.serialization import RLPSerializable
 
+# placeholders written by to_dict() for fields that are unset
+EMPTY_HASH = b"\x00" * 32
+EMPTY_INPUT_DATA = b"\x00" * 10
+EMPTY_SIGNATURE = b"\x00" * 64
+
+
+def _optional_bytes(h: Optional[str], empty: bytes) -> Optional[bytes]:
+    if not h:
+        return None
+    b = bytes.fromhex(h)
+    return None if b == empty else b
+
+
+def _expect_fields(item: list, count: int, name: str) -> None:
+    # decoded items are exactly bytes or list
+    if len(item) != count or list in map(type, item):
+        raise rlp.DecodingError(f"{name} must be a list of {count} fields")
+
+
+def _immutable(self, name: str, value=None) -> None:
+    raise AttributeError(f"{type(self).__name__} is immutable")
+
+
+class Transaction(RLPSerializable):
+    __slots__ = (
+        "timestamp",
+        "nonce",
+        "recipient",
+        "sender",
+        "value",
+        "input_data",
+        "signature",
+        "gas",
+        "gas_price",
+        "_hash",
+    )
 
-class Transaction(Serializable):
     def __init__(
         self,
         timestamp: int,
@@ -18,16 +55,57 @@ class Transaction(Serializable):
         gas: int,
         gas_price: int,
     ) -> None:
-        self.timestamp = timestamp
-        self.hash = hash
-        self.nonce = nonce
-        self.recipient = recipient
-        self.sender = sender
-        self.value = value
-        self.input_data = input_data
-        self.signature = signature
-        self.gas = gas
-        self.gas_price = gas_price
+        init = object.__setattr__
+        init(self, "timestamp", timestamp)
+        init(self, "nonce", nonce)
+        init(self, "recipient", recipient)
+        init(self, "sender", sender)
+        init(self, "value", value)
+        init(self, "input_data", input_data)
+        init(self, "signature", signature)
+        init(self, "gas", gas)
+        init(self, "gas_price", gas_price)
+        init(self, "_hash", None)
+        # a hash handed in by a caller is checked; only decoding, which
+        # derives the hash itself, may skip that (see _with_hash)
+        if hash is not None and hash != self.hash:
+            raise ValueError("transaction hash does not match its fields")
+
+    @classmethod
+    def _with_hash(cls, hash: Optional[bytes], *fields) -> "Transaction":
+        transaction = cls(fields[0], None, *fields[1:])
+        object.__setattr__(transaction, "_hash", hash)
+        return transaction
+
+    __setattr__ = _immutable
+    __delattr__ = _immutable
+
+    @property
+    def hash(self) -> bytes:
+        h = self._hash
+        if h is None:
+            h = keccak256(self.serialize())
+            object.__setattr__(self, "_hash", h)
+        return h
+
+    def __reduce__(self):
+        # plain fields pickle in C and carry the cached hash along, which
+        # keeps hand-offs to worker processes cheap
+        return (
+            type(self)._with_hash,
+            (
+                self._hash,
+                self.timestamp,
+                self.nonce,
+                self.recipient,
+                self.sender,
+                self.value,
+                self.input_data,
+                self.signature,
+                self.gas,
+                self.gas_price,
+            ),
+        )
 
     def calculate_gas_in_nim(self) -> int:
         return self.gas * self.gas_price
@@ -42,10 +120,69 @@ class Transaction(Serializable):
             "value": self.value,
             "input_data": self.input_data.hex() if self.input_data else b"\x00".hex() * 10,
             "signature": self.signature.hex() if self.signature else b"\x00".hex() * 64,
+            "gas": self.gas,
+            "gas_price": self.gas_price,
         }
 
+    @classmethod
+    def from_dict(cls, d: dict) -> "Transaction":
+        return cls(
+            timestamp=d["timestamp"],
+            hash=None,  # recomputed on demand rather than trusted
+            nonce=d["nonce"],
+            recipient=bytes.fromhex(d["recipient"]),
+            sender=bytes.fromhex(d["sender"]),
+            value=d["value"],
+            input_data=_optional_bytes(d["input_data"], EMPTY_INPUT_DATA),
+            signature=_optional_bytes(d["signature"], EMPTY_SIGNATURE),
+            gas=d.get("gas", 0),
+            gas_price=d.get("gas_price", 0),
+        )
+
+    def to_rlp(self) -> list:
+        # the hash is derived from this encoding, so it is not part of it
+        return [
+            encode_int(self.timestamp),
+            encode_int(self.nonce),
+            self.recipient,
+            self.sender,
+            encode_int(self.value),
+            self.input_data or b"",
+            self.signature or b"",
+            encode_int(self.gas),
+            encode_int(self.gas_price),
+        ]
+
+    @classmethod
+    def from_rlp(cls, item: list) -> "Transaction":
+        _expect_fields(item, 9, "transaction")
+        # decoding is canonical, so the hash taken over serialize() on first
+        # use matches the received bytes and need not be paid for up front
+        return cls(
+            timestamp=decode_int(item[0]),
+            hash=None,
+            nonce=decode_int(item[1]),
+            recipient=item[2],
+            sender=item[3],
+            value=decode_int(item[4]),
+            input_data=item[5] or None,
+            signature=item[6] or None,
+            gas=decode_int(item[7]),
+            gas_price=decode_int(item[8]),
+        )
+
+
+class Header(RLPSerializable):
+    __slots__ = (
+        "timestamp",
+        "parent_hash",
+        "number",
+        "gas_limit",
+        "gas_used",
+        "base_fee",
+        "_hash",
+    )
 
-class Header(Serializable):
     def __init__(
         self,
         timestamp: int,
@@ -55,12 +192,27 @@ class Header(Serializable):
         gas_used: int,
         base_fee: int,
     ) -> None:
-        self.timestamp = timestamp
-        self.parent_hash = parent_hash
-        self.number = number
-        self.gas_limit = gas_limit
-        self.gas_used = gas_used
-        self.base_fee = base_fee
+        init = object.__setattr__
+        init(self, "timestamp", timestamp)
+        init(self, "parent_hash", parent_hash)
+        init(self, "number", number)
+        init(self, "gas_limit", gas_limit)
+        init(self, "gas_used", gas_used)
+        init(self, "base_fee", base_fee)
+        init(self, "_hash", None)
+
+    __setattr__ = _immutable
+    __delattr__ = _immutable
+
+    def hash(self) -> bytes:
+        h = self._hash
+        if h is None:
+            h = keccak256(self.serialize())
+            object.__setattr__(self, "_hash", h)
+        return h
+
+    def __reduce__(self):
+        return (type(self).deserialize, (self.serialize(),))
 
     def to_dict(self) -> dict:
         return {
@@ -72,27 +224,122 @@ class Header(Serializable):
             "base_fee": self.base_fee,
         }
 
+    @classmethod
+    def from_dict(cls, d: dict) -> "Header":
+        return cls(
+            timestamp=d["timestamp"],
+            parent_hash=bytes.fromhex(d["parent_hash"]),
+            number=d["number"],
+            gas_limit=d["gas_limit"],
+            gas_used=d["gas_used"],
+            base_fee=d["base_fee"],
+        )
+
+    def to_rlp(self) -> list:
+        return [
+            encode_int(self.timestamp),
+            self.parent_hash,
+            encode_int(self.number),
+            encode_int(self.gas_limit),
+            encode_int(self.gas_used),
+            encode_int(self.base_fee),
+        ]
+
+    @classmethod
+    def from_rlp(cls, item: list) -> "Header":
+        _expect_fields(item, 6, "header")
+        return cls(
+            timestamp=decode_int(item[0]),
+            parent_hash=item[1],
+            number=decode_int(item[2]),
+            gas_limit=decode_int(item[3]),
+            gas_used=decode_int(item[4]),
+            base_fee=decode_int(item[5]),
+        )
+
+
+class Block(RLPSerializable):
+    __slots__ = ("header", "transactions", "cached_hash")
 
-class Block(Serializable):
     def __init__(
         self,
         header: Header,
-        transactions: list[Transaction],
+        transactions: Sequence[Transaction],
         cached_hash: Optional[bytes],
     ) -> None:
-        self.header = header
-        self.transactions = transactions
-        self.cached_hash = cached_hash
+        if cached_hash is not None and cached_hash != header.hash():
+            raise ValueError("block hash does not match its header")
+        init = object.__setattr__
+        init(self, "header", header)
+        # a tuple, so that the block cannot change under its cached hash
+        init(self, "transactions", tuple(transactions))
+        init(self, "cached_hash", cached_hash)
+
+    def __setattr__(self, name: str, value) -> None:
+        # subclasses may carry extra attributes, but block fields stay fixed
+        if name in Block.__slots__:
+            _immutable(self, name)
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name: str) -> None:
+        if name in Block.__slots__:
+            _immutable(self, name)
+        object.__delattr__(self, name)
 
     def hash(self) -> bytes:
-        return keccak256(self.header.serialize())
+        h = self.cached_hash
+        if h is None:
+            h = self.header.hash()
+            object.__setattr__(self, "cached_hash", h)
+        return h
+
+    def __reduce__(self):
+        return (Block.deserialize, (self.serialize(),))
 
     def to_dict(self) -> dict:
         return {
             "header": self.header.to_dict(),
-            "transactions": [
-                t.hash.hex() if t.hash else b"\x00".hex() * 32
-                for t in self.transactions
-            ],
-            "cached_hash": self.cached_hash.hex() if self.cached_hash else b"\x00" * 32,
+            "transactions": [t.to_dict() for t in self.transactions],
+            "cached_hash": (self.cached_hash or EMPTY_HASH).hex(),
         }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Block":
+        return cls(
+            header=Header.from_dict(d["header"]),
+            transactions=[Transaction.from_dict(t) for t in d["transactions"]],
+            cached_hash=None,
+        )
+
+    def to_rlp(self) -> list:
+        return [self.header.to_rlp(), [t.to_rlp() for t in self.transactions]]
+
+    @classmethod
+    def from_rlp(cls, item: list) -> "Block":
+        if len(item) != 2 or not all(isinstance(x, list) for x in item):
+            raise rlp.DecodingError("block must be a [header, transactions] list")
+        header = Header.from_rlp(item[0])
+        return cls(
+            header=header,
+            transactions=[Transaction.from_rlp(t) for t in item[1]],
+            cached_hash=header.hash(),
+        )
+
+    @classmethod
+    def deserialize(cls, b: bytes) -> "Block":
+        # the header is decoded from its raw slice so that the block hash is
+        # taken over the received bytes instead of a re-encoding
+        raw = bytes(b)
+        parts = rlp.split(raw)
+        if len(parts) != 2:
+            raise rlp.DecodingError("block must be a [header, transactions] list")
+        header_raw, transactions_raw = parts
+        header = Header.deserialize(header_raw)
+        object.__setattr__(header, "_hash", keccak256(header_raw))
+        return cls(
+            header=header,
+            transactions=[
+                Transaction.from_rlp(t) for t in rlp.decode(transactions_raw)
+            ],
+            cached_hash=header.hash(),
+        )
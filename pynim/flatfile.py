@@ -0,0 +1,227 @@
+import mmap
+import os
+import struct
+from typing import Optional
+
+INDEX_FILE = "index.dat"
+SEGMENT_FILE = "blk{:05d}.dat"
+SEGMENT_SIZE = 128 * 1024 * 1024
+
+# height, block hash, segment number, offset in segment, body length
+INDEX_RECORD = struct.Struct(">Q32sIQI")
+
+
+class FlatFileError(Exception):
+    """Raised when the flat-file block store is used inconsistently"""
+
+    pass
+
+
+class FlatFileBlockStore:
+    def __init__(self, directory: str, segment_size: int = SEGMENT_SIZE) -> None:
+        self.directory = directory
+        self.segment_size = segment_size
+        os.makedirs(directory, exist_ok=True)
+
+        self.index_file = open(os.path.join(directory, INDEX_FILE), "a+b")
+        self.index_map: Optional[mmap.mmap] = None
+        self.segment_maps: dict[int, mmap.mmap] = {}
+        self.hash_index: Optional[dict[bytes, int]] = None
+
+        self.count = 0
+        self.base_height = 0
+        self.segment = 0
+        # segments below this one were deleted by pruning
+        self.first_segment = 0
+        self.segment_file = None
+        self._recover()
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, SEGMENT_FILE.format(segment))
+
+    def _recover(self) -> None:
+        size = os.path.getsize(self.index_file.name)
+        count = size // INDEX_RECORD.size
+
+        # drop a torn index record and any entries whose body never hit the disk
+        while count > 0:
+            self.index_file.seek((count - 1) * INDEX_RECORD.size)
+            _, _, segment, offset, length = INDEX_RECORD.unpack(
+                self.index_file.read(INDEX_RECORD.size)
+            )
+            path = self._segment_path(segment)
+            if os.path.exists(path) and os.path.getsize(path) >= offset + length:
+                break
+            count -= 1
+
+        if count * INDEX_RECORD.size != size:
+            self.index_file.truncate(count * INDEX_RECORD.size)
+
+        self.count = count
+        if count > 0:
+            self.base_height = self._record(0)[0]
+            _, _, segment, offset, length = self._record(count - 1)
+            self.segment = segment
+            end = offset + length
+        else:
+            end = 0
+
+        self.segment_file = open(self._segment_path(self.segment), "a+b")
+        if os.path.getsize(self.segment_file.name) != end:
+            self.segment_file.truncate(end)
+
+        while self.first_segment < self.segment and not os.path.exists(
+            self._segment_path(self.first_segment)
+        ):
+            self.first_segment += 1
+
+    def _record(self, position: int) -> tuple[int, bytes, int, int, int]:
+        start = position * INDEX_RECORD.size
+        if self.index_map is None or len(self.index_map) < start + INDEX_RECORD.size:
+            self._remap_index()
+        return INDEX_RECORD.unpack_from(self.index_map, start)  # type: ignore
+
+    def _remap_index(self) -> None:
+        self.index_file.flush()
+        # earlier maps may still back memoryviews handed out to callers, so
+        # they are dropped rather than closed
+        self.index_map = mmap.mmap(
+            self.index_file.fileno(), 0, access=mmap.ACCESS_READ
+        )
+
+    def _segment_map(self, segment: int, end: int) -> mmap.mmap:
+        segment_map = self.segment_maps.get(segment)
+        if segment_map is None or len(segment_map) < end:
+            if segment == self.segment:
+                self.segment_file.flush()  # type: ignore
+            with open(self._segment_path(segment), "rb") as f:
+                segment_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.segment_maps[segment] = segment_map
+        return segment_map
+
+    @property
+    def next_height(self) -> Optional[int]:
+        # an empty store accepts any starting height
+        return self.base_height + self.count if self.count else None
+
+    def append(self, height: int, block_hash: bytes, data: bytes) -> None:
+        if self.count == 0:
+            self.base_height = height
+        elif height != self.next_height:
+            raise FlatFileError(
+                f"append-only store expected height {self.next_height}, got {height}"
+            )
+        if len(block_hash) != 32:
+            raise FlatFileError("block hash must be 32 bytes")
+
+        offset = self.segment_file.seek(0, os.SEEK_END)  # type: ignore
+        if offset > 0 and offset + len(data) > self.segment_size:
+            self.segment_file.close()  # type: ignore
+            self.segment += 1
+            self.segment_file = open(self._segment_path(self.segment), "a+b")
+            # the index never points past its last segment, so whatever an
+            # earlier run left in the next one is unindexed
+            self.segment_file.truncate(0)
+            self.segment_maps.pop(self.segment, None)
+            offset = 0
+
+        self.segment_file.write(data)  # type: ignore
+        self.index_file.write(
+            INDEX_RECORD.pack(height, block_hash, self.segment, offset, len(data))
+        )
+        if self.hash_index is not None:
+            self.hash_index[block_hash] = height
+        self.count += 1
+
+    def truncate(self, count: int) -> None:
+        # drops the records from position count on, with their bodies; for
+        # use before any body has been handed out, as on open
+        if count >= self.count:
+            return
+        self.flush()
+        last_segment = self.segment
+        self.segment_file.close()  # type: ignore
+        self.index_file.truncate(count * INDEX_RECORD.size)
+        self.index_map = None
+        self.segment_maps.clear()
+        self.hash_index = None
+        self._recover()
+        for segment in range(self.segment + 1, last_segment + 1):
+            path = self._segment_path(segment)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _position(self, height: int) -> Optional[int]:
+        position = height - self.base_height
+        if position < 0 or position >= self.count:
+            return None
+        return position
+
+    def get_by_height(self, height: int) -> Optional[memoryview]:
+        position = self._position(height)
+        if position is None:
+            return None
+        _, _, segment, offset, length = self._record(position)
+        if segment < self.first_segment:
+            return None
+        segment_map = self._segment_map(segment, offset + length)
+        return memoryview(segment_map)[offset : offset + length]
+
+    def prune_below(self, height: int) -> int:
+        # whole segments holding only bodies below the height are deleted;
+        # their index records stay, so every height keeps its position
+        position = min(max(height - self.base_height, 0), self.count)
+        if position < self.count:
+            keep = min(self._record(position)[2], self.segment)
+        else:
+            keep = self.segment
+        freed = 0
+        for segment in range(self.first_segment, keep):
+            path = self._segment_path(segment)
+            if os.path.exists(path):
+                freed += os.path.getsize(path)
+                os.remove(path)
+            # earlier maps may still back memoryviews handed out to callers
+            self.segment_maps.pop(segment, None)
+        self.first_segment = max(self.first_segment, keep)
+        return freed
+
+    def hash_at(self, height: int) -> Optional[bytes]:
+        position = self._position(height)
+        if position is None:
+            return None
+        return self._record(position)[1]
+
+    def height_of(self, block_hash: bytes) -> Optional[int]:
+        if self.hash_index is None:
+            # only built for callers that look bodies up by hash alone
+            self.hash_index = {}
+            for position in range(self.count):
+                height, h, _, _, _ = self._record(position)
+                self.hash_index[h] = height
+        return self.hash_index.get(block_hash)
+
+    def get_by_hash(self, block_hash: bytes) -> Optional[memoryview]:
+        height = self.height_of(block_hash)
+        if height is None:
+            return None
+        return self.get_by_height(height)
+
+    def flush(self) -> None:
+        self.segment_file.flush()  # type: ignore
+        self.index_file.flush()
+
+    def sync(self) -> None:
+        self.flush()
+        os.fsync(self.segment_file.fileno())  # type: ignore
+        os.fsync(self.index_file.fileno())
+
+    def close(self) -> None:
+        self.flush()
+        self.segment_file.close()  # type: ignore
+        self.index_file.close()
+        self.index_map = None
+        self.segment_maps.clear()
+
+    def __len__(self) -> int:
+        return self.count
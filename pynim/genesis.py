@@ -1,5 +1,6 @@
 import json
 from pathlib import Path
+from typing import Optional
 
 from pynim.account import Account
 from pynim.datatypes import Block, Header, Transaction
@@ -10,10 +11,15 @@ from pynim.vm.machine import Machine
 
 
 class GenesisBlock(Block, Serializable):
-    def __init__(self, current_time: int, account: Account) -> None:
+    def __init__(
+        self,
+        current_time: int,
+        account: Account,
+        transactions: Optional[list[Transaction]] = None,
+    ) -> None:
         self.current_time = current_time
         self.account = account
-        self.header: Header = Header(
+        header = Header(
             timestamp=current_time,
             parent_hash=b"\x00" * 32,
             number=1,
@@ -24,16 +30,18 @@ class GenesisBlock(Block, Serializable):
 
         self.vm = Machine()
 
-        self.transactions: list[Transaction] = [
-            create_coinbase_transaction(
-                current_time=current_time,
-                sender=account,
-                recipient=account.address,
-                value=nim_to_wei(100),
-                input_data=self.vm.code,
-                vm=self.vm,
-            )
-        ]
+        if transactions is None:
+            transactions = [
+                create_coinbase_transaction(
+                    current_time=current_time,
+                    sender=account,
+                    recipient=account.address,
+                    value=nim_to_wei(100),
+                    input_data=self.vm.code,
+                    vm=self.vm,
+                )
+            ]
+        super().__init__(header=header, transactions=transactions, cached_hash=None)
 
     def hash(self) -> bytes:
         return keccak256(self.serialize())
@@ -57,24 +65,31 @@ class GenesisBlock(Block, Serializable):
 
         account = Account.load("account.json")
 
-        genesis = cls(current_time=data["current_time"], account=account)
-
-        if "input_data" in data:
-            genesis.vm.code = bytes.fromhex(data["input_data"])
+        input_data = (
+            bytes.fromhex(data["input_data"]) if "input_data" in data else None
+        )
 
+        # transactions are immutable, so they are built before the block
         txs = []
-        for tx_hash_hex in data.get("transactions", []):
+        for _ in data.get("transactions", []):
             tx = Transaction(
                 timestamp=data["current_time"],
-                hash=bytes.fromhex(tx_hash_hex) if tx_hash_hex else None,
+                hash=None,  # recomputed on demand rather than trusted
                 nonce=0,
                 sender=account.address,
                 recipient=account.address,
                 value=nim_to_wei(100),
-                input_data=genesis.vm.code,
+                input_data=input_data,
                 signature=None,
+                gas=0,
+                gas_price=0,
             )
             txs.append(tx)
-        genesis.transactions = txs
+
+        genesis = cls(
+            current_time=data["current_time"], account=account, transactions=txs
+        )
+        if input_data is not None:
+            genesis.vm.code = input_data
 
         return genesis
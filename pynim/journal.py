@@ -0,0 +1,130 @@
+import os
+import struct
+import threading
+from typing import Iterable
+
+from pynim.datatypes import Transaction
+
+JOURNAL_FILE = "mempool.journal"
+# below this many records the journal is never worth rewriting
+COMPACT_MIN_RECORDS = 4096
+
+# record kind, arrival time, payload length; an addition's payload is the
+# transaction hash followed by its encoding, a removal's is just the hash
+RECORD_HEADER = struct.Struct(">cdI")
+ADD = b"A"
+REMOVE = b"R"
+HASH_SIZE = 32
+
+
+def _add_record(transaction: Transaction, arrival: float) -> bytes:
+    raw = transaction.serialize()
+    return (
+        RECORD_HEADER.pack(ADD, arrival, HASH_SIZE + len(raw)) + transaction.hash + raw
+    )
+
+
+class TransactionJournal:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        self.records = 0
+        # raw records of the last replay by hash, so restored entries can be
+        # written back without re-encoding them
+        self.replayed: dict[bytes, bytes] = {}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "a+b")
+
+    def replay(self) -> list[tuple[Transaction, float]]:
+        # surviving admissions in journal order, with their arrival times
+        with self.lock:
+            self.file.flush()
+            with open(self.path, "rb") as f:
+                data = f.read()
+
+            live: dict[bytes, tuple[int, int, float]] = {}
+            records = 0
+            offset = 0
+            while offset + RECORD_HEADER.size <= len(data):
+                kind, arrival, length = RECORD_HEADER.unpack_from(data, offset)
+                start = offset + RECORD_HEADER.size
+                end = start + length
+                if end > len(data) or kind not in (ADD, REMOVE) or length < HASH_SIZE:
+                    break
+                h = data[start : start + HASH_SIZE]
+                if kind == ADD:
+                    live[h] = (offset, end, arrival)
+                else:
+                    live.pop(h, None)
+                records += 1
+                offset = end
+
+            # a torn final record from a crash is dropped
+            if offset != len(data):
+                self.file.truncate(offset)
+            self.records = records
+
+            entries = []
+            self.replayed = {}
+            for h, (offset, end, arrival) in live.items():
+                raw = data[offset + RECORD_HEADER.size + HASH_SIZE : end]
+                transaction = Transaction.deserialize(raw)
+                if transaction.hash != h:
+                    continue
+                entries.append((transaction, arrival))
+                self.replayed[h] = data[offset:end]
+        return entries
+
+    def retain(self, records: Iterable[bytes]) -> None:
+        # rewrites the journal from records kept by replay()
+        self.replayed = {}
+        self._rewrite(list(records))
+
+    def append_add(self, transaction: Transaction, arrival: float) -> None:
+        with self.lock:
+            self.file.write(_add_record(transaction, arrival))
+            self.file.flush()
+            self.records += 1
+
+    def append_remove(self, transaction_hash: bytes) -> None:
+        with self.lock:
+            self.file.write(
+                RECORD_HEADER.pack(REMOVE, 0.0, len(transaction_hash))
+                + transaction_hash
+            )
+            self.file.flush()
+            self.records += 1
+
+    def should_compact(self, live: int) -> bool:
+        return self.records > 2 * live + COMPACT_MIN_RECORDS
+
+    def compact(self, entries: Iterable[tuple[Transaction, float]]) -> None:
+        self._rewrite([_add_record(tx, arrival) for tx, arrival in entries])
+
+    def _rewrite(self, records: list[bytes]) -> None:
+        # the rewritten journal replaces the old one atomically, so a crash
+        # mid-way leaves one of the two intact
+        tmp_path = self.path + ".tmp"
+        with self.lock:
+            with open(tmp_path, "wb") as f:
+                f.write(b"".join(records))
+                f.flush()
+                os.fsync(f.fileno())
+            self.file.close()
+            os.replace(tmp_path, self.path)
+            self.file = open(self.path, "a+b")
+            self.records = len(records)
+
+    def reset(self) -> None:
+        self._rewrite([])
+
+    def sync(self) -> None:
+        with self.lock:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self) -> None:
+        with self.lock:
+            self.file.close()
@@ -0,0 +1,112 @@
+from typing import Iterator, Optional
+
+import plyvel
+
+from pynim.database import (
+    NS_DEFAULT,
+    BaseDatabase,
+    DatabaseConfig,
+    KeyValueReader,
+    WriteBatch,
+    key_range,
+    prefix_upper_bound,
+)
+
+NAMESPACE_SEPARATOR = b"/"
+
+
+def namespace_prefix(namespace: str) -> bytes:
+    return namespace.encode() + NAMESPACE_SEPARATOR
+
+
+def _leveldb_iterate(
+    source,
+    namespace: str,
+    prefix: Optional[bytes],
+    start: Optional[bytes],
+    stop: Optional[bytes],
+    reverse: bool,
+) -> Iterator[tuple[bytes, bytes]]:
+    ns = namespace_prefix(namespace)
+    start, stop = key_range(prefix, start, stop)
+    # plyvel does not accept prefix together with start/stop, so map the
+    # namespaced range onto absolute keys ourselves
+    absolute_start = ns + start if start is not None else ns
+    absolute_stop = ns + stop if stop is not None else prefix_upper_bound(ns)
+
+    offset = len(ns)
+    with source.iterator(
+        start=absolute_start, stop=absolute_stop, reverse=reverse
+    ) as it:
+        for key, value in it:
+            yield key[offset:], value
+
+
+class LevelDBSnapshot(KeyValueReader):
+    def __init__(self, snapshot) -> None:
+        self.snapshot = snapshot
+
+    def read(self, k: bytes, namespace: str = NS_DEFAULT) -> Optional[bytes]:
+        return self.snapshot.get(namespace_prefix(namespace) + k)
+
+    def iterate(
+        self,
+        namespace: str = NS_DEFAULT,
+        prefix: Optional[bytes] = None,
+        start: Optional[bytes] = None,
+        stop: Optional[bytes] = None,
+        reverse: bool = False,
+    ) -> Iterator[tuple[bytes, bytes]]:
+        return _leveldb_iterate(self.snapshot, namespace, prefix, start, stop, reverse)
+
+    def close(self) -> None:
+        self.snapshot.close()
+
+
+class LevelDBDatabase(BaseDatabase):
+    def __init__(self, path: str, config: Optional[DatabaseConfig] = None) -> None:
+        self.path = path
+        self.config = config or DatabaseConfig(engine="leveldb")
+        self.db = plyvel.DB(
+            path,
+            create_if_missing=True,
+            lru_cache_size=self.config.leveldb_cache_size,
+            write_buffer_size=self.config.leveldb_write_buffer_size,
+            bloom_filter_bits=self.config.leveldb_bloom_filter_bits,
+        )
+
+    def write(self, k: bytes, v: bytes, namespace: str = NS_DEFAULT) -> None:
+        self.db.put(namespace_prefix(namespace) + k, v)
+
+    def read(self, k: bytes, namespace: str = NS_DEFAULT) -> Optional[bytes]:
+        return self.db.get(namespace_prefix(namespace) + k)
+
+    def delete(self, k: bytes, namespace: str = NS_DEFAULT) -> None:
+        self.db.delete(namespace_prefix(namespace) + k)
+
+    def iterate(
+        self,
+        namespace: str = NS_DEFAULT,
+        prefix: Optional[bytes] = None,
+        start: Optional[bytes] = None,
+        stop: Optional[bytes] = None,
+        reverse: bool = False,
+    ) -> Iterator[tuple[bytes, bytes]]:
+        return _leveldb_iterate(self.db, namespace, prefix, start, stop, reverse)
+
+    def apply_batch(self, batch: WriteBatch) -> None:
+        with self.db.write_batch(transaction=True) as wb:
+            for namespace, k, v in batch.operations:
+                if v is None:
+                    wb.delete(namespace_prefix(namespace) + k)
+                else:
+                    wb.put(namespace_prefix(namespace) + k, v)
+
+    def snapshot(self) -> LevelDBSnapshot:
+        return LevelDBSnapshot(self.db.snapshot())
+
+    def compact(self) -> None:
+        self.db.compact_range()
+
+    def close(self) -> None:
+        self.db.close()
@@ -3,8 +3,10 @@ import logging
 import socket
 import threading
 
-from typing import Tuple
+from typing import Optional, Tuple
+from pynim.chainstore import ChainStore
 from pynim.net.peer import Peer
+from pynim.net.sync import SYNC_KINDS, ChainSync, SyncConfig, SyncStats, serve
 
 logger = logging.getLogger()
 
@@ -19,11 +21,22 @@ def peer_address_tuple(peer: Peer) -> Tuple[str, int]:
 
 
 class Node:
-    def __init__(self, host: str = "0.0.0.0", port: int = 4343) -> None:
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 4343,
+        chain_store: Optional[ChainStore] = None,
+    ) -> None:
         self.host = host
         self.port = port
         self.peers: list[Peer] = []
         self.running: bool = False
+        # answers sync requests from other nodes when set
+        self.chain_store = chain_store
+        # shared with the chain writing to the store
+        self.chain_lock = (
+            chain_store.lock if chain_store is not None else threading.RLock()
+        )
 
     def start(self) -> None:
         self.running = True
@@ -57,6 +70,9 @@ class Node:
                     data = conn.recv(4096)
                     if not data:
                         break
+                    if data[0] in SYNC_KINDS and self.chain_store is not None:
+                        serve(conn, self.chain_store, self.chain_lock, data)
+                        break
                     msg = json.loads(data.decode())
                     logger.info("Received raw msg: %s", msg)
                     self._route(msg, conn)
@@ -89,6 +105,11 @@ class Node:
         except Exception as e:
             logger.exception("Failed to send to %s: %s", addr, e)
 
+    def sync(self, blockchain, config: Optional[SyncConfig] = None) -> SyncStats:
+        # catches the chain up from every known peer, headers first
+        peers = [peer_address_tuple(peer) for peer in self.peers]
+        return ChainSync(blockchain, peers, config).run()
+
     def broadcast(self, message: dict):
         logger.info("Broadcasting %s to %d peers", message.get("type"), len(self.peers))
         for peer in list(self.peers):
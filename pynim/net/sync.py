@@ -0,0 +1,377 @@
+import logging
+import queue
+import socket
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+from pynim import rlp
+from pynim.chainstore import ChainStore
+from pynim.datatypes import Block, Header
+from pynim.hashes import keccak256
+from pynim.views import BlockView
+
+logger = logging.getLogger()
+
+# message kind, payload length; JSON messages start with "{", so the first
+# byte tells a sync session apart from the gossip protocol
+FRAME_HEADER = struct.Struct(">BI")
+MAX_FRAME = 64 * 1024 * 1024
+
+GET_STATUS = 0x01
+STATUS = 0x02
+GET_HEADERS = 0x03
+HEADERS = 0x04
+GET_BODIES = 0x05
+BODIES = 0x06
+SYNC_KINDS = frozenset((GET_STATUS, GET_HEADERS, GET_BODIES))
+
+# most headers a peer serves per request
+MAX_HEADERS = 2048
+
+
+class SyncError(Exception):
+    """Raised when chain sync cannot make progress with the available peers"""
+
+    pass
+
+
+@dataclass
+class SyncConfig:
+    header_batch: int = 512
+    body_batch: int = 64
+    # body batches requested but not yet applied, across all peers
+    max_in_flight: int = 16
+    # blocks imported per database commit
+    commit_batch: int = 256
+    timeout: float = 10.0
+
+
+@dataclass
+class SyncStats:
+    headers: int = 0
+    blocks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def blocks_per_second(self) -> float:
+        return self.blocks / self.seconds if self.seconds else 0.0
+
+
+def _recv_exact(sock: socket.socket, size: int, buf: bytes = b"") -> bytes:
+    data = bytearray(buf)
+    while len(data) < size:
+        chunk = sock.recv(max(size - len(data), 65536))
+        if not chunk:
+            raise ConnectionError("connection closed mid-frame")
+        data += chunk
+    return bytes(data)
+
+
+def send_frame(sock: socket.socket, kind: int, payload: bytes) -> None:
+    sock.sendall(FRAME_HEADER.pack(kind, len(payload)) + payload)
+
+
+def recv_frame(sock: socket.socket, buf: bytes = b"") -> tuple[int, bytes, bytes]:
+    # returns the frame and whatever was read past its end
+    data = _recv_exact(sock, FRAME_HEADER.size, buf)
+    kind, length = FRAME_HEADER.unpack_from(data)
+    if length > MAX_FRAME:
+        raise SyncError(f"frame of {length} bytes exceeds the limit")
+    end = FRAME_HEADER.size + length
+    data = _recv_exact(sock, end, data)
+    return kind, data[FRAME_HEADER.size : end], data[end:]
+
+
+def serve(
+    conn: socket.socket,
+    store: ChainStore,
+    lock: threading.RLock,
+    buf: bytes = b"",
+) -> None:
+    # answers sync requests on one connection until the peer hangs up; the
+    # lock serialises store access with the chain and the node's other
+    # connections
+    while True:
+        try:
+            kind, payload, buf = recv_frame(conn, buf)
+        except ConnectionError:
+            return
+        with lock:
+            kind, payload = _answer(store, kind, payload)
+        send_frame(conn, kind, payload)
+
+
+def _answer(store: ChainStore, kind: int, payload: bytes) -> tuple[int, bytes]:
+    if kind == GET_STATUS:
+        head = store.head_header()
+        status = [
+            rlp.encode_int(head.number if head is not None else 0),
+            store.head_hash or b"",
+        ]
+        return STATUS, rlp.encode(status)
+
+    if kind == GET_HEADERS:
+        start, count = (rlp.decode_int(x) for x in rlp.decode(payload))
+        headers = []
+        for number in range(start, start + min(count, MAX_HEADERS)):
+            block_hash = store.get_block_hash(number)
+            raw = store.get_header_bytes(block_hash) if block_hash else None
+            if raw is None:
+                break
+            headers.append(raw)
+        return HEADERS, rlp.encode(headers)
+
+    if kind == GET_BODIES:
+        bodies = []
+        for block_hash in rlp.decode(payload):
+            raw = store.get_block_bytes(bytes(block_hash))
+            # pruned or unknown bodies come back empty
+            bodies.append(bytes(raw) if raw is not None else b"")
+        return BODIES, rlp.encode(bodies)
+
+    raise SyncError(f"unexpected sync message {kind:#x}")
+
+
+class PeerConnection:
+    def __init__(self, address: tuple[str, int], timeout: float) -> None:
+        self.address = address
+        self.sock = socket.create_connection(address, timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.buf = b""
+
+    def request(self, kind: int, payload: bytes, reply: int) -> bytes:
+        send_frame(self.sock, kind, payload)
+        got, data, self.buf = recv_frame(self.sock, self.buf)
+        if got != reply:
+            raise SyncError(f"expected message {reply:#x}, got {got:#x}")
+        return data
+
+    def status(self) -> tuple[int, bytes]:
+        number, head_hash = rlp.decode(self.request(GET_STATUS, b"", STATUS))
+        return rlp.decode_int(number), bytes(head_hash)
+
+    def headers(self, start: int, count: int) -> list[bytes]:
+        payload = rlp.encode([rlp.encode_int(start), rlp.encode_int(count)])
+        return rlp.decode(self.request(GET_HEADERS, payload, HEADERS))  # type: ignore
+
+    def bodies(self, hashes: Sequence[bytes]) -> list[bytes]:
+        payload = rlp.encode(list(hashes))
+        return rlp.decode(self.request(GET_BODIES, payload, BODIES))  # type: ignore
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+class ChainSync:
+    def __init__(
+        self,
+        blockchain,
+        peers: Sequence[tuple[str, int]],
+        config: Optional[SyncConfig] = None,
+    ) -> None:
+        self.blockchain = blockchain
+        self.peers = list(peers)
+        self.config = config or SyncConfig()
+
+        self.tasks: queue.Queue = queue.Queue()
+        self.results: dict[int, list[bytes]] = {}
+        self.task_count: Optional[int] = None
+        self.error: Optional[BaseException] = None
+        self.active_workers = 0
+        self.condition = threading.Condition()
+        self.window = threading.Semaphore(self.config.max_in_flight)
+
+    def run(self) -> SyncStats:
+        # headers, bodies and imports run as a pipeline: header ranges are
+        # verified and turned into body requests while earlier bodies are
+        # still downloading and earlier blocks are being imported
+        stats = SyncStats()
+        started = time.perf_counter()
+        connections = []
+        threads: list[threading.Thread] = []
+        for address in self.peers:
+            try:
+                connections.append(PeerConnection(address, self.config.timeout))
+            except OSError as e:
+                logger.warning("Sync peer %s:%s unreachable: %s", *address, e)
+        if not connections:
+            raise SyncError("no reachable peers")
+
+        try:
+            statuses = [connection.status() for connection in connections]
+            target, _ = max(statuses)
+            head = self.blockchain.current_block
+            first = head.header.number + 1
+            if target < first:
+                return stats
+            logger.info(
+                "Syncing blocks %d..%d from %d peers", first, target, len(statuses)
+            )
+
+            threads = [
+                threading.Thread(
+                    target=self._fetch_bodies,
+                    args=(connection,),
+                    name="sync-bodies",
+                    daemon=True,
+                )
+                for connection in connections
+            ]
+            self.active_workers = len(threads)
+            # headers come over a connection of their own, so they never
+            # queue behind body requests to the same peer
+            best = connections[statuses.index(max(statuses))]
+            header_connection = PeerConnection(best.address, self.config.timeout)
+            connections.append(header_connection)
+            threads.append(
+                threading.Thread(
+                    target=self._fetch_headers,
+                    args=(
+                        header_connection,
+                        head.hash(),
+                        head.header,
+                        first,
+                        target,
+                        stats,
+                    ),
+                    name="sync-headers",
+                    daemon=True,
+                )
+            )
+            for thread in threads:
+                thread.start()
+
+            stats.blocks = self._apply()
+        finally:
+            # stops whichever workers are still waiting for work
+            self._fail(SyncError("sync stopped"))
+            self.tasks.put(None)
+            for connection in connections:
+                connection.close()
+            for thread in threads:
+                thread.join(self.config.timeout)
+
+        stats.seconds = time.perf_counter() - started
+        return stats
+
+    def _fail(self, error: BaseException) -> None:
+        with self.condition:
+            if self.error is None:
+                self.error = error
+            self.condition.notify_all()
+        # wakes the header thread if it waits for a free slot in the window
+        self.window.release(self.config.max_in_flight)
+
+    def _fetch_headers(
+        self,
+        connection: PeerConnection,
+        parent_hash: bytes,
+        parent: Header,
+        first: int,
+        target: int,
+        stats: SyncStats,
+    ) -> None:
+        consensus = self.blockchain.consensus
+        sequence = 0
+        number = first
+        try:
+            while number <= target:
+                count = min(self.config.header_batch, target - number + 1)
+                raws = connection.headers(number, count)
+                if not raws:
+                    raise SyncError(f"peer has no headers from {number}")
+                headers = [Header.deserialize(raw) for raw in raws]
+                hashes = [keccak256(raw) for raw in raws]
+                if not consensus.validate_header_range(
+                    parent_hash, parent, headers, hashes
+                ):
+                    raise SyncError(f"invalid header range from {number}")
+                stats.headers += len(headers)
+
+                for i in range(0, len(hashes), self.config.body_batch):
+                    # blocks once max_in_flight batches await import
+                    self.window.acquire()
+                    if self.error is not None:
+                        return
+                    self.tasks.put((sequence, hashes[i : i + self.config.body_batch]))
+                    sequence += 1
+                parent_hash, parent = hashes[-1], headers[-1]
+                number += len(headers)
+        except Exception as e:
+            self._fail(e)
+            return
+
+        with self.condition:
+            self.task_count = sequence
+            self.condition.notify_all()
+        self.tasks.put(None)
+
+    def _fetch_bodies(self, connection: PeerConnection) -> None:
+        while True:
+            task = self.tasks.get()
+            if task is None or self.error is not None:
+                # hand the stop marker on to the next worker
+                self.tasks.put(None)
+                return
+            sequence, hashes = task
+            try:
+                bodies = connection.bodies(hashes)
+                if len(bodies) != len(hashes):
+                    raise SyncError("body count does not match the request")
+                for raw, block_hash in zip(bodies, hashes):
+                    # a body must carry exactly the header that was verified
+                    if not raw or BlockView(raw).hash() != block_hash:
+                        raise SyncError(f"bad body for {block_hash.hex()}")
+            except Exception as e:
+                logger.warning("Dropping sync peer %s:%s: %s", *connection.address, e)
+                # another peer picks the batch up
+                self.tasks.put(task)
+                with self.condition:
+                    self.active_workers -= 1
+                    if self.active_workers == 0:
+                        self.error = self.error or SyncError("all peers failed")
+                    self.condition.notify_all()
+                return
+
+            with self.condition:
+                self.results[sequence] = bodies
+                self.condition.notify_all()
+
+    def _apply(self) -> int:
+        imported = 0
+        pending: list[Block] = []
+        sequence = 0
+        while True:
+            with self.condition:
+                while (
+                    sequence not in self.results
+                    and self.error is None
+                    and (self.task_count is None or sequence < self.task_count)
+                ):
+                    self.condition.wait()
+                if sequence not in self.results:
+                    if self.error is not None:
+                        raise self.error
+                    break
+                bodies = self.results.pop(sequence)
+            self.window.release()
+            sequence += 1
+
+            pending.extend(Block.deserialize(raw) for raw in bodies)
+            if len(pending) >= self.config.commit_batch:
+                imported += self._import(pending)
+                pending = []
+        if pending:
+            imported += self._import(pending)
+        return imported
+
+    def _import(self, blocks: list[Block]) -> int:
+        imported = self.blockchain.import_blocks(blocks)
+        if imported != len(blocks):
+            raise SyncError(
+                f"block {blocks[imported].header.number} failed validation"
+            )
+        return imported
@@ -0,0 +1,208 @@
+from typing import Union
+
+Item = Union[bytes, list]
+
+SHORT_STRING = 0x80
+LONG_STRING = 0xB7
+SHORT_LIST = 0xC0
+LONG_LIST = 0xF7
+
+
+class DecodingError(Exception):
+    """Raised when bytes are not a canonical RLP encoding"""
+
+    pass
+
+
+def encode_int(value: int) -> bytes:
+    if value < 0:
+        raise ValueError("cannot encode negative integer")
+    return value.to_bytes((value.bit_length() + 7) // 8, "big")
+
+
+def decode_int(b: bytes) -> int:
+    if b and b[0] == 0:
+        raise DecodingError("integer has leading zero bytes")
+    return int.from_bytes(b, "big")
+
+
+def _encode_length(length: int, short: int, long: int) -> bytes:
+    if length <= 55:
+        return bytes([short + length])
+    length_bytes = encode_int(length)
+    return bytes([long + len(length_bytes)]) + length_bytes
+
+
+# prefixes for every length that fits in one length byte, which covers
+# nearly every field and transaction, so most items never build one
+_STRING_PREFIXES = [_encode_length(n, SHORT_STRING, LONG_STRING) for n in range(256)]
+_LIST_PREFIXES = [_encode_length(n, SHORT_LIST, LONG_LIST) for n in range(256)]
+
+
+def encode(item: Item) -> bytes:
+    # exact type checks first: this is the hot path for every hash computation
+    if type(item) is bytes:
+        n = len(item)
+        if n == 1 and item[0] < SHORT_STRING:
+            return item
+        if n < 256:
+            return _STRING_PREFIXES[n] + item
+        return _encode_length(n, SHORT_STRING, LONG_STRING) + item
+    if type(item) is list:
+        parts: list[bytes] = []
+        append = parts.append
+        for x in item:
+            # strings are inlined, so a flat list is encoded without a
+            # call per field
+            if type(x) is bytes:
+                n = len(x)
+                if n == 1 and x[0] < SHORT_STRING:
+                    append(x)
+                    continue
+                if n < 256:
+                    append(_STRING_PREFIXES[n])
+                else:
+                    append(_encode_length(n, SHORT_STRING, LONG_STRING))
+                append(x)
+            else:
+                append(encode(x))
+        payload = b"".join(parts)
+        n = len(payload)
+        if n < 256:
+            return _LIST_PREFIXES[n] + payload
+        return _encode_length(n, SHORT_LIST, LONG_LIST) + payload
+    if isinstance(item, (bytes, bytearray, memoryview)):
+        return encode(bytes(item))
+    if isinstance(item, list):
+        return encode(list(item))
+    raise TypeError(f"cannot RLP encode {type(item).__name__}")
+
+
+# returns (payload offset, payload length, is list) for the item at pos
+def decode_length(buf, pos: int) -> tuple[int, int, bool]:
+    if pos >= len(buf):
+        raise DecodingError("unexpected end of input")
+    prefix = buf[pos]
+
+    if prefix < SHORT_STRING:
+        return pos, 1, False
+
+    if prefix <= LONG_STRING:
+        length = prefix - SHORT_STRING
+        if length == 1 and pos + 1 < len(buf) and buf[pos + 1] < SHORT_STRING:
+            raise DecodingError("single byte must be encoded as itself")
+        offset, is_list = pos + 1, False
+    elif prefix < SHORT_LIST:
+        offset, length = _decode_long_length(buf, pos, prefix - LONG_STRING)
+        is_list = False
+    elif prefix <= LONG_LIST:
+        length = prefix - SHORT_LIST
+        offset, is_list = pos + 1, True
+    else:
+        offset, length = _decode_long_length(buf, pos, prefix - LONG_LIST)
+        is_list = True
+
+    if offset + length > len(buf):
+        raise DecodingError("item length exceeds input")
+    return offset, length, is_list
+
+
+def _decode_long_length(buf, pos: int, size: int) -> tuple[int, int]:
+    length_bytes = bytes(buf[pos + 1 : pos + 1 + size])
+    if len(length_bytes) < size:
+        raise DecodingError("unexpected end of input")
+    if length_bytes[0] == 0:
+        raise DecodingError("length has leading zero bytes")
+    length = int.from_bytes(length_bytes, "big")
+    if length <= 55:
+        raise DecodingError("long form used for short item")
+    return pos + 1 + size, length
+
+
+def _decode(buf, pos: int) -> tuple[Item, int]:
+    offset, length, is_list = decode_length(buf, pos)
+    end = offset + length
+    if not is_list:
+        return buf[offset:end], end
+
+    items = []
+    while offset < end:
+        prefix = buf[offset]
+        # inline the short string cases, which make up most fields
+        if prefix < SHORT_STRING:
+            items.append(buf[offset : offset + 1])
+            offset += 1
+        elif prefix <= LONG_STRING and prefix != SHORT_STRING + 1:
+            item_end = offset + 1 + prefix - SHORT_STRING
+            if item_end > end:
+                raise DecodingError("item length exceeds input")
+            items.append(buf[offset + 1 : item_end])
+            offset = item_end
+        elif prefix == LONG_STRING + 1:
+            # one length byte, as for signatures
+            if offset + 1 >= end:
+                raise DecodingError("unexpected end of input")
+            length = buf[offset + 1]
+            if length <= 55:
+                raise DecodingError("long form used for short item")
+            item_end = offset + 2 + length
+            if item_end > end:
+                raise DecodingError("item length exceeds input")
+            items.append(buf[offset + 2 : item_end])
+            offset = item_end
+        else:
+            item, offset = _decode(buf, offset)
+            items.append(item)
+    if offset != end:
+        raise DecodingError("list payload length mismatch")
+    return items, end
+
+
+def decode(data) -> Item:
+    # slicing bytes is much cheaper than slicing a memoryview item by item
+    buf = data if type(data) is bytes else bytes(data)
+    item, end = _decode(buf, 0)
+    if end != len(buf):
+        raise DecodingError("trailing bytes after RLP item")
+    return item
+
+
+def list_spans(buf, pos: int = 0, exact: bool = True) -> list[tuple[int, int]]:
+    # (start, end) of each element of the list at pos, prefixes included
+    offset, length, is_list = decode_length(buf, pos)
+    if not is_list:
+        raise DecodingError("expected an RLP list")
+    end = offset + length
+    if exact and end != len(buf):
+        raise DecodingError("trailing bytes after RLP item")
+
+    spans = []
+    while offset < end:
+        prefix = buf[offset]
+        # short strings are sized by their prefix alone; an overrun shows
+        # up as a length mismatch below
+        if prefix < SHORT_STRING:
+            item_end = offset + 1
+        elif prefix <= LONG_STRING and prefix != SHORT_STRING + 1:
+            item_end = offset + 1 + prefix - SHORT_STRING
+        else:
+            item_offset, item_length, _ = decode_length(buf, offset)
+            item_end = item_offset + item_length
+        spans.append((offset, item_end))
+        offset = item_end
+    if offset != end:
+        raise DecodingError("list payload length mismatch")
+    return spans
+
+
+def string_payload(buf, start: int, end: int):
+    # payload slice of the string item spanning [start, end)
+    offset, length, is_list = decode_length(buf, start)
+    if is_list or offset + length != end:
+        raise DecodingError("expected an RLP string")
+    return buf[offset:end]
+
+
+def split(data) -> list:
+    # raw element slices keep their prefixes, so they can be hashed or decoded
+    return [data[start:end] for start, end in list_spans(data)]
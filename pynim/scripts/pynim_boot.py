@@ -1,16 +1,90 @@
+import json
+import logging
+import os
 import time
+from argparse import ArgumentParser
 
 from pynim.account import Account
 from pynim.blockchain import Blockchain
+from pynim.chainstore import ChainStore
+from pynim.consensus import ConsensusEngine
+from pynim.database import DatabaseConfig
 from pynim.genesis import GenesisBlock
+from pynim.journal import JOURNAL_FILE, TransactionJournal
 from pynim.net.logger import init_logging
 from pynim.net.node import Node
+from pynim.transaction_pool import ShardedTransactionPool, TransactionPool
+from pynim.vm.machine import Machine
 
 
 def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--datadir", help="Directory with the blockchain data")
+    parser.add_argument(
+        "--config",
+        help="JSON node config; its \"database\" object sets the storage engine "
+        "and SQLite pragmas",
+    )
+    parser.add_argument(
+        "--pool-shards",
+        type=int,
+        default=1,
+        help="Split the transaction pool into this many independently locked "
+        "shards (default: 1, a single pool)",
+    )
+
+    args = parser.parse_args()
+
     init_logging()
 
-    node1 = Node(port=4040)
+    account = Account.load("account.json")
+    gb = GenesisBlock(current_time=int(time.time()), account=account)
+
+    chain_store = None
+    blockchain = None
+    db_config = None
+    if args.config:
+        with open(args.config, "r") as f:
+            db_config = DatabaseConfig.from_dict(json.load(f).get("database", {}))
+
+    if args.datadir:
+        chain_store = ChainStore.open(args.datadir, db_config)
+        logging.getLogger().info(
+            "Opened chain store at %s (head height: %s)",
+            args.datadir,
+            chain_store.head_number(),
+        )
+
+        transaction_pool: TransactionPool | ShardedTransactionPool
+        if args.pool_shards > 1:
+            transaction_pool = ShardedTransactionPool(
+                args.pool_shards, journal_dir=args.datadir
+            )
+        else:
+            transaction_pool = TransactionPool(
+                journal=TransactionJournal(os.path.join(args.datadir, JOURNAL_FILE))
+            )
+        restored = transaction_pool.restore(chain_store.has_transaction)
+        logging.getLogger().info("Restored %d pooled transactions", restored)
+
+        # resumes from the stored head, with the restored pool
+        consensus = ConsensusEngine(
+            0, {account.address: 1}, [account.address], chain_store
+        )
+        blockchain = Blockchain(
+            "pynim",
+            gb,
+            None,
+            chain_store,
+            chain_store.db,
+            [account],
+            Machine(),
+            consensus,
+            transaction_pool,
+        )
+
+    # the first node answers sync requests from the chain store
+    node1 = Node(port=4040, chain_store=chain_store)
     node2 = Node(port=5042)
 
     node1.start()
@@ -20,9 +94,14 @@ def main() -> None:
 
     time.sleep(1)
 
-    gb = GenesisBlock(current_time=int(time.time()), account=Account.load("account.json"))
-
     node1.broadcast({"type": "block", "data": gb.to_dict()})
 
-    while True:
-        time.sleep(1)
+    try:
+        while True:
+            time.sleep(1)
+    finally:
+        if blockchain is not None:
+            blockchain.close()
+            transaction_pool.close()
+        if chain_store is not None:
+            chain_store.close()
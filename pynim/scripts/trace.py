@@ -0,0 +1,97 @@
+import json
+import sys
+from argparse import ArgumentParser
+from typing import Optional, TextIO
+
+from pynim.chainstore import ChainStore
+from pynim.database import NS_TX_INDEX
+from pynim.vm.executor import block_environment
+from pynim.vm.machine import Machine
+from pynim.vm.state import JournaledState, PersistentState, StorageView
+from pynim.vm.tracer import Tracer
+
+
+def print_profile(tracer: Tracer) -> None:
+    print(f"{'opcode':<12} {'count':>8} {'gas':>10} {'gas %':>6} {'time us':>10}")
+    for name, profile in tracer.to_dict()["opcodes"].items():
+        share = profile["gas"] / tracer.gas_used if tracer.gas_used else 0.0
+        print(
+            f"{name:<12} {profile['count']:>8} {profile['gas']:>10} "
+            f"{share:>6.1%} {profile['ns'] / 1000:>10.1f}"
+        )
+    print(
+        f"\n{tracer.steps} steps, {tracer.gas_used} gas, "
+        f"{tracer.nanoseconds / 1000:.1f} us, peak stack {tracer.peak_stack}"
+    )
+    if tracer.error is not None:
+        print(f"stopped with an error: {tracer.error}")
+
+
+def main() -> None:
+    parser = ArgumentParser(
+        description="Replay a transaction's input data with the VM tracer on"
+    )
+    parser.add_argument("transaction", nargs="?", help="Transaction hash (hex)")
+    parser.add_argument("--datadir", help="Directory with the blockchain data")
+    parser.add_argument("--code", help="Bytecode (hex) to run instead")
+    parser.add_argument("--gas", type=int, help="Gas limit (default: the tx's)")
+    parser.add_argument("--trace", help="Write every step as JSON Lines (- for stdout)")
+    parser.add_argument("--json", action="store_true", help="Print the profile as JSON")
+
+    args = parser.parse_args()
+
+    machine = Machine()
+    code: Optional[bytes] = None
+    gas = args.gas
+    store = None
+    if args.code is not None:
+        code = bytes.fromhex(args.code)
+        gas = gas if gas is not None else 1_000_000
+    elif args.transaction and args.datadir:
+        store = ChainStore.open(args.datadir)
+        transaction_hash = bytes.fromhex(args.transaction)
+        transaction = store.get_transaction(transaction_hash)
+        if transaction is None or not transaction.input_data:
+            parser.error(f"no transaction with input data: {args.transaction}")
+        code = transaction.input_data
+        gas = gas if gas is not None else transaction.gas
+
+        # replayed on the current state; stores go to a journal that is
+        # never written back
+        state = JournaledState(PersistentState(store.db))
+        block_hash = store.db.read(transaction_hash, NS_TX_INDEX)
+        header = store.get_header(block_hash) if block_hash is not None else None
+        machine = Machine(
+            int.from_bytes(transaction.recipient, "big"),
+            state.balance(transaction.sender),
+            transaction.gas_price,
+            block_environment(header) if header is not None else None,
+        )
+        machine.storage = StorageView(state, transaction.recipient)  # type: ignore
+    else:
+        parser.error("give a transaction hash and --datadir, or --code")
+
+    stream: Optional[TextIO] = None
+    if args.trace == "-":
+        stream = sys.stdout
+    elif args.trace:
+        stream = open(args.trace, "w")
+
+    tracer = Tracer(stream)
+    machine.tracer = tracer
+    machine.load(code, gas)  # type: ignore
+    try:
+        machine.run()
+    except Exception:
+        # the tracer has recorded the failing step
+        pass
+    finally:
+        if stream is not None and stream is not sys.stdout:
+            stream.close()
+        if store is not None:
+            store.close()
+
+    if args.json:
+        print(json.dumps(tracer.to_dict(), indent=4))
+    else:
+        print_profile(tracer)
@@ -1,9 +1,14 @@
 import json
 import pickle
+from abc import ABC, abstractmethod
 from typing import Optional
 
+from pynim import rlp
+
 
 class Serializable:
+    __slots__ = ()
+
     def to_dict(self):
         return self.__dict__
 
@@ -23,4 +28,27 @@ class Serializable:
 
     @classmethod
     def deserialize(cls, b: bytes):
-        return pickle.loads(b)
+        return cls.from_dict(pickle.loads(b))
+
+
+class RLPSerializable(Serializable, ABC):
+    __slots__ = ()
+
+    @abstractmethod
+    def to_rlp(self) -> list:
+        ...
+
+    @classmethod
+    @abstractmethod
+    def from_rlp(cls, item: list):
+        ...
+
+    def serialize(self) -> bytes:
+        return rlp.encode(self.to_rlp())
+
+    @classmethod
+    def deserialize(cls, b: bytes):
+        item = rlp.decode(b)
+        if not isinstance(item, list):
+            raise rlp.DecodingError(f"{cls.__name__} must be encoded as a list")
+        return cls.from_rlp(item)
@@ -0,0 +1,123 @@
+from typing import Iterable, Iterator, Optional
+
+# a rebuild drops tombstoned slots once they make up this share of the tree
+REBUILD_RATIO = 0.5
+
+
+class StakeTree:
+    def __init__(self) -> None:
+        # slots keep insertion order; removed validators leave a None
+        # tombstone with zero weight until the next rebuild
+        self.slots: list[Optional[bytes]] = []
+        self.weights: list[int] = []
+        self.index: dict[bytes, int] = {}
+        # 1-based Fenwick tree over weights
+        self.tree: list[int] = [0]
+        self.total = 0
+
+    @classmethod
+    def from_weights(cls, weights: Iterable[tuple[bytes, int]]) -> "StakeTree":
+        stakes = cls()
+        for validator, weight in weights:
+            if validator in stakes.index:
+                continue
+            stakes.index[validator] = len(stakes.slots)
+            stakes.slots.append(validator)
+            stakes.weights.append(weight)
+        stakes._build()
+        return stakes
+
+    def _build(self) -> None:
+        # linear-time construction: each node pushes its sum to its parent
+        tree = [0] + self.weights
+        n = len(self.weights)
+        for i in range(1, n + 1):
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self.tree = tree
+        self.total = sum(self.weights)
+
+    def _add(self, i: int, delta: int) -> None:
+        tree = self.tree
+        n = len(tree)
+        i += 1
+        while i < n:
+            tree[i] += delta
+            i += i & -i
+        self.total += delta
+
+    def _prefix(self, i: int) -> int:
+        # sum of the first i weights
+        tree = self.tree
+        total = 0
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, validator: bytes) -> bool:
+        return validator in self.index
+
+    def __iter__(self) -> Iterator[bytes]:
+        return (v for v in self.slots if v is not None)
+
+    def weight(self, validator: bytes) -> int:
+        i = self.index.get(validator)
+        return self.weights[i] if i is not None else 0
+
+    def add(self, validator: bytes, weight: int) -> None:
+        if validator in self.index:
+            self.update(validator, weight)
+            return
+        # appending slot i needs the sum of the range its node covers,
+        # which is a difference of two prefixes
+        i = len(self.slots) + 1
+        node = weight + self._prefix(i - 1) - self._prefix(i - (i & -i))
+        self.index[validator] = i - 1
+        self.slots.append(validator)
+        self.weights.append(weight)
+        self.tree.append(node)
+        self.total += weight
+
+    def update(self, validator: bytes, weight: int) -> None:
+        i = self.index[validator]
+        delta = weight - self.weights[i]
+        if delta:
+            self.weights[i] = weight
+            self._add(i, delta)
+
+    def remove(self, validator: bytes) -> None:
+        i = self.index.pop(validator)
+        self._add(i, -self.weights[i])
+        self.weights[i] = 0
+        self.slots[i] = None
+        if len(self.slots) - len(self.index) > REBUILD_RATIO * len(self.slots):
+            self._compact()
+
+    def _compact(self) -> None:
+        live = [i for i, v in enumerate(self.slots) if v is not None]
+        self.slots = [self.slots[i] for i in live]
+        self.weights = [self.weights[i] for i in live]
+        self.index = {v: i for i, v in enumerate(self.slots)}  # type: ignore
+        self._build()
+
+    def find(self, target: int) -> bytes:
+        # first validator whose cumulative weight exceeds target, found by
+        # descending the tree one power of two at a time
+        if not 0 <= target < self.total:
+            raise IndexError("target outside the total weight")
+        tree = self.tree
+        n = len(tree) - 1
+        pos = 0
+        step = 1 << n.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= n and tree[nxt] <= target:
+                pos = nxt
+                target -= tree[nxt]
+            step >>= 1
+        return self.slots[pos]  # type: ignore
@@ -1,12 +1,30 @@
+import heapq
+import os
+import re
+import threading
 import time
-from typing import Optional
+from bisect import bisect_left
+from concurrent.futures import Executor
+from itertools import count, islice, repeat
+from typing import Callable, Iterator, Optional, Sequence
 
 from pynim.datatypes import Transaction
-from pynim.hashes import keccak256
+from pynim.journal import TransactionJournal
 
 MAX_POOL_SIZE = 10_000
 TTL_SECONDS = 3_600
 MAX_PER_ACCOUNT = 1_000
+# width of one timing-wheel slot. A slot is dropped once its latest possible
+# arrival is past the TTL, so a transaction is never dropped before its TTL
+# and, by the first admission after that, at most this much past it
+EXPIRY_BUCKET_SECONDS = 10
+# batches smaller than this are prepared inline, where the hand-off to
+# worker processes would cost more than it saves
+PARALLEL_BATCH_THRESHOLD = 512
+PARALLEL_CHUNK_SIZE = 256
+POOL_SHARDS = 16
+SHARD_JOURNAL_FILE = "mempool-{:02d}.journal"
+SHARD_JOURNAL_PATTERN = re.compile(r"mempool-\d+\.journal")
 
 
 class TransactionPoolError(Exception):
@@ -27,34 +45,216 @@ class TransactionExistsError(TransactionPoolError):
     pass
 
 
-class TransactionPool:
+def validate_transaction(transaction: Transaction, now: Optional[int] = None) -> None:
+    # stateless checks only, so they can run away from the pool
+    if transaction.sender is None or len(transaction.sender) == 0:
+        raise InvalidTransactionError("Transaction missing sender")
+
+    if transaction.recipient is None or len(transaction.recipient) == 0:
+        raise InvalidTransactionError("Transaction missing recipient")
+
+    if transaction.value < 0:
+        raise InvalidTransactionError("Transaction value cannot be negative")
+
+    if transaction.nonce < 0:
+        raise InvalidTransactionError("Transaction nonce cannot be negative")
+
+    current_time = int(time.time()) if now is None else now
+    if transaction.timestamp > current_time + 300:  # 5 minutes in future
+        raise InvalidTransactionError("Transaction timestamp too far in future")
+
+
+def prepare_transactions(
+    transactions: Sequence[Transaction], now: int
+) -> list[tuple[Transaction, Optional[InvalidTransactionError]]]:
+    # runs in worker processes: the hash is computed here and travels back
+    # cached on the transaction, so the pool never re-serialises it
+    prepared = []
+    for transaction in transactions:
+        try:
+            validate_transaction(transaction, now)
+            transaction.hash
+            prepared.append((transaction, None))
+        except InvalidTransactionError as e:
+            prepared.append((transaction, e))
+    return prepared
+
+
+def prepare_batch(
+    transactions: Sequence[Transaction], executor: Optional[Executor] = None
+) -> list[tuple[Transaction, Optional[InvalidTransactionError]]]:
+    now = int(time.time())
+    if executor is None or len(transactions) < PARALLEL_BATCH_THRESHOLD:
+        return prepare_transactions(transactions, now)
+    size = PARALLEL_CHUNK_SIZE
+    chunks = [transactions[i : i + size] for i in range(0, len(transactions), size)]
+    return [
+        result
+        for chunk in executor.map(prepare_transactions, chunks, repeat(now))
+        for result in chunk
+    ]
+
+
+def _readmit(
+    pool,
+    entries: list[tuple[Transaction, float]],
+    ttl: float,
+    is_included: Optional[Callable[[bytes], bool]],
+) -> int:
+    # journaled transactions keep their original arrival time, so expiry
+    # carries on where it left off
+    cutoff = time.time() - ttl
+    restored = 0
+    for transaction, arrival in entries:
+        if arrival < cutoff:
+            continue
+        if is_included is not None and is_included(transaction.hash):
+            continue
+        try:
+            pool.add(transaction, validate=False, arrival=arrival)
+            restored += 1
+        except TransactionPoolError:
+            pass
+    return restored
+
+
+def _priority(transaction: Transaction) -> tuple[int, int]:
+    # highest gas price first, then highest value
+    return -transaction.gas_price, -transaction.value
+
+
+class SenderQueue:
     def __init__(self) -> None:
+        self.by_nonce: dict[int, Transaction] = {}
+        # parallel lists kept in nonce order, so ordered walks are slices
+        self.nonces: list[int] = []
+        self.transactions: list[Transaction] = []
+
+    def get(self, nonce: int) -> Optional[Transaction]:
+        return self.by_nonce.get(nonce)
+
+    def put(self, transaction: Transaction) -> Optional[Transaction]:
+        nonce = transaction.nonce
+        replaced = self.by_nonce.get(nonce)
+        self.by_nonce[nonce] = transaction
+        if not self.nonces or nonce > self.nonces[-1]:
+            self.nonces.append(nonce)
+            self.transactions.append(transaction)
+            return replaced
+        i = bisect_left(self.nonces, nonce)
+        if replaced is None:
+            self.nonces.insert(i, nonce)
+            self.transactions.insert(i, transaction)
+        else:
+            self.transactions[i] = transaction
+        return replaced
+
+    def remove(self, nonce: int) -> Optional[Transaction]:
+        transaction = self.by_nonce.pop(nonce, None)
+        if transaction is None:
+            return None
+        # block inclusion removes the lowest nonces first
+        i = 0 if self.nonces[0] == nonce else bisect_left(self.nonces, nonce)
+        del self.nonces[i]
+        del self.transactions[i]
+        return transaction
+
+    def first(self) -> Optional[Transaction]:
+        return self.transactions[0] if self.transactions else None
+
+    def _run_end(self, i: int) -> int:
+        # end of the run of consecutive nonces starting at index i
+        nonces = self.nonces
+        base = nonces[i] - i
+        if nonces[-1] - base == len(nonces) - 1:
+            return len(nonces)
+        lo, hi = i, len(nonces) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if nonces[mid] - base > mid:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def executable_range(self, nonce: int) -> tuple[int, int]:
+        # index range of the run of consecutive nonces starting at the
+        # account's next nonce
+        if nonce not in self.by_nonce:
+            return 0, 0
+        i = 0 if self.nonces[0] == nonce else bisect_left(self.nonces, nonce)
+        return i, self._run_end(i)
+
+    def executable(self, nonce: int) -> list[Transaction]:
+        start, end = self.executable_range(nonce)
+        return self.transactions[start:end]
+
+    def gap(self) -> Optional[int]:
+        if not self.nonces:
+            return None
+        end = self._run_end(0)
+        if end == len(self.nonces):
+            return None
+        return self.nonces[end - 1] + 1
+
+    def __len__(self) -> int:
+        return len(self.nonces)
+
+    def __iter__(self) -> Iterator[Transaction]:
+        return iter(self.transactions)
+
+
+class TransactionPool:
+    def __init__(
+        self,
+        max_size: int = MAX_POOL_SIZE,
+        ttl: float = TTL_SECONDS,
+        journal: Optional[TransactionJournal] = None,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.journal = journal
         self.transactions: dict[bytes, Transaction] = {}
-        self.transactions_by_sender: dict[bytes, list[Transaction]] = {}
+        self.transactions_by_sender: dict[bytes, SenderQueue] = {}
         self.transaction_hashes: set[bytes] = set()
         self.transaction_timestamps: dict[bytes, float] = {}
 
-    def add(self, transaction: Transaction, validate: bool = True) -> bool:
+        # max-priority heap over each sender's lowest-nonce transaction.
+        # entries are (priority, sequence, sender, transaction) and go stale
+        # when the sender's head changes; _heads maps each sender to its
+        # head and the sequence number of its live entry
+        self._priority_heap: list[tuple[tuple[int, int], int, bytes, Transaction]]
+        self._priority_heap = []
+        self._heads: dict[bytes, tuple[Transaction, int]] = {}
+        self._stale_entries = 0
+        self._sequence = count()
+
+        # timing wheel: arrival-time slot -> hashes, plus a heap of the slot
+        # numbers so expiry only ever touches slots that are due
+        self._expiry_buckets: dict[int, set[bytes]] = {}
+        self._expiry_slots: list[int] = []
+
+        # min-heap of (gas_price, sequence, hash) over every pooled
+        # transaction; entries of removed transactions are skipped lazily
+        self._eviction_heap: list[tuple[int, int, bytes]] = []
+
+    def add(
+        self,
+        transaction: Transaction,
+        validate: bool = True,
+        arrival: Optional[float] = None,
+    ) -> bool:
         if validate:
             self._validate_transaction(transaction)
 
-        h = transaction.hash or keccak256(transaction.serialize())
+        h = transaction.hash
         if h in self.transaction_hashes:
             raise TransactionExistsError(f"Transaction {h.hex()} already in pool")
 
-        if len(self.transactions) >= MAX_POOL_SIZE:
-            self._cleanup_stale_transactions()
-
-            if len(self.transactions) >= MAX_POOL_SIZE:
-                raise TransactionPoolError("Transaction pool is full")
-
-            sender_transactions = self.transactions_by_sender.get(
-                transaction.sender, []
-            )
-            if len(sender_transactions) >= MAX_PER_ACCOUNT:
-                raise TransactionPoolError(
-                    f"Account {transaction.sender.hex()} has reached transaction limit"
-                )
+        now = time.time()
+        self._cleanup_stale_transactions(now)
+        if arrival is None:
+            arrival = now
 
         existing_transaction = self._find_transaction_by_nonce(
             transaction.sender, transaction.nonce
@@ -65,16 +265,53 @@ class TransactionPool:
                     f"Transaction with nonce {transaction.nonce} exists with higher equal value"
                 )
             self._remove_transaction(existing_transaction)
+        else:
+            sender_transactions = self.transactions_by_sender.get(transaction.sender)
+            if sender_transactions and len(sender_transactions) >= MAX_PER_ACCOUNT:
+                raise TransactionPoolError(
+                    f"Account {transaction.sender.hex()} has reached transaction limit"
+                )
+            if len(self.transactions) >= self.max_size:
+                self._evict_for(transaction)
 
         self.transactions[h] = transaction
         self.transaction_hashes.add(h)
-        self.transaction_timestamps[h] = time.time()
+        self._track_arrival(h, arrival)
+        heapq.heappush(
+            self._eviction_heap, (transaction.gas_price, next(self._sequence), h)
+        )
+        if len(self._eviction_heap) > 2 * len(self.transactions) + 64:
+            self._compact_eviction_heap()
+
+        sender_transactions = self.transactions_by_sender.get(transaction.sender)
+        if sender_transactions is None:
+            sender_transactions = SenderQueue()
+            self.transactions_by_sender[transaction.sender] = sender_transactions
+        sender_transactions.put(transaction)
+        self._update_head(transaction.sender)
 
-        self.transactions_by_sender[transaction.sender].append(transaction)
-        self.transactions_by_sender[transaction.sender].sort(key=lambda t: t.nonce)
+        if self.journal is not None:
+            self.journal.append_add(transaction, arrival)
+            self._maybe_compact_journal()
 
         return True
 
+    def add_batch(
+        self,
+        transactions: Sequence[Transaction],
+        executor: Optional[Executor] = None,
+    ) -> list[Optional[TransactionPoolError]]:
+        # None for each admitted transaction, otherwise the reason it was not
+        results: list[Optional[TransactionPoolError]] = []
+        for transaction, error in prepare_batch(transactions, executor):
+            if error is None:
+                try:
+                    self.add(transaction, validate=False)
+                except TransactionPoolError as e:
+                    error = e
+            results.append(error)
+        return results
+
     def remove(self, hash: bytes) -> bool:
         if hash not in self.transaction_hashes:
             return False
@@ -90,6 +327,19 @@ class TransactionPool:
                 removed += 1
         return removed
 
+    def advance_nonce(self, sender: bytes, nonce: int) -> int:
+        # drops transactions the account can no longer execute, which also
+        # moves the sender's entry in the priority heap
+        sender_transactions = self.transactions_by_sender.get(sender)
+        removed = 0
+        while sender_transactions:
+            transaction = sender_transactions.first()
+            if transaction.nonce >= nonce:
+                break
+            self._remove_transaction(transaction)
+            removed += 1
+        return removed
+
     def get(self, hash: bytes) -> Optional[Transaction]:
         return self.transactions.get(hash)
 
@@ -98,30 +348,77 @@ class TransactionPool:
         limit: Optional[int] = None,
         account_nonces: Optional[dict[bytes, int]] = None,
     ) -> list[Transaction]:
-        pending = []
-
-        for sender, transactions in self.transactions_by_sender.items():
-            if not transactions:
+        pending = self.iter_pending(account_nonces)
+        if limit:
+            return list(islice(pending, limit))
+        return list(pending)
+
+    def iter_pending(
+        self, account_nonces: Optional[dict[bytes, int]] = None
+    ) -> Iterator[Transaction]:
+        # best-first merge of the senders' queues: the persistent heap is
+        # walked as a tree through a small frontier heap, and each sender's
+        # next nonce joins the frontier once its predecessor is taken, so
+        # the cost depends on how much is consumed rather than on the size
+        # of the pool. The pool must not change while this is consumed.
+        heap = self._priority_heap
+        if not heap:
+            return
+
+        # (priority, sequence, heap index or -1, queue, next index, end index)
+        frontier = [(heap[0][0], heap[0][1], 0, None, 0, 0)]
+
+        # a sender whose account nonce is past its lowest queued nonce (see
+        # advance_nonce) may rank better by its first executable transaction
+        # than its heap entry says, which would break the heap order of the
+        # walk; such senders join the frontier up front and their heap
+        # entries are skipped
+        reranked: set[bytes] = set()
+        for sender, nonce in (account_nonces or {}).items():
+            queue = self.transactions_by_sender.get(sender)
+            if queue is None or queue.nonces[0] >= nonce:
                 continue
+            reranked.add(sender)
+            index, end = queue.executable_range(nonce)
+            if index < end:
+                priority = _priority(queue.transactions[index])
+                heapq.heappush(
+                    frontier, (priority, next(self._sequence), -1, queue, index, end)
+                )
 
-            if account_nonces is not None:
-                expected_nonce = account_nonces.get(sender, 0)
-                for transaction in transactions:
-                    if transaction.nonce == expected_nonce:
-                        pending.append(transaction)
-                        expected_nonce += 1
-                    elif transaction.nonce > expected_nonce:
-                        break
-            else:
-                pending.extend(transactions)
-
-        pending.sort(key=lambda t: t.value, reverse=True)
-        if limit:
-            return pending[:limit]
-        return pending
+        while frontier:
+            _, _, node, queue, index, end = heapq.heappop(frontier)
+
+            if queue is None:
+                for child in (2 * node + 1, 2 * node + 2):
+                    if child < len(heap):
+                        entry = heap[child]
+                        heapq.heappush(
+                            frontier, (entry[0], entry[1], child, None, 0, 0)
+                        )
+                _, sequence, sender, head = heap[node]
+                if self._heads.get(sender) != (head, sequence) or sender in reranked:
+                    continue
+                queue = self.transactions_by_sender[sender]
+                if account_nonces is None:
+                    index, end = 0, len(queue)
+                else:
+                    index, end = queue.executable_range(account_nonces.get(sender, 0))
+                if index == end:
+                    continue
+
+            yield queue.transactions[index]
+            index += 1
+            if index < end:
+                priority = _priority(queue.transactions[index])
+                heapq.heappush(
+                    frontier,
+                    (priority, next(self._sequence), -1, queue, index, end),
+                )
 
     def get_transactions_by_sender(self, sender: bytes) -> list[Transaction]:
-        return self.transactions_by_sender.get(sender, []).copy()
+        sender_transactions = self.transactions_by_sender.get(sender)
+        return list(sender_transactions) if sender_transactions else []
 
     def get_all(self) -> list[Transaction]:
         return list(self.transactions.values())
@@ -132,87 +429,441 @@ class TransactionPool:
     def size(self) -> int:
         return len(self.transactions)
 
+    def restore(self, is_included: Optional[Callable[[bytes], bool]] = None) -> int:
+        # replays the journal into an empty pool, skipping entries that have
+        # expired or were mined in the meantime; the survivors' records are
+        # then written back as a compacted journal
+        journal = self.journal
+        if journal is None:
+            return 0
+        entries = journal.replay()
+        self.journal = None
+        try:
+            restored = _readmit(self, entries, self.ttl, is_included)
+        finally:
+            self.journal = journal
+        records = journal.replayed
+        journal.retain(records[h] for h in self.transactions if h in records)
+        return restored
+
+    def _maybe_compact_journal(self) -> None:
+        if self.journal.should_compact(len(self.transactions)):  # type: ignore
+            self.journal.compact(  # type: ignore
+                (transaction, self.transaction_timestamps[h])
+                for h, transaction in self.transactions.items()
+            )
+
     def clear(self) -> None:
         self.transactions.clear()
         self.transactions_by_sender.clear()
         self.transaction_hashes.clear()
         self.transaction_timestamps.clear()
+        self._priority_heap.clear()
+        self._heads.clear()
+        self._stale_entries = 0
+        self._expiry_buckets.clear()
+        self._expiry_slots.clear()
+        self._eviction_heap.clear()
+        if self.journal is not None:
+            self.journal.reset()
+
+    def close(self) -> None:
+        if self.journal is not None:
+            self.journal.close()
 
     def _find_transaction_by_nonce(
         self, sender: bytes, nonce: int
     ) -> Optional[Transaction]:
-        sender_transactions = self.transactions_by_sender.get(sender, [])
-        for transaction in sender_transactions:
-            if transaction.nonce == nonce:
-                return transaction
-
-        return None
-
-    def _cleanup_stale_transactions(self) -> int:
-        current_time = time.time()
-        stale_transactions = []
-
-        for h, timestamp in self.transaction_timestamps.items():
-            if current_time - timestamp > TTL_SECONDS:
-                stale_transactions.append(h)
-
-            for h in stale_transactions:
+        sender_transactions = self.transactions_by_sender.get(sender)
+        if sender_transactions is None:
+            return None
+        return sender_transactions.get(nonce)
+
+    def _track_arrival(self, h: bytes, arrival: float) -> None:
+        self.transaction_timestamps[h] = arrival
+        slot = int(arrival // EXPIRY_BUCKET_SECONDS)
+        bucket = self._expiry_buckets.get(slot)
+        if bucket is None:
+            bucket = self._expiry_buckets[slot] = set()
+            heapq.heappush(self._expiry_slots, slot)
+        bucket.add(h)
+
+    def _cleanup_stale_transactions(self, now: Optional[float] = None) -> int:
+        # a slot is dropped whole once its newest possible arrival is past
+        # the TTL, so each transaction is touched once on its way out. Slot
+        # s holds arrivals in [s, s + 1) widths, so it is due once now - ttl
+        # reaches s + 1 widths: the oldest arrival in it has then outlived
+        # its TTL by one width, the newest by nothing
+        if now is None:
+            now = time.time()
+        due = int((now - self.ttl) // EXPIRY_BUCKET_SECONDS) - 1
+        removed = 0
+        while self._expiry_slots and self._expiry_slots[0] <= due:
+            slot = heapq.heappop(self._expiry_slots)
+            for h in self._expiry_buckets.pop(slot, ()):
                 transaction = self.transactions.get(h)
                 if transaction:
                     self._remove_transaction(transaction)
+                    removed += 1
+        return removed
 
-        return len(stale_transactions)
+    def _evict_for(self, transaction: Transaction) -> None:
+        # a full pool makes room by dropping the lowest fee-per-gas
+        # transaction, but only for a newcomer that pays strictly more
+        while len(self.transactions) >= self.max_size:
+            cheapest = self._cheapest()
+            if cheapest is None or cheapest.gas_price >= transaction.gas_price:
+                raise TransactionPoolError("Transaction pool is full")
+            self._evict(cheapest)
+
+    def _compact_eviction_heap(self) -> None:
+        self._eviction_heap = [
+            (transaction.gas_price, next(self._sequence), h)
+            for h, transaction in self.transactions.items()
+        ]
+        heapq.heapify(self._eviction_heap)
+
+    def _cheapest(self) -> Optional[Transaction]:
+        heap = self._eviction_heap
+        while heap:
+            transaction = self.transactions.get(heap[0][2])
+            if transaction is not None:
+                return transaction
+            heapq.heappop(heap)
+        return None
+
+    def _evict(self, transaction: Transaction) -> None:
+        # later nonces from the same sender could never execute without it,
+        # so they go too, highest nonce first
+        sender_transactions = self.transactions_by_sender[transaction.sender]
+        start = bisect_left(sender_transactions.nonces, transaction.nonce)
+        for dependent in reversed(sender_transactions.transactions[start:]):
+            self._remove_transaction(dependent)
 
     def _remove_transaction(self, transaction: Transaction) -> None:
-        h = transaction.hash or keccak256(transaction.serialize())
+        h = transaction.hash
         if h in self.transactions:
             del self.transactions[h]
+            if self.journal is not None:
+                self.journal.append_remove(h)
+                self._maybe_compact_journal()
 
         self.transaction_hashes.discard(h)
 
-        if h in self.transaction_timestamps:
-            del self.transaction_timestamps[h]
+        arrival = self.transaction_timestamps.pop(h, None)
+        if arrival is not None:
+            bucket = self._expiry_buckets.get(int(arrival // EXPIRY_BUCKET_SECONDS))
+            if bucket is not None:
+                bucket.discard(h)
+
+        sender_transactions = self.transactions_by_sender.get(transaction.sender)
+        if sender_transactions is not None:
+            queued = sender_transactions.get(transaction.nonce)
+            if queued is not None and queued.hash == h:
+                sender_transactions.remove(transaction.nonce)
+            if not sender_transactions:
+                del self.transactions_by_sender[transaction.sender]
+            self._update_head(transaction.sender)
+
+    def _update_head(self, sender: bytes) -> None:
+        sender_transactions = self.transactions_by_sender.get(sender)
+        head = sender_transactions.first() if sender_transactions else None
+        previous = self._heads.get(sender)
+        if previous is not None:
+            if head is previous[0]:
+                return
+            self._stale_entries += 1
+
+        if head is None:
+            del self._heads[sender]
+        else:
+            sequence = next(self._sequence)
+            self._heads[sender] = (head, sequence)
+            heapq.heappush(
+                self._priority_heap, (_priority(head), sequence, sender, head)
+            )
 
-        if transaction.sender in self.transactions_by_sender:
-            self.transactions_by_sender[transaction.sender] = [
-                t
-                for t in self.transactions_by_sender[transaction.sender]
-                if (t.hash or keccak256(t.serialize()))
+        # stale entries are dropped once they outnumber the live ones
+        if self._stale_entries > len(self._heads) + 64:
+            self._priority_heap = [
+                (_priority(head), sequence, sender, head)
+                for sender, (head, sequence) in self._heads.items()
             ]
-
-            if not self.transactions_by_sender[transaction.sender]:
-                del self.transactions_by_sender[transaction.sender]
+            heapq.heapify(self._priority_heap)
+            self._stale_entries = 0
 
     def _validate_transaction(self, transaction: Transaction) -> None:
-        if transaction.sender is None or len(transaction.sender) == 0:
-            raise InvalidTransactionError("Transaction missing sender")
+        validate_transaction(transaction)
 
-        if transaction.recipient is None or len(transaction.recipient) == 0:
-            raise InvalidTransactionError("Transaction missing recipient")
+    def get_nonce_gap(self, sender: bytes) -> Optional[int]:
+        sender_transactions = self.transactions_by_sender.get(sender)
+        if not sender_transactions:
+            return None
+        return sender_transactions.gap()
 
-        if transaction.value < 0:
-            raise InvalidTransactionError("Transaction value cannot be negative")
+    def __len__(self) -> int:
+        return self.size()
 
-        if transaction.nonce < 0:
-            raise InvalidTransactionError("Transaction nonce cannot be negative")
+    def __contains__(self, hash: bytes) -> bool:
+        return self.contains(hash)
 
-        current_time = int(time.time())
-        if transaction.timestamp > current_time + 300:  # 5 minutes in future
-            raise InvalidTransactionError("Transaction timestamp too far in future")
 
-    def get_nonce_gap(self, sender: bytes) -> Optional[int]:
-        transactions = self.transactions_by_sender[sender]
-        if not transactions:
-            return None
+class ShardedTransactionPool:
+    # senders are spread over independently locked pools, so admissions for
+    # different senders rarely contend; everything that touches one sender
+    # stays inside one shard, which keeps nonce ordering and replacement
+    # local, and MAX_PER_ACCOUNT exact. max_size bounds the pool as a whole,
+    # however senders fall across shards: an admission takes only its
+    # shard's lock while there is room for every shard to admit at once,
+    # and every lock once the pool is that close to full, so that it can
+    # evict the cheapest transaction of any shard
+    def __init__(
+        self,
+        shards: int = POOL_SHARDS,
+        max_size: int = MAX_POOL_SIZE,
+        ttl: float = TTL_SECONDS,
+        journal_dir: Optional[str] = None,
+    ) -> None:
+        self.max_size = max_size
+        self.journal_dir = journal_dir
+        self.shards = [
+            TransactionPool(
+                max_size,
+                ttl,
+                (
+                    TransactionJournal(
+                        os.path.join(journal_dir, SHARD_JOURNAL_FILE.format(i))
+                    )
+                    if journal_dir is not None
+                    else None
+                ),
+            )
+            for i in range(shards)
+        ]
+        self.locks = [threading.Lock() for _ in range(shards)]
+
+    def restore(self, is_included: Optional[Callable[[bytes], bool]] = None) -> int:
+        # every shard journal in the directory is replayed, including ones
+        # left by a run with more shards, and the survivors are re-routed
+        if self.journal_dir is None:
+            return 0
+        journals = [shard.journal for shard in self.shards]
+        current = {journal.path: journal for journal in journals}  # type: ignore
+        entries: list[tuple[Transaction, float]] = []
+        records: dict[bytes, bytes] = {}
+        for name in sorted(os.listdir(self.journal_dir)):
+            if not SHARD_JOURNAL_PATTERN.fullmatch(name):
+                continue
+            path = os.path.join(self.journal_dir, name)
+            journal = current.get(path)
+            if journal is None:
+                journal = TransactionJournal(path)
+                entries.extend(journal.replay())
+                journal.close()
+                os.remove(path)
+            else:
+                entries.extend(journal.replay())
+            records.update(journal.replayed)
+
+        for shard in self.shards:
+            shard.journal = None
+        try:
+            restored = _readmit(self, entries, self.shards[0].ttl, is_included)
+        finally:
+            for shard, journal in zip(self.shards, journals):
+                shard.journal = journal
+        for shard in self.shards:
+            shard.journal.retain(  # type: ignore
+                records[h] for h in shard.transactions if h in records
+            )
+        return restored
 
-        expected_nonce = transactions[0].nonce
-        for transaction in transactions:
-            if transaction.nonce != expected_nonce:
-                return expected_nonce
-            expected_nonce += 1
+    def _index(self, sender: bytes) -> int:
+        return hash(sender) % len(self.shards)
 
+    def _locate(self, hash: bytes) -> Optional[int]:
+        # a single dict membership test per shard; the owning shard is then
+        # re-checked under its lock by the caller
+        for i, shard in enumerate(self.shards):
+            if hash in shard.transactions:
+                return i
         return None
 
+    def add(
+        self,
+        transaction: Transaction,
+        validate: bool = True,
+        arrival: Optional[float] = None,
+    ) -> bool:
+        if validate:
+            validate_transaction(transaction)
+        # hashing happens before taking the lock
+        transaction.hash
+        i = self._index(transaction.sender)
+        with self.locks[i]:
+            if self._has_room():
+                return self.shards[i].add(transaction, validate=False, arrival=arrival)
+        return self._add_when_full(i, transaction, arrival)
+
+    def _has_room(self) -> bool:
+        # called under one shard's lock: every other shard may be admitting
+        # one transaction at the same time
+        return self.size() + len(self.shards) <= self.max_size
+
+    def _add_when_full(
+        self, i: int, transaction: Transaction, arrival: Optional[float]
+    ) -> bool:
+        for lock in self.locks:
+            lock.acquire()
+        try:
+            shard = self.shards[i]
+            for each in self.shards:
+                each._cleanup_stale_transactions()
+            replaces = shard._find_transaction_by_nonce(
+                transaction.sender, transaction.nonce
+            )
+            if replaces is None and transaction.hash not in shard.transactions:
+                self._evict_for(transaction)
+            return shard.add(transaction, validate=False, arrival=arrival)
+        finally:
+            for lock in self.locks:
+                lock.release()
+
+    def _evict_for(self, transaction: Transaction) -> None:
+        # TransactionPool._evict_for over every shard: the pool's cheapest
+        # transaction goes, with its sender's later nonces, but only for a
+        # newcomer that pays strictly more
+        while self.size() >= self.max_size:
+            cheapest = None
+            for shard in self.shards:
+                candidate = shard._cheapest()
+                if candidate is not None and (
+                    cheapest is None or candidate.gas_price < cheapest[1].gas_price
+                ):
+                    cheapest = (shard, candidate)
+            if cheapest is None or cheapest[1].gas_price >= transaction.gas_price:
+                raise TransactionPoolError("Transaction pool is full")
+            cheapest[0]._evict(cheapest[1])
+
+    def add_batch(
+        self,
+        transactions: Sequence[Transaction],
+        executor: Optional[Executor] = None,
+    ) -> list[Optional[TransactionPoolError]]:
+        results: list[Optional[TransactionPoolError]] = []
+        grouped: dict[int, list[tuple[int, Transaction]]] = {}
+        for position, (transaction, error) in enumerate(
+            prepare_batch(transactions, executor)
+        ):
+            results.append(error)
+            if error is None:
+                index = self._index(transaction.sender)
+                grouped.setdefault(index, []).append((position, transaction))
+
+        # one lock acquisition per shard for the whole batch, while there
+        # is room; whatever is left once the pool fills up goes one by one
+        full: list[tuple[int, int, Transaction]] = []
+        for i, entries in grouped.items():
+            with self.locks[i]:
+                shard = self.shards[i]
+                for position, transaction in entries:
+                    if full or not self._has_room():
+                        full.append((i, position, transaction))
+                        continue
+                    try:
+                        shard.add(transaction, validate=False)
+                    except TransactionPoolError as e:
+                        results[position] = e
+        for i, position, transaction in full:
+            try:
+                self._add_when_full(i, transaction, None)
+            except TransactionPoolError as e:
+                results[position] = e
+        return results
+
+    def remove(self, hash: bytes) -> bool:
+        i = self._locate(hash)
+        if i is None:
+            return False
+        with self.locks[i]:
+            return self.shards[i].remove(hash)
+
+    def remove_batch(self, tx_hashes: list[bytes]) -> int:
+        removed = 0
+        for tx_hash in tx_hashes:
+            if self.remove(tx_hash):
+                removed += 1
+        return removed
+
+    def advance_nonce(self, sender: bytes, nonce: int) -> int:
+        i = self._index(sender)
+        with self.locks[i]:
+            return self.shards[i].advance_nonce(sender, nonce)
+
+    def get(self, hash: bytes) -> Optional[Transaction]:
+        for shard in self.shards:
+            transaction = shard.transactions.get(hash)
+            if transaction is not None:
+                return transaction
+        return None
+
+    def get_pending(
+        self,
+        limit: Optional[int] = None,
+        account_nonces: Optional[dict[bytes, int]] = None,
+    ) -> list[Transaction]:
+        # each shard yields its own greedy best-first order over disjoint
+        # senders, so repeatedly taking the best head across shards gives
+        # the same result as one pool would. All shards are locked, in a
+        # fixed order, for the merge, which keeps the snapshot consistent
+        # and only pulls limit transactions in total.
+        for lock in self.locks:
+            lock.acquire()
+        try:
+            merged = heapq.merge(
+                *(shard.iter_pending(account_nonces) for shard in self.shards),
+                key=_priority,
+            )
+            if limit:
+                return list(islice(merged, limit))
+            return list(merged)
+        finally:
+            for lock in self.locks:
+                lock.release()
+
+    def get_transactions_by_sender(self, sender: bytes) -> list[Transaction]:
+        i = self._index(sender)
+        with self.locks[i]:
+            return self.shards[i].get_transactions_by_sender(sender)
+
+    def get_nonce_gap(self, sender: bytes) -> Optional[int]:
+        i = self._index(sender)
+        with self.locks[i]:
+            return self.shards[i].get_nonce_gap(sender)
+
+    def get_all(self) -> list[Transaction]:
+        transactions = []
+        for shard, lock in zip(self.shards, self.locks):
+            with lock:
+                transactions.extend(shard.get_all())
+        return transactions
+
+    def contains(self, hash: bytes) -> bool:
+        return self._locate(hash) is not None
+
+    def size(self) -> int:
+        return sum(len(shard.transactions) for shard in self.shards)
+
+    def clear(self) -> None:
+        for shard, lock in zip(self.shards, self.locks):
+            with lock:
+                shard.clear()
+
+    def close(self) -> None:
+        for shard, lock in zip(self.shards, self.locks):
+            with lock:
+                shard.close()
+
     def __len__(self) -> int:
         return self.size()
 
@@ -2,7 +2,6 @@ from typing import Optional
 
 from pynim.account import Account
 from pynim.datatypes import Transaction
-from pynim.hashes import keccak256
 from pynim.params import NIM
 from pynim.vm.machine import Machine, push_address
 from pynim.vm.opcode import OP_STOP
@@ -33,7 +32,7 @@ def create_coinbase_transaction(
 
     vm.load(bytes(bytecode), gas=10)
 
-    coinbase = Transaction(
+    return Transaction(
         timestamp=current_time,
         hash=None,
         nonce=0,
@@ -45,5 +44,3 @@ def create_coinbase_transaction(
         gas=0,
         gas_price=0,
     )
-    coinbase.hash = keccak256(coinbase.serialize())
-    return coinbase
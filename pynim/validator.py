@@ -1,9 +1,9 @@
 from dataclasses import dataclass
 from enum import Enum, auto
-from typing import Optional
+from typing import Optional, Union
 
+from pynim.batch import TransactionBatch
 from pynim.datatypes import Block, Header, Transaction
-from pynim.hashes import keccak256
 
 
 class Status(Enum):
@@ -53,8 +53,10 @@ class Validator:
         timestamp: int,
         gas_limit: int,
         base_fee: int,
-        transactions: list[Transaction],
+        transactions: Union[list[Transaction], TransactionBatch],
     ) -> Block:
+        if not isinstance(transactions, TransactionBatch):
+            transactions = TransactionBatch.from_transactions(transactions)
         number = (
             0
             if parent_hash is None
@@ -65,13 +67,12 @@ class Validator:
             parent_hash=parent_hash if parent_hash else b"\x00" * 32,
             number=number,
             gas_limit=gas_limit,
-            gas_used=sum(t.value for t in transactions),
+            gas_used=transactions.total_value(),
             base_fee=base_fee,
         )
-        for tx in transactions:
-            if tx.hash is None:
-                tx.hash = keccak256(tx.serialize())
         blk = Block(
-            header=h, transactions=transactions, cached_hash=keccak256(h.serialize())
+            header=h,
+            transactions=transactions.to_transactions(),
+            cached_hash=h.hash(),
         )
         return blk
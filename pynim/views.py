@@ -0,0 +1,183 @@
+from typing import Iterator, Optional
+
+from pynim.datatypes import Block, Header, Transaction
+from pynim.hashes import keccak256
+from pynim.rlp import DecodingError, decode_int, list_spans, string_payload
+
+
+class _FieldView:
+    __slots__ = ("buf", "_spans")
+
+    field_count = 0
+
+    def __init__(self, buf) -> None:
+        self.buf = memoryview(buf)
+        self._spans: Optional[list[tuple[int, int]]] = None
+
+    def _field(self, index: int) -> memoryview:
+        if self._spans is None:
+            spans = list_spans(self.buf)
+            if len(spans) != self.field_count:
+                raise DecodingError(
+                    f"{type(self).__name__} expects {self.field_count} fields"
+                )
+            self._spans = spans
+        start, end = self._spans[index]
+        return string_payload(self.buf, start, end)
+
+    def _int(self, index: int) -> int:
+        return decode_int(self._field(index))
+
+    def _bytes(self, index: int) -> bytes:
+        return bytes(self._field(index))
+
+
+class HeaderView(_FieldView):
+    __slots__ = ()
+
+    field_count = 6
+
+    @property
+    def timestamp(self) -> int:
+        return self._int(0)
+
+    @property
+    def parent_hash(self) -> bytes:
+        return self._bytes(1)
+
+    @property
+    def number(self) -> int:
+        return self._int(2)
+
+    @property
+    def gas_limit(self) -> int:
+        return self._int(3)
+
+    @property
+    def gas_used(self) -> int:
+        return self._int(4)
+
+    @property
+    def base_fee(self) -> int:
+        return self._int(5)
+
+    def hash(self) -> bytes:
+        return keccak256(self.buf)
+
+    def to_header(self) -> Header:
+        return Header.deserialize(self.buf)
+
+
+class TransactionView(_FieldView):
+    __slots__ = ("_hash",)
+
+    field_count = 9
+
+    def __init__(self, buf) -> None:
+        super().__init__(buf)
+        self._hash: Optional[bytes] = None
+
+    @property
+    def hash(self) -> bytes:
+        if self._hash is None:
+            self._hash = keccak256(self.buf)
+        return self._hash
+
+    @property
+    def timestamp(self) -> int:
+        return self._int(0)
+
+    @property
+    def nonce(self) -> int:
+        return self._int(1)
+
+    @property
+    def recipient(self) -> bytes:
+        return self._bytes(2)
+
+    @property
+    def sender(self) -> bytes:
+        return self._bytes(3)
+
+    @property
+    def value(self) -> int:
+        return self._int(4)
+
+    @property
+    def input_data(self) -> Optional[bytes]:
+        return self._bytes(5) or None
+
+    @property
+    def signature(self) -> Optional[bytes]:
+        return self._bytes(6) or None
+
+    @property
+    def gas(self) -> int:
+        return self._int(7)
+
+    @property
+    def gas_price(self) -> int:
+        return self._int(8)
+
+    def calculate_gas_in_nim(self) -> int:
+        return self.gas * self.gas_price
+
+    def to_transaction(self) -> Transaction:
+        return Transaction.deserialize(self.buf)
+
+
+class BlockView:
+    __slots__ = ("buf", "_spans", "_header", "_transaction_spans")
+
+    def __init__(self, buf) -> None:
+        self.buf = memoryview(buf)
+        self._spans: Optional[list[tuple[int, int]]] = None
+        self._header: Optional[HeaderView] = None
+        self._transaction_spans: Optional[list[tuple[int, int]]] = None
+
+    def _top_spans(self) -> list[tuple[int, int]]:
+        if self._spans is None:
+            spans = list_spans(self.buf)
+            if len(spans) != 2:
+                raise DecodingError("block must be a [header, transactions] list")
+            self._spans = spans
+        return self._spans
+
+    def _transactions(self) -> list[tuple[int, int]]:
+        # walking the transaction list is deferred so header-only callers
+        # never pay for it
+        if self._transaction_spans is None:
+            transactions_start = self._top_spans()[1][0]
+            self._transaction_spans = list_spans(
+                self.buf, transactions_start, exact=False
+            )
+        return self._transaction_spans
+
+    @property
+    def header(self) -> HeaderView:
+        if self._header is None:
+            start, end = self._top_spans()[0]
+            self._header = HeaderView(self.buf[start:end])
+        return self._header
+
+    @property
+    def transaction_count(self) -> int:
+        return len(self._transactions())
+
+    def iter_transactions(self) -> Iterator[TransactionView]:
+        for start, end in self._transactions():
+            yield TransactionView(self.buf[start:end])
+
+    @property
+    def transactions(self) -> list[TransactionView]:
+        return list(self.iter_transactions())
+
+    @property
+    def tx_hashes(self) -> list[bytes]:
+        return [transaction.hash for transaction in self.iter_transactions()]
+
+    def hash(self) -> bytes:
+        return self.header.hash()
+
+    def to_block(self) -> Block:
+        return Block.deserialize(self.buf)
@@ -0,0 +1,125 @@
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from itertools import repeat
+from typing import Optional, Sequence
+
+from pynim.datatypes import Header, Transaction
+from pynim.vm.machine import Machine
+from pynim.vm.state import (
+    JournaledState,
+    Location,
+    PersistentState,
+    StateReader,
+    WorldState,
+)
+
+PARALLEL_BLOCK_THRESHOLD = 64
+PARALLEL_CHUNK_SIZE = 64
+
+
+@dataclass
+class TransactionResult:
+    success: bool
+    gas_used: int = 0
+    error: Optional[str] = None
+    reads: set = field(default_factory=set)
+    writes: dict = field(default_factory=dict)
+
+
+@dataclass
+class BlockResult:
+    results: list[TransactionResult]
+    # transactions whose speculative run read state that an earlier
+    # transaction in the block wrote
+    reexecuted: int = 0
+
+
+def block_environment(header: Header) -> dict[str, int]:
+    return {
+        "blockhash": int.from_bytes(header.parent_hash, "big"),
+        "timestamp": header.timestamp,
+        "number": header.number,
+        "gaslimit": header.gas_limit,
+        "basefee": header.base_fee,
+    }
+
+
+def execute_transaction(
+    state: StateReader, transaction: Transaction, block_env: Optional[dict] = None
+) -> TransactionResult:
+    # runs on a journal over state, which is left untouched; the result
+    # carries every location read and the writes to apply
+    journal = JournaledState(state)
+    machine = Machine(
+        int.from_bytes(transaction.recipient, "big"),
+        0,
+        transaction.gas_price,
+        block_env,
+    )
+    try:
+        machine.execute_transaction(transaction, journal)
+    except Exception as e:
+        gas_used = transaction.gas - machine.gas if machine.code else 0
+        return TransactionResult(
+            False, gas_used, str(e), journal.reads, journal.changes
+        )
+    gas_used = transaction.gas - machine.gas if machine.code else 0
+    return TransactionResult(True, gas_used, None, journal.reads, journal.changes)
+
+
+def execute_sequential(
+    state: WorldState | PersistentState,
+    transactions: Sequence[Transaction],
+    block_env: Optional[dict] = None,
+) -> BlockResult:
+    results = []
+    for transaction in transactions:
+        result = execute_transaction(state, transaction, block_env)
+        state.apply(result.writes)
+        results.append(result)
+    return BlockResult(results)
+
+
+def speculate(
+    state: StateReader,
+    transactions: Sequence[Transaction],
+    block_env: Optional[dict],
+) -> list[TransactionResult]:
+    # runs in worker processes: every transaction sees the state as of the
+    # start of the block
+    return [execute_transaction(state, tx, block_env) for tx in transactions]
+
+
+def execute_block(
+    state: WorldState | PersistentState,
+    transactions: Sequence[Transaction],
+    block_env: Optional[dict] = None,
+    executor: Optional[Executor] = None,
+) -> BlockResult:
+    # runs every transaction speculatively, then commits them in order. A
+    # speculative result is only stale if it read a location that an
+    # earlier transaction wrote; those are executed again against the
+    # committed state, so the outcome is exactly the sequential one
+    if executor is None or len(transactions) < PARALLEL_BLOCK_THRESHOLD:
+        return execute_sequential(state, transactions, block_env)
+
+    size = PARALLEL_CHUNK_SIZE
+    chunks = [transactions[i : i + size] for i in range(0, len(transactions), size)]
+    subsets = [state.subset(chunk) for chunk in chunks]
+    speculative = [
+        result
+        for chunk in executor.map(speculate, subsets, chunks, repeat(block_env))
+        for result in chunk
+    ]
+
+    results = []
+    written: set[Location] = set()
+    reexecuted = 0
+    for transaction, result in zip(transactions, speculative):
+        if not written.isdisjoint(result.reads):
+            result = execute_transaction(state, transaction, block_env)
+            reexecuted += 1
+        state.apply(result.writes)
+        written.update(result.writes)
+        results.append(result)
+    return BlockResult(results, reexecuted)
@@ -1,3 +1,6 @@
+import time
+from typing import Optional
+
 from pynim.datatypes import Transaction
 from pynim.vm.opcode import (
     OP_ADD,
@@ -21,8 +24,15 @@ from pynim.vm.opcode import (
     OP_SUB,
     OP_TIMESTAMP,
 )
-
-MAX_STACK = 256
+from pynim.vm.program import (
+    MAX_STACK,
+    Program,
+    StackOverflow,
+    StackUnderflow,
+    load_program,
+)
+from pynim.vm.state import JournaledState, StorageView, WorldState
+from pynim.vm.tracer import Tracer
 
 
 GAS_COST = {
@@ -53,16 +63,10 @@ class OutOfGas(Exception):
     pass
 
 
-class StackOverflow(Exception):
-    pass
-
-
-class StackUnderflow(Exception):
-    pass
-
-
 class Machine:
-    def __init__(self, address=0, balance=0, gas_price=1, block_env=None) -> None:
+    def __init__(
+        self, address=0, balance=0, gas_price=1, block_env=None, predecode=True
+    ) -> None:
         self.pc: int = 0
         self.stack: list[int] = []
         self.memory: bytearray = bytearray()
@@ -70,6 +74,13 @@ class Machine:
         self.gas: int = 0
         self.stopped: bool = False
         self.code: bytes = bytes()
+        # code decoded once into handlers with their immediates; predecode
+        # False runs the byte-at-a-time interpreter instead
+        self.predecode = predecode
+        self.program: Optional[Program] = None
+        # profiles every step when set; run() checks it once, so leaving it
+        # unset costs nothing per step
+        self.tracer: Optional[Tracer] = None
 
         self.address = address
         self.balance = balance
@@ -112,7 +123,48 @@ class Machine:
             raise StackUnderflow("stack underflow on peek")
         return self.stack[-1 - n]
 
+    def _load_program(self) -> Program:
+        # code may also be assigned directly rather than through load()
+        program = self.program
+        if program is None or program.code != self.code:
+            program = self.program = load_program(self.code, GAS_COST)
+        return program
+
     def step(self) -> None:
+        if self.tracer is not None:
+            self._traced_step(self.tracer)
+            return
+        self._step()
+
+    def _traced_step(self, tracer: Tracer) -> None:
+        pc = self.pc
+        opcode = self.code[pc]
+        gas = self.gas
+        start = time.perf_counter_ns()
+        try:
+            self._step()
+        except Exception as e:
+            elapsed = time.perf_counter_ns() - start
+            tracer.record(
+                pc, opcode, gas, gas - self.gas, elapsed, len(self.stack), str(e)
+            )
+            raise
+        elapsed = time.perf_counter_ns() - start
+        tracer.record(pc, opcode, gas, gas - self.gas, elapsed, len(self.stack))
+
+    def _step(self) -> None:
+        if not self.predecode:
+            self._interpret_step()
+            return
+        handler, cost, arg, next_pc = self._load_program().at(self.pc)
+        if self.gas < cost:
+            self.pc += 1
+            raise Exception("execution ran out of gas")
+        self.gas -= cost
+        self.pc = next_pc
+        handler(self, arg)
+
+    def _interpret_step(self) -> None:
         opcode = self.code[self.pc]
         self.pc += 1
 
@@ -225,26 +277,108 @@ class Machine:
         raise Exception(f"unknown opcode: {hex(opcode)}")
 
     def run(self) -> None:
-        while not self.stopped and self.pc < len(self.code):
-            self.step()
+        tracer = self.tracer
+        if tracer is not None:
+            # op by op, so that every step is seen; decoding is kept out of
+            # the first step's time
+            if self.predecode:
+                self._load_program()
+            while not self.stopped and self.pc < len(self.code):
+                self._traced_step(tracer)
+            return
+
+        if not self.predecode:
+            while not self.stopped and self.pc < len(self.code):
+                self._interpret_step()
+            return
+
+        program = self._load_program()
+        instructions = program.instructions
+        blocks = program.blocks
+        size = len(instructions)
+        while not self.stopped and self.pc < size:
+            # gas and stack bounds are checked once for a whole block when
+            # it can pass them; otherwise it runs op by op with the usual
+            # checks, so failures happen at exactly the same point
+            block = blocks[self.pc]
+            if (
+                block is not None
+                and self.gas >= block.gas
+                and block.min_height <= len(self.stack) <= block.max_height
+            ):
+                gas = self.gas
+                self.gas = gas - block.gas
+                try:
+                    for i, (handler, arg) in enumerate(block.body):
+                        handler(self, arg)
+                except Exception:
+                    self.gas = gas - block.gas_used[i]
+                    self.pc = block.next_pcs[i]
+                    raise
+                self.pc = block.end_pc
+                continue
+
+            handler, cost, arg, next_pc = (
+                instructions[self.pc] or program.at(self.pc)  # type: ignore
+            )
+            if self.gas < cost:
+                self.pc += 1
+                raise Exception("execution ran out of gas")
+            self.gas -= cost
+            self.pc = next_pc
+            handler(self, arg)
 
     def push_u256(self, value: int) -> list[int]:
         data = value.to_bytes(32, "big")
         return [OP_PUSH32] + list(data)
 
-    def execute_transaction(self, tx: Transaction) -> None:
-        total_cost = tx.calculate_gas_in_nim()
+    def execute_transaction(
+        self, tx: Transaction, state: Optional[JournaledState] = None
+    ) -> None:
+        # balances and storage go through the journal: the fee stays charged
+        # when the code fails, while the value transfer and every store are
+        # reverted with it
         if tx.sender == tx.recipient:
             return
-        if self.balance < total_cost + tx.value:
+        if state is None:
+            self._execute_on_own_state(tx)
+            return
+        total_cost = tx.calculate_gas_in_nim()
+        balance = state.balance(tx.sender)
+        if balance < total_cost + tx.value:
             raise Exception("insufficient balance for gas + value")
 
-        self.balance -= total_cost
-        self.balance -= tx.value
-
-        if tx.input_data and len(tx.input_data) > 0:
-            self.load(tx.input_data, tx.gas)
-            self.run()
+        state.set_balance(tx.sender, balance - total_cost)
+        checkpoint = state.checkpoint()
+        self.balance = balance - total_cost - tx.value
+        state.set_balance(tx.sender, self.balance)
+        state.set_balance(tx.recipient, state.balance(tx.recipient) + tx.value)
+        self.storage = StorageView(state, tx.recipient)  # type: ignore
+        try:
+            if tx.input_data:
+                self.load(tx.input_data, tx.gas)
+                self.run()
+        except Exception:
+            state.revert(checkpoint)
+            self.balance = balance - total_cost
+            raise
+        state.commit(checkpoint)
+
+    def _execute_on_own_state(self, tx: Transaction) -> None:
+        # without a state the machine's balance stands for the sender's and
+        # its storage for the recipient's, and the journal's surviving
+        # stores are written back into that storage
+        storage = self.storage if isinstance(self.storage, dict) else {}
+        state = JournaledState(
+            WorldState({tx.sender: self.balance}, {tx.recipient: storage})
+        )
+        try:
+            self.execute_transaction(tx, state)
+        finally:
+            for location, value in state.changes.items():
+                if isinstance(location, tuple):
+                    storage[location[1]] = value
+            self.storage = storage
 
 
 def push_address(addr: bytes) -> list[int]:
@@ -0,0 +1,403 @@
+import sys
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from pynim.cache import LRUCache
+from pynim.hashes import keccak256
+from pynim.vm.opcode import (
+    OP_ADD,
+    OP_ADDRESS,
+    OP_BALANCE,
+    OP_BASEFEE,
+    OP_BLOCKHASH,
+    OP_CODESIZE,
+    OP_DIV,
+    OP_GASLIMIT,
+    OP_GASPRICE,
+    OP_LOAD,
+    OP_MOD,
+    OP_MUL,
+    OP_NUMBER,
+    OP_PUSH,
+    OP_PUSH32,
+    OP_SELFBALANCE,
+    OP_STOP,
+    OP_STORE,
+    OP_SUB,
+    OP_TIMESTAMP,
+)
+
+if TYPE_CHECKING:
+    from pynim.vm.machine import Machine
+
+MASK = (1 << 256) - 1
+MAX_STACK = 256
+PROGRAM_CACHE_ENTRIES = 1024
+# code has no jumps, so a basic block only ends at STOP; longer runs are
+# split so that running out of gas only steps one short block op by op
+MAX_BLOCK_INSTRUCTIONS = 64
+
+# (handler, gas cost, immediate, pc of the next instruction)
+Instruction = tuple[Callable[["Machine", Any], None], int, Any, int]
+
+
+class StackOverflow(Exception):
+    pass
+
+
+class StackUnderflow(Exception):
+    pass
+
+
+# handlers mirror Machine's interpreter exactly, including what is left on
+# the stack when an operand is missing: a binary op pops what it can before
+# raising, which always leaves the stack empty. Results go through the same
+# overflow check as Machine._push, since PUSH32 can grow the stack past the
+# limit unchecked
+def _binary_operands(stack: list) -> tuple[Any, Any]:
+    if len(stack) < 2:
+        stack.clear()
+        raise StackUnderflow("Stack underflow")
+    b = stack.pop()
+    return stack.pop(), b
+
+
+def _push_checked(vm: "Machine", value: int) -> None:
+    stack = vm.stack
+    if len(stack) > MAX_STACK:
+        raise StackOverflow("Stack overflow")
+    stack.append(value & MASK)
+
+
+def _op_stop(vm: "Machine", arg: Any) -> None:
+    vm.stopped = True
+
+
+def _op_add(vm: "Machine", arg: Any) -> None:
+    a, b = _binary_operands(vm.stack)
+    _push_checked(vm, a + b)
+
+
+def _op_sub(vm: "Machine", arg: Any) -> None:
+    a, b = _binary_operands(vm.stack)
+    _push_checked(vm, a - b)
+
+
+def _op_mul(vm: "Machine", arg: Any) -> None:
+    a, b = _binary_operands(vm.stack)
+    _push_checked(vm, a * b)
+
+
+def _op_div(vm: "Machine", arg: Any) -> None:
+    a, b = _binary_operands(vm.stack)
+    _push_checked(vm, a // b)
+
+
+def _op_mod(vm: "Machine", arg: Any) -> None:
+    a, b = _binary_operands(vm.stack)
+    _push_checked(vm, 0 if b == 0 else a % b)
+
+
+def _op_push(vm: "Machine", arg: Any) -> None:
+    stack = vm.stack
+    if len(stack) > MAX_STACK:
+        # the interpreter fails before stepping over the immediate
+        vm.pc -= 1
+        raise StackOverflow("Stack overflow")
+    stack.append(arg)
+
+
+def _op_push_value(vm: "Machine", arg: Any) -> None:
+    _push_checked(vm, arg)
+
+
+def _op_push32(vm: "Machine", arg: Any) -> None:
+    # PUSH32 leaves its raw bytes on the stack, unchecked
+    vm.stack.append(arg)
+
+
+def _op_address(vm: "Machine", arg: Any) -> None:
+    _push_checked(vm, vm.address)
+
+
+def _op_balance(vm: "Machine", arg: Any) -> None:
+    _push_checked(vm, vm.balance)
+
+
+def _op_gasprice(vm: "Machine", arg: Any) -> None:
+    _push_checked(vm, vm.gas_price)
+
+
+def _op_block_env(vm: "Machine", arg: Any) -> None:
+    _push_checked(vm, vm.block_env[arg])
+
+
+def _op_store(vm: "Machine", arg: Any) -> None:
+    stack = vm.stack
+    if len(stack) < 2:
+        stack.clear()
+        raise StackUnderflow("Stack underflow")
+    key = stack.pop()
+    vm.storage[key] = stack.pop()
+
+
+def _op_load(vm: "Machine", arg: Any) -> None:
+    stack = vm.stack
+    if not stack:
+        raise StackUnderflow("Stack underflow")
+    _push_checked(vm, vm.storage.get(stack.pop()))  # type: ignore
+
+
+def _op_fail(vm: "Machine", arg: Any) -> None:
+    raise Exception(arg)
+
+
+# opcodes without an immediate; CODESIZE and the block environment reads
+# are bound to their argument when decoding
+HANDLERS: dict[int, Callable[["Machine", Any], None]] = {
+    OP_STOP: _op_stop,
+    OP_ADD: _op_add,
+    OP_SUB: _op_sub,
+    OP_MUL: _op_mul,
+    OP_DIV: _op_div,
+    OP_MOD: _op_mod,
+    OP_ADDRESS: _op_address,
+    OP_BALANCE: _op_balance,
+    OP_GASPRICE: _op_gasprice,
+    OP_SELFBALANCE: _op_balance,
+    OP_STORE: _op_store,
+    OP_LOAD: _op_load,
+}
+
+BLOCK_ENV_KEYS = {
+    OP_BLOCKHASH: "blockhash",
+    OP_TIMESTAMP: "timestamp",
+    OP_NUMBER: "number",
+    OP_GASLIMIT: "gaslimit",
+    OP_BASEFEE: "basefee",
+}
+
+
+def decode_instruction(
+    code: bytes, pc: int, gas_cost: dict[int, int]
+) -> Instruction:
+    opcode = code[pc]
+    cost = gas_cost.get(opcode)
+    if cost is None:
+        # the interpreter refuses an unknown opcode before charging gas
+        return _op_fail, 0, f"gas cost undefined for opcode: {hex(opcode)}", pc + 1
+
+    if opcode == OP_PUSH:
+        if pc + 1 >= len(code):
+            return _op_fail, cost, "PUSH missing immediate value", pc + 1
+        return _op_push, cost, code[pc + 1], pc + 2
+    if opcode == OP_PUSH32:
+        # the data starts one byte past the opcode
+        data = code[pc + 2 : pc + 34]
+        if len(data) < 32:
+            return _op_fail, cost, "PUSH32 missing data", pc + 1
+        return _op_push32, cost, bytes(data), pc + 34
+    if opcode == OP_CODESIZE:
+        return _op_push_value, cost, len(code), pc + 1
+    if opcode in BLOCK_ENV_KEYS:
+        return _op_block_env, cost, BLOCK_ENV_KEYS[opcode], pc + 1
+
+    handler = HANDLERS.get(opcode)
+    if handler is None:
+        return _op_fail, cost, f"unknown opcode: {hex(opcode)}", pc + 1
+    return handler, cost, None, pc + 1
+
+
+# the same operations without stack checks, for blocks whose bounds were
+# checked on entry
+def _fast_push(vm: "Machine", arg: Any) -> None:
+    vm.stack.append(arg)
+
+
+def _fast_add(vm: "Machine", arg: Any) -> None:
+    stack = vm.stack
+    b = stack.pop()
+    stack.append((stack.pop() + b) & MASK)
+
+
+def _fast_sub(vm: "Machine", arg: Any) -> None:
+    stack = vm.stack
+    b = stack.pop()
+    stack.append((stack.pop() - b) & MASK)
+
+
+def _fast_mul(vm: "Machine", arg: Any) -> None:
+    stack = vm.stack
+    b = stack.pop()
+    stack.append((stack.pop() * b) & MASK)
+
+
+def _fast_div(vm: "Machine", arg: Any) -> None:
+    stack = vm.stack
+    b = stack.pop()
+    stack.append((stack.pop() // b) & MASK)
+
+
+def _fast_mod(vm: "Machine", arg: Any) -> None:
+    stack = vm.stack
+    b = stack.pop()
+    a = stack.pop()
+    stack.append(0 if b == 0 else (a % b) & MASK)
+
+
+def _fast_address(vm: "Machine", arg: Any) -> None:
+    vm.stack.append(vm.address & MASK)
+
+
+def _fast_balance(vm: "Machine", arg: Any) -> None:
+    vm.stack.append(vm.balance & MASK)
+
+
+def _fast_gasprice(vm: "Machine", arg: Any) -> None:
+    vm.stack.append(vm.gas_price & MASK)
+
+
+def _fast_block_env(vm: "Machine", arg: Any) -> None:
+    vm.stack.append(vm.block_env[arg] & MASK)
+
+
+def _fast_store(vm: "Machine", arg: Any) -> None:
+    stack = vm.stack
+    key = stack.pop()
+    vm.storage[key] = stack.pop()
+
+
+def _fast_load(vm: "Machine", arg: Any) -> None:
+    stack = vm.stack
+    stack.append(vm.storage.get(stack.pop()) & MASK)  # type: ignore
+
+
+# handler -> (unchecked handler, values popped, values pushed, whether the
+# push is bounds checked); only PUSH32 pushes without a check
+STACK_EFFECTS: dict[Callable, tuple[Callable, int, int, bool]] = {
+    _op_stop: (_op_stop, 0, 0, False),
+    _op_add: (_fast_add, 2, 1, True),
+    _op_sub: (_fast_sub, 2, 1, True),
+    _op_mul: (_fast_mul, 2, 1, True),
+    _op_div: (_fast_div, 2, 1, True),
+    _op_mod: (_fast_mod, 2, 1, True),
+    _op_push: (_fast_push, 0, 1, True),
+    _op_push_value: (_fast_push, 0, 1, True),
+    _op_push32: (_fast_push, 0, 1, False),
+    _op_address: (_fast_address, 0, 1, True),
+    _op_balance: (_fast_balance, 0, 1, True),
+    _op_gasprice: (_fast_gasprice, 0, 1, True),
+    _op_block_env: (_fast_block_env, 0, 1, True),
+    _op_store: (_fast_store, 2, 0, False),
+    _op_load: (_fast_load, 1, 1, True),
+    _op_fail: (_op_fail, 0, 0, False),
+}
+
+
+class BasicBlock:
+    __slots__ = (
+        "gas",
+        "min_height",
+        "max_height",
+        "end_pc",
+        "body",
+        "gas_used",
+        "next_pcs",
+    )
+
+    def __init__(self, instructions: list[Instruction]) -> None:
+        body = []
+        gas_used = []
+        gas = 0
+        height = 0
+        min_height = 0
+        # highest height, relative to entry, at which a checked push runs;
+        # an op checks after taking its operands off the stack
+        push_height: Optional[int] = None
+        for handler, cost, arg, _ in instructions:
+            fast, pops, pushes, checked = STACK_EFFECTS[handler]
+            min_height = max(min_height, pops - height)
+            check_height = height - pops
+            if checked and (push_height is None or check_height > push_height):
+                push_height = check_height
+            height += pushes - pops
+            gas += cost
+            gas_used.append(gas)
+            body.append((fast, arg))
+
+        # entering with gas >= self.gas and a stack height within
+        # [min_height, max_height] passes every per-op check in the block
+        self.gas = gas
+        self.min_height = min_height
+        # PUSH32 pushes unchecked, so a block without checked pushes takes
+        # any height
+        self.max_height = (
+            MAX_STACK - push_height if push_height is not None else sys.maxsize
+        )
+        self.end_pc = instructions[-1][3]
+        self.body = tuple(body)
+        # gas charged and pc reached up to each instruction, to rewind to
+        # when an instruction raises
+        self.gas_used = gas_used
+        self.next_pcs = [instruction[3] for instruction in instructions]
+
+
+def find_basic_blocks(
+    instructions: list[Optional[Instruction]],
+) -> list[Optional[BasicBlock]]:
+    blocks: list[Optional[BasicBlock]] = [None] * len(instructions)
+    start = 0
+    current: list[Instruction] = []
+    pc = 0
+    while pc < len(instructions):
+        instruction = instructions[pc]
+        current.append(instruction)  # type: ignore
+        pc = instruction[3]  # type: ignore
+        if (
+            instruction[0] is _op_stop  # type: ignore
+            or len(current) == MAX_BLOCK_INSTRUCTIONS
+            or pc >= len(instructions)
+        ):
+            blocks[start] = BasicBlock(current)
+            start = pc
+            current = []
+    return blocks
+
+
+class Program:
+    __slots__ = ("code", "code_hash", "instructions", "blocks", "gas_cost")
+
+    def __init__(
+        self, code: bytes, code_hash: bytes, gas_cost: dict[int, int]
+    ) -> None:
+        self.code = code
+        self.code_hash = code_hash
+        self.gas_cost = gas_cost
+        # indexed by pc; bytes inside an immediate stay None
+        self.instructions: list[Optional[Instruction]] = [None] * len(code)
+
+        pc = 0
+        while pc < len(code):
+            instruction = decode_instruction(code, pc, gas_cost)
+            self.instructions[pc] = instruction
+            pc = instruction[3]
+        # indexed by the pc each block starts at
+        self.blocks = find_basic_blocks(self.instructions)
+
+    def at(self, pc: int) -> Instruction:
+        instruction = self.instructions[pc]
+        if instruction is None:
+            # only reachable by moving pc by hand into an immediate
+            instruction = decode_instruction(self.code, pc, self.gas_cost)
+        return instruction
+
+
+PROGRAM_CACHE: LRUCache[Program] = LRUCache(max_entries=PROGRAM_CACHE_ENTRIES)
+
+
+def load_program(code: bytes, gas_cost: dict[int, int]) -> Program:
+    code_hash = keccak256(code)
+    program = PROGRAM_CACHE.get(code_hash)
+    if program is None or program.gas_cost is not gas_cost:
+        program = Program(bytes(code), code_hash, gas_cost)
+        PROGRAM_CACHE.put(code_hash, program)
+    return program
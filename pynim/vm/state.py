@@ -0,0 +1,278 @@
+from typing import Any, Hashable, Optional, Protocol, Sequence
+
+from pynim import rlp
+from pynim.cache import LRUCache
+from pynim.database import NS_STATE, KeyValueReader, WriteBatch, open_database
+from pynim.datatypes import Transaction
+
+STATE_CACHE_ENTRIES = 65_536
+BALANCE_PREFIX = b"b"
+STORAGE_PREFIX = b"s"
+
+# a state location is an account address for its balance, or an
+# (address, key) pair for a storage slot
+Location = Hashable
+
+# marks a location that had no change before a journaled write
+MISSING = object()
+
+
+class StateReader(Protocol):
+    def balance(self, address: bytes) -> int:
+        ...
+
+    def load(self, address: bytes, key: Any) -> Any:
+        ...
+
+
+class WorldState:
+    def __init__(
+        self,
+        balances: Optional[dict[bytes, int]] = None,
+        storage: Optional[dict[bytes, dict[Any, Any]]] = None,
+    ) -> None:
+        self.balances = balances if balances is not None else {}
+        self.storage = storage if storage is not None else {}
+
+    def balance(self, address: bytes) -> int:
+        return self.balances.get(address, 0)
+
+    def load(self, address: bytes, key: Any) -> Any:
+        slots = self.storage.get(address)
+        return slots.get(key) if slots is not None else None
+
+    def apply(self, writes: dict[Location, Any]) -> None:
+        for location, value in writes.items():
+            if isinstance(location, tuple):
+                address, key = location
+                self.storage.setdefault(address, {})[key] = value
+            else:
+                self.balances[location] = value
+
+    def subset(self, transactions: Sequence[Transaction]) -> "WorldState":
+        # everything the transactions can touch, to ship to a worker
+        addresses = {tx.sender for tx in transactions}
+        addresses.update(tx.recipient for tx in transactions)
+        return WorldState(
+            {a: self.balances[a] for a in addresses if a in self.balances},
+            {a: self.storage[a] for a in addresses if a in self.storage},
+        )
+
+
+def _encode_word(word: Any) -> bytes:
+    # stack words are 256-bit ints, except what PUSH32 leaves behind: raw
+    # bytes, which are kept apart by an extra leading byte
+    if isinstance(word, bytes):
+        return b"\x01" + word
+    return word.to_bytes(32, "big")
+
+
+def _decode_word(b: bytes) -> Any:
+    if len(b) == 32:
+        return int.from_bytes(b, "big")
+    return bytes(b[1:])
+
+
+def _storage_prefix(address: bytes) -> bytes:
+    return STORAGE_PREFIX + bytes([len(address)]) + address
+
+
+def state_key(location: Location) -> bytes:
+    if isinstance(location, tuple):
+        address, key = location
+        return _storage_prefix(address) + _encode_word(key)
+    return BALANCE_PREFIX + location  # type: ignore
+
+
+class PersistentState:
+    # world state kept in the database; applied changes stay in memory until
+    # they are flushed into a write batch, so executing a block never copies
+    # the state it runs on
+    def __init__(
+        self, db: KeyValueReader, cache_entries: int = STATE_CACHE_ENTRIES
+    ) -> None:
+        self.db = db
+        self.dirty: dict[Location, Any] = {}
+        self.cache: LRUCache[Any] = LRUCache(max_entries=cache_entries)
+
+    def _read(self, location: Location) -> Any:
+        if location in self.dirty:
+            return self.dirty[location]
+        value = self.cache.get(location)
+        if value is None:
+            raw = self.db.read(state_key(location), NS_STATE)
+            if raw is None:
+                value = MISSING
+            elif isinstance(location, tuple):
+                value = _decode_word(raw)
+            else:
+                value = rlp.decode_int(raw)
+            self.cache.put(location, value)
+        return None if value is MISSING else value
+
+    def balance(self, address: bytes) -> int:
+        value = self._read(address)
+        return 0 if value is None else value
+
+    def load(self, address: bytes, key: Any) -> Any:
+        return self._read((address, key))
+
+    def apply(self, writes: dict[Location, Any]) -> None:
+        self.dirty.update(writes)
+
+    def subset(self, transactions: Sequence[Transaction]) -> "StateSubset":
+        addresses = {tx.sender for tx in transactions}
+        addresses.update(tx.recipient for tx in transactions)
+        overlay = {
+            location: value
+            for location, value in self.dirty.items()
+            if (location[0] if isinstance(location, tuple) else location) in addresses
+        }
+        return StateSubset(self.db, overlay)
+
+    def flush(self, batch: WriteBatch) -> int:
+        for location, value in self.dirty.items():
+            if isinstance(location, tuple):
+                raw = _encode_word(value)
+            else:
+                raw = rlp.encode_int(value)
+            batch.write(state_key(location), raw, NS_STATE)
+            self.cache.put(location, value)
+        count = len(self.dirty)
+        self.dirty = {}
+        return count
+
+
+# databases reopened by path in worker processes, one per path
+_readers: dict[str, KeyValueReader] = {}
+
+
+def _open_reader(path: str, config: Any) -> KeyValueReader:
+    reader = _readers.get(path)
+    if reader is None:
+        reader = _readers[path] = open_database(path, config)
+    return reader
+
+
+class StateSubset:
+    # what a worker needs to run a chunk of a block: the uncommitted
+    # changes to the chunk's accounts, over the database, which is only
+    # read where a transaction looks. Pickled for a worker process, it
+    # carries the database's path and the worker opens it once; a LevelDB
+    # database is locked by its owner, so it needs a thread pool instead
+    def __init__(self, db: KeyValueReader, overlay: dict[Location, Any]) -> None:
+        self.db = db
+        self.overlay = overlay
+
+    def _read(self, location: Location) -> Any:
+        overlay = self.overlay
+        if location in overlay:
+            return overlay[location]
+        raw = self.db.read(state_key(location), NS_STATE)
+        if raw is None:
+            value = None
+        elif isinstance(location, tuple):
+            value = _decode_word(raw)
+        else:
+            value = rlp.decode_int(raw)
+        overlay[location] = value
+        return value
+
+    def balance(self, address: bytes) -> int:
+        value = self._read(address)
+        return 0 if value is None else value
+
+    def load(self, address: bytes, key: Any) -> Any:
+        return self._read((address, key))
+
+    def __getstate__(self) -> tuple:
+        path = getattr(self.db, "path", None)
+        if path is None or path == ":memory:":
+            raise TypeError("an in-memory state cannot be sent to another process")
+        return path, self.db.config, self.overlay  # type: ignore
+
+    def __setstate__(self, state: tuple) -> None:
+        path, config, self.overlay = state
+        self.db = _open_reader(path, config)
+
+
+class JournaledState:
+    # changes on top of a backing state. Each write made under a checkpoint
+    # is journaled with the value it replaced, so reverting or committing
+    # costs as much as the changes since the checkpoint, however large the
+    # state is
+    def __init__(self, backend: StateReader) -> None:
+        self.backend = backend
+        self.changes: dict[Location, Any] = {}
+        # locations read from the backend
+        self.reads: set[Location] = set()
+        self.journal: list[tuple[Location, Any]] = []
+        self.checkpoints: list[int] = []
+
+    def balance(self, address: bytes) -> int:
+        if address in self.changes:
+            return self.changes[address]
+        self.reads.add(address)
+        return self.backend.balance(address)
+
+    def set_balance(self, address: bytes, value: int) -> None:
+        self._set(address, value)
+
+    def load(self, address: bytes, key: Any) -> Any:
+        location = (address, key)
+        if location in self.changes:
+            return self.changes[location]
+        self.reads.add(location)
+        return self.backend.load(address, key)
+
+    def store(self, address: bytes, key: Any, value: Any) -> None:
+        self._set((address, key), value)
+
+    def _set(self, location: Location, value: Any) -> None:
+        if self.checkpoints:
+            self.journal.append((location, self.changes.get(location, MISSING)))
+        self.changes[location] = value
+
+    def checkpoint(self) -> int:
+        self.checkpoints.append(len(self.journal))
+        return len(self.checkpoints) - 1
+
+    def revert(self, checkpoint: Optional[int] = None) -> None:
+        # undoes every change since the checkpoint, the latest by default;
+        # checkpoints taken after it are dropped too
+        if checkpoint is None:
+            checkpoint = len(self.checkpoints) - 1
+        mark = self.checkpoints[checkpoint]
+        del self.checkpoints[checkpoint:]
+        journal = self.journal
+        changes = self.changes
+        while len(journal) > mark:
+            location, previous = journal.pop()
+            if previous is MISSING:
+                del changes[location]
+            else:
+                changes[location] = previous
+
+    def commit(self, checkpoint: Optional[int] = None) -> None:
+        # keeps the changes since the checkpoint; an enclosing checkpoint
+        # can still revert them
+        if checkpoint is None:
+            checkpoint = len(self.checkpoints) - 1
+        del self.checkpoints[checkpoint:]
+        if not self.checkpoints:
+            self.journal.clear()
+
+
+class StorageView:
+    # stands in for Machine.storage, on one contract's slots
+    __slots__ = ("state", "address")
+
+    def __init__(self, state: JournaledState, address: bytes) -> None:
+        self.state = state
+        self.address = address
+
+    def get(self, key: Any) -> Any:
+        return self.state.load(self.address, key)
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self.state.store(self.address, key, value)
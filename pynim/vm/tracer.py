@@ -0,0 +1,91 @@
+import json
+from dataclasses import dataclass
+from typing import Optional, TextIO
+
+from pynim.vm import opcode as opcodes
+
+OPCODE_NAMES = {
+    value: name[len("OP_") :]
+    for name, value in vars(opcodes).items()
+    if name.startswith("OP_")
+}
+
+
+def opcode_name(opcode: int) -> str:
+    return OPCODE_NAMES.get(opcode, hex(opcode))
+
+
+@dataclass
+class OpcodeProfile:
+    count: int = 0
+    gas: int = 0
+    nanoseconds: int = 0
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "gas": self.gas, "ns": self.nanoseconds}
+
+
+class Tracer:
+    # attached to Machine.tracer; profiles every step and, given a stream,
+    # writes each one to it as a line of JSON
+    def __init__(self, stream: Optional[TextIO] = None) -> None:
+        self.stream = stream
+        self.opcodes: dict[int, OpcodeProfile] = {}
+        self.steps = 0
+        self.gas_used = 0
+        self.nanoseconds = 0
+        self.peak_stack = 0
+        self.error: Optional[str] = None
+
+    def record(
+        self,
+        pc: int,
+        opcode: int,
+        gas: int,
+        cost: int,
+        nanoseconds: int,
+        depth: int,
+        error: Optional[str] = None,
+    ) -> None:
+        profile = self.opcodes.get(opcode)
+        if profile is None:
+            profile = self.opcodes[opcode] = OpcodeProfile()
+        profile.count += 1
+        profile.gas += cost
+        profile.nanoseconds += nanoseconds
+        self.steps += 1
+        self.gas_used += cost
+        self.nanoseconds += nanoseconds
+        if depth > self.peak_stack:
+            self.peak_stack = depth
+        if error is not None:
+            self.error = error
+
+        if self.stream is not None:
+            step = {
+                "step": self.steps,
+                "pc": pc,
+                "op": opcode_name(opcode),
+                "gas": gas,
+                "cost": cost,
+                "depth": depth,
+                "ns": nanoseconds,
+            }
+            if error is not None:
+                step["error"] = error
+            self.stream.write(json.dumps(step) + "\n")
+
+    def to_dict(self) -> dict:
+        return {
+            "steps": self.steps,
+            "gas_used": self.gas_used,
+            "ns": self.nanoseconds,
+            "peak_stack": self.peak_stack,
+            "error": self.error,
+            "opcodes": {
+                opcode_name(opcode): profile.to_dict()
+                for opcode, profile in sorted(
+                    self.opcodes.items(), key=lambda item: -item[1].gas
+                )
+            },
+        }
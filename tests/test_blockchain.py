@@ -0,0 +1,185 @@
+import random
+from typing import Optional
+import time
+
+import pytest
+
+from pynim.account import Account
+from pynim.blockchain import Blockchain
+from pynim.blockstore import BlockCacheConfig
+from pynim.blocktree import BlockTree, heaviest_chain
+from pynim.chainstore import ChainStore
+from pynim.consensus import ConsensusEngine
+from pynim.database import NS_TX_INDEX, Database
+from pynim.datatypes import Block, Header, Transaction
+from pynim.genesis import GenesisBlock
+from pynim.transaction_pool import PARALLEL_BATCH_THRESHOLD
+from pynim.vm.machine import Machine
+
+
+GENESIS_TIME = int(time.time()) - 10_000
+
+
+def make_chain(path: str, cache: Optional[BlockCacheConfig] = None) -> Blockchain:
+    store = ChainStore(Database(path), cache)
+    account = Account(None, {}, public_key=b"\x01" * 32)
+    genesis = GenesisBlock(GENESIS_TIME, account, transactions=[])
+    consensus = ConsensusEngine(
+        0,
+        {account.address: 1},
+        [account.address],
+        store,
+        BlockTree(heaviest_chain),
+    )
+    return Blockchain(
+        "test", genesis, None, store, store.db, [account], Machine(), consensus
+    )
+
+
+def make_transaction(i: int) -> Transaction:
+    return Transaction(
+        int(time.time()) - 10_000,
+        None,
+        0,
+        b"\xee" * 20,
+        i.to_bytes(20, "big"),
+        1,
+        None,
+        None,
+        21_000,
+        1,
+    )
+
+
+def make_child(parent: Block, i: int, weight: int) -> Block:
+    # gas limits differ so that siblings never share a header
+    header = Header(
+        parent.header.timestamp + 1,
+        parent.hash(),
+        parent.header.number + 1,
+        30_000_000 + i,
+        weight,
+        1,
+    )
+    return Block(header, [make_transaction(i)], None)
+
+
+def test_reorgs_keep_the_height_index_canonical(tmp_path):
+    chain = make_chain(str(tmp_path / "chain.db"))
+    store = chain.block_by_hash
+    tree = chain.consensus.block_tree
+    rng = random.Random(18)
+    blocks: list[Block] = [chain.genesis_block]
+    for i in range(150):
+        block = make_child(rng.choice(blocks[-6:]), i, rng.randint(1, 5))
+        assert chain.add_block(block)
+        blocks.append(block)
+
+        assert store.head_hash == tree.head == chain.current_block.hash()
+        base = tree.base_number
+        top = tree.header(tree.head).number  # type: ignore
+        for number in range(base + 1, top + 1):
+            assert store.get_block_hash(number) == tree.canonical_hash(number)
+        assert store.get_block_hash(top + 1) is None
+        for block_hash in tree:
+            if block_hash == tree.root.hash:  # type: ignore
+                continue
+            canonical = tree.is_canonical(block_hash)
+            for transaction in store[block_hash].transactions:
+                expected = block_hash if canonical else None
+                assert store.db.read(transaction.hash, NS_TX_INDEX) == expected
+                if canonical:
+                    assert not chain.transaction_pool.contains(transaction.hash)
+
+
+def test_a_new_store_holds_genesis_as_its_first_block(tmp_path):
+    path = str(tmp_path / "chain.db")
+    chain = make_chain(path)
+    genesis = chain.genesis_block
+    number = genesis.header.number
+    assert chain.get_block_by_number(number) is genesis
+    assert chain.get_block_by_hash(genesis.hash()) is not None
+    assert chain.block_by_hash.get_block_hash(number) == genesis.hash()
+    chain.block_by_hash.db.close()
+
+    # reopening resumes at genesis, and blocks still extend it
+    chain = make_chain(path)
+    assert chain.current_block is chain.genesis_block
+    assert chain.add_block(make_child(chain.genesis_block, 0, 1))
+    assert chain.block_by_hash.get_block_hash(number) == genesis.hash()
+
+
+def test_a_reorg_within_one_import_reads_uncommitted_blocks(tmp_path):
+    # bodies never fit the cache, so blocks of the batch are found only in
+    # the batch itself
+    cache = BlockCacheConfig(block_cache_bytes=1)
+    chain = make_chain(str(tmp_path / "chain.db"), cache)
+    genesis = chain.genesis_block
+    a1 = make_child(genesis, 0, 5)
+    assert chain.add_block(a1)
+
+    b1 = make_child(genesis, 1, 1)
+    b2 = make_child(b1, 2, 5)
+    assert chain.import_blocks([b1, b2]) == 2
+    assert chain.current_block is b2
+    store = chain.block_by_hash
+    assert store.get_block_hash(b1.header.number) == b1.hash()
+    assert store.db.read(a1.transactions[0].hash, NS_TX_INDEX) is None
+    assert store.db.read(b1.transactions[0].hash, NS_TX_INDEX) == b1.hash()
+
+
+def test_a_failed_commit_leaves_fork_choice_as_it_was(tmp_path, monkeypatch):
+    chain = make_chain(str(tmp_path / "chain.db"))
+    tree = chain.consensus.block_tree
+    genesis = chain.genesis_block
+    a1 = make_child(genesis, 0, 1)
+    assert chain.add_block(a1)
+
+    b1 = make_child(genesis, 1, 1)
+    b2 = make_child(b1, 2, 5)
+    store = chain.block_by_hash
+
+    def fail(batch):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as m:
+        m.setattr(store.db, "apply_batch", fail)
+        with pytest.raises(OSError):
+            chain.import_blocks([b1, b2])
+    assert tree.head == chain.consensus.current_head == a1.hash()
+    assert chain.current_block is a1
+    assert store.head_hash == a1.hash()
+    assert b1.hash() not in tree and b2.hash() not in tree
+    assert tree.canonical_hash(a1.header.number) == a1.hash()
+    assert store.get_block(b2.hash()) is None
+
+    assert chain.import_blocks([b1, b2]) == 2
+    assert tree.head == store.head_hash == b2.hash()
+
+
+def test_batch_admission_validates_in_spawned_workers(tmp_path):
+    chain = make_chain(str(tmp_path / "chain.db"))
+    executor = chain._validation_executor
+    assert executor is not None
+    assert executor._mp_context.get_start_method() == "spawn"
+
+    transactions = [make_transaction(i) for i in range(PARALLEL_BATCH_THRESHOLD)]
+    # too far in the future to admit
+    future = Transaction(
+        int(time.time()) + 3_600, None, 0, b"\xee" * 20, b"\xff" * 20, 1, None,
+        None, 21_000, 1,
+    )
+    transactions.insert(7, future)
+    try:
+        admitted = chain.add_batch(transactions)
+        assert executor._processes  # type: ignore[attr-defined]
+    finally:
+        chain.close()
+
+    assert admitted == [t is not future for t in transactions]
+    assert len(chain.transaction_pool) == PARALLEL_BATCH_THRESHOLD
+    for transaction in transactions[:3]:
+        assert chain.get_transaction(transaction.hash) is not None
+    # a closed chain still admits, inline
+    assert chain.add_batch([make_transaction(PARALLEL_BATCH_THRESHOLD)]) == [True]
+    chain.block_by_hash.close()
@@ -0,0 +1,59 @@
+import random
+from typing import Optional
+
+from pynim.blocktree import BlockTree, heaviest_chain
+from pynim.datatypes import Header
+
+
+def random_tree(rng: random.Random, count: int) -> tuple[BlockTree, dict]:
+    tree = BlockTree(heaviest_chain)
+    parents: dict[bytes, Optional[bytes]] = {}
+    root = Header(0, b"\x00" * 32, 10, 0, 1, 0)
+    tree.add(root.hash(), root)
+    parents[root.hash()] = None
+    hashes = [root.hash()]
+    for _ in range(count):
+        # mostly long branches, with the occasional fork far back
+        if rng.random() < 0.9:
+            parent_hash = rng.choice(hashes[-3:])
+        else:
+            parent_hash = rng.choice(hashes)
+        parent = tree.header(parent_hash)
+        weight = rng.randint(1, 3)
+        header = Header(
+            rng.randrange(2**32), parent_hash, parent.number + 1, 0, weight, 0
+        )
+        tree.add(header.hash(), header)
+        parents[header.hash()] = parent_hash
+        hashes.append(header.hash())
+    return tree, parents
+
+
+def naive_common_ancestor(parents: dict, a: bytes, b: bytes) -> bytes:
+    seen = set()
+    while a is not None:
+        seen.add(a)
+        a = parents[a]
+    while b not in seen:
+        b = parents[b]
+    return b
+
+
+def test_common_ancestor_matches_naive_walk():
+    rng = random.Random(18)
+    tree, parents = random_tree(rng, 2_000)
+    hashes = list(parents)
+    for _ in range(3_000):
+        a, b = rng.choice(hashes), rng.choice(hashes)
+        assert tree.common_ancestor(a, b) == naive_common_ancestor(parents, a, b)
+    assert tree.common_ancestor(hashes[5], b"\x00" * 32) is None
+
+
+def test_common_ancestor_after_prune():
+    rng = random.Random(19)
+    tree, parents = random_tree(rng, 500)
+    tree.prune(tree.canonical[len(tree.canonical) // 2])
+    hashes = list(tree)
+    for _ in range(1_000):
+        a, b = rng.choice(hashes), rng.choice(hashes)
+        assert tree.common_ancestor(a, b) == naive_common_ancestor(parents, a, b)
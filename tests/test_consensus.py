@@ -0,0 +1,122 @@
+import random
+
+import pytest
+
+from pynim.batch import TransactionBatch
+from pynim.blocktree import BlockTree, heaviest_chain
+from pynim.chainstore import ChainStore
+from pynim.consensus import ConsensusEngine
+from pynim.database import NS_TX_INDEX, Database
+from pynim.datatypes import Block, Header, Transaction
+from pynim.views import TransactionView
+
+VALIDATOR = b"\x0a" * 20
+
+
+def make_engine() -> ConsensusEngine:
+    return ConsensusEngine(0, {VALIDATOR: 1}, [VALIDATOR], {})
+
+
+def make_transaction(sender: bytes, nonce: int) -> Transaction:
+    return Transaction(0, None, nonce, b"\xee" * 20, sender, 1, b"", b"", 21_000, 1)
+
+
+def test_view_validation_decodes_only_sender_and_nonce(monkeypatch):
+    transactions = [make_transaction(bytes([i % 3]) * 20, i) for i in range(9)]
+    raw = Block(Header(0, b"\x00" * 32, 0, 0, 0, 0), transactions, None).serialize()
+
+    def undecodable(self):
+        raise AssertionError("field decoded")
+
+    for name in ("timestamp", "recipient", "value", "gas", "gas_price"):
+        monkeypatch.setattr(TransactionView, name, property(undecodable))
+    assert make_engine().verify_block_bytes(raw)
+
+
+def test_transaction_checks_agree_on_every_input_type():
+    rng = random.Random(10)
+    engine = make_engine()
+    for _ in range(500):
+        transactions = [
+            make_transaction(bytes([rng.randrange(3)]) * 20, rng.randrange(6))
+            for _ in range(rng.randint(0, 8))
+        ]
+        views = [TransactionView(tx.serialize()) for tx in transactions]
+        batch = TransactionBatch.from_transactions(transactions)
+        expected = engine.validate_transactions(batch)
+        assert engine.validate_transactions(transactions) == expected
+        assert engine.validate_transactions(views) == expected
+
+
+def test_decoded_transactions_are_checked_as_a_batch(monkeypatch):
+    checked = []
+    nonces_increasing = TransactionBatch.nonces_increasing
+
+    def spy(self):
+        checked.append(len(self))
+        return nonces_increasing(self)
+
+    monkeypatch.setattr(TransactionBatch, "nonces_increasing", spy)
+    transactions = [make_transaction(bytes([i % 2]) * 20, i) for i in range(4)]
+    block = Block(Header(0, b"\x00" * 32, 0, 0, 0, 0), transactions, None)
+    assert make_engine().verify_block(block)
+    assert checked == [4]
+
+
+@pytest.mark.parametrize("nonces, valid", [([0, 1, 2], True), ([0, 2, 2], False)])
+def test_nonces_must_increase_per_sender(nonces, valid):
+    transactions = [make_transaction(b"\x01" * 20, n) for n in nonces]
+    transactions.insert(1, make_transaction(b"\x02" * 20, 0))
+    assert make_engine().validate_transactions(transactions) is valid
+
+
+def random_fork_blocks(rng: random.Random, count: int) -> list[Block]:
+    # every block extends a random earlier one; with heaviest_chain fork
+    # choice a shorter branch can win, leaving heights above its head.
+    # Gas limits differ so that siblings never share a header
+    genesis = Block(Header(0, b"\x00" * 32, 0, 0, 1, 0), [], None)
+    blocks = [genesis]
+    for i in range(count):
+        parent = rng.choice(blocks[-6:])
+        header = Header(
+            parent.header.timestamp + 1,
+            parent.hash(),
+            parent.header.number + 1,
+            30_000_000 + i,
+            rng.randint(1, 5),
+            1,
+        )
+        transaction = make_transaction(i.to_bytes(20, "big"), 0)
+        blocks.append(Block(header, [transaction], None))
+    return blocks
+
+
+def test_apply_block_indexes_only_the_canonical_chain(tmp_path):
+    store = ChainStore(Database(str(tmp_path / "chain.db")))
+    engine = ConsensusEngine(
+        0, {VALIDATOR: 1}, [VALIDATOR], store, BlockTree(heaviest_chain)
+    )
+    tree = engine.block_tree
+    reorgs = 0
+    for block in random_fork_blocks(random.Random(18), 200):
+        head = tree.head
+        assert engine.apply_block(block)
+        h = block.hash()
+        if head is not None and tree.head == h and block.header.parent_hash != head:
+            reorgs += 1
+
+        top = tree.header(tree.head).number  # type: ignore
+        for number in range(top + 1):
+            assert store.get_block_hash(number) == tree.canonical_hash(number)
+        assert store.get_block_hash(top + 1) is None
+        for block_hash in tree:
+            for transaction in store[block_hash].transactions:
+                expected = block_hash if tree.is_canonical(block_hash) else None
+                assert store.db.read(transaction.hash, NS_TX_INDEX) == expected
+    assert reorgs > 5
+
+
+def test_engine_keeps_the_empty_tree_it_is_given():
+    tree = BlockTree(heaviest_chain)
+    engine = ConsensusEngine(0, {VALIDATOR: 1}, [VALIDATOR], {}, tree)
+    assert engine.block_tree is tree
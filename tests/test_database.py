@@ -0,0 +1,77 @@
+import sqlite3
+
+import pytest
+
+from pynim.database import (
+    NS_DEFAULT,
+    NS_METADATA,
+    Database,
+    DatabaseConfig,
+    open_database,
+)
+
+
+def test_from_dict_fills_in_defaults():
+    config = DatabaseConfig.from_dict({"synchronous": "FULL", "cache_size": "-100"})
+    assert config.synchronous == "FULL"
+    assert config.cache_size == -100
+    assert config.journal_mode == DatabaseConfig.journal_mode
+
+
+@pytest.mark.parametrize("field", ["journal_mode", "synchronous", "auto_vacuum"])
+def test_pragma_values_must_be_sqlite_keywords(tmp_path, field):
+    path = tmp_path / "chain.db"
+    config = DatabaseConfig.from_dict({field: "WAL; DROP TABLE kv"})
+    with pytest.raises(ValueError, match=field):
+        open_database(str(path), config)
+    assert not path.exists()
+
+
+def test_pragmas_are_applied(tmp_path):
+    config = DatabaseConfig(synchronous="full", auto_vacuum="incremental")
+    db = Database(str(tmp_path / "chain.db"), config)
+    assert db.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert db.conn.execute("PRAGMA synchronous").fetchone()[0] == 2
+    assert db.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    db.close()
+
+
+def test_write_batch_applies_all_or_nothing(tmp_path):
+    db = Database(str(tmp_path / "chain.db"))
+    db.write(b"gone", b"0")
+    snapshot = db.snapshot()
+    with db.write_batch() as batch:
+        for i in range(100):
+            batch.write(i.to_bytes(2, "big"), b"v", NS_METADATA)
+        batch.delete(b"gone")
+    assert sum(1 for _ in db.iterate(NS_METADATA)) == 100
+    assert db.read(b"gone") is None
+    # a reader pinned before the batch does not see it
+    assert snapshot.read(b"gone") == b"0"
+    assert snapshot.read(b"\x00\x00", NS_METADATA) is None
+    snapshot.close()
+
+    with pytest.raises(RuntimeError):
+        with db.write_batch() as batch:
+            batch.write(b"half", b"v")
+            raise RuntimeError("stop")
+    assert db.read(b"half") is None
+    db.close()
+
+
+def test_legacy_table_is_migrated(tmp_path):
+    path = str(tmp_path / "chain.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE database (key BLOB, value BLOB)")
+    rows = [(b"a", b"1"), (b"b", b"2"), (b"a", b"3"), (None, b"x")]
+    conn.executemany("INSERT INTO database (key, value) VALUES (?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+    db = Database(path)
+    assert db.read(b"a", NS_DEFAULT) == b"3"
+    assert db.read(b"b") == b"2"
+    assert sum(1 for _ in db.iterate()) == 2
+    tables = db.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    assert [name for (name,) in tables] == ["kv"]
+    db.close()
@@ -0,0 +1,163 @@
+import pickle
+import random
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from pynim.database import Database
+from pynim.datatypes import Transaction
+from pynim.vm.executor import execute_block, execute_sequential, execute_transaction
+from pynim.vm.machine import Machine
+from pynim.vm.opcode import OP_ADD, OP_LOAD, OP_PUSH, OP_STOP, OP_STORE
+from pynim.vm.state import JournaledState, PersistentState, WorldState
+
+SENDER = b"\x01" * 20
+CONTRACT = b"\x02" * 20
+# slot 0 += 1, then slot 1 = 7
+INCREMENT = bytes(
+    [OP_PUSH, 0, OP_LOAD, OP_PUSH, 1, OP_ADD, OP_PUSH, 0, OP_STORE]
+    + [OP_PUSH, 7, OP_PUSH, 1, OP_STORE, OP_STOP]
+)
+
+
+def make_transaction(
+    sender: bytes, recipient: bytes, code: bytes, gas: int = 1_000, value: int = 5
+) -> Transaction:
+    return Transaction(0, None, 0, recipient, sender, value, code, None, gas, 1)
+
+
+def test_machine_commits_through_journal():
+    state = JournaledState(WorldState({SENDER: 10_000}, {CONTRACT: {0: 1}}))
+    machine = Machine()
+    machine.execute_transaction(make_transaction(SENDER, CONTRACT, INCREMENT), state)
+    assert state.balance(SENDER) == 10_000 - 1_000 - 5
+    assert state.balance(CONTRACT) == 5
+    assert state.load(CONTRACT, 0) == 2
+    assert state.load(CONTRACT, 1) == 7
+    assert state.checkpoints == [] and state.journal == []
+
+
+def test_machine_failure_keeps_only_the_fee():
+    state = JournaledState(WorldState({SENDER: 10_000}, {CONTRACT: {0: 1}}))
+    machine = Machine()
+    # runs out of gas after the first store
+    transaction = make_transaction(SENDER, CONTRACT, INCREMENT, gas=40)
+    with pytest.raises(Exception, match="out of gas"):
+        machine.execute_transaction(transaction, state)
+    assert state.changes == {SENDER: 10_000 - 40}
+    assert state.load(CONTRACT, 0) == 1
+    assert state.checkpoints == [] and state.journal == []
+
+
+def test_machine_without_a_state_runs_on_its_own_balance_and_storage():
+    machine = Machine(balance=10_000)
+    machine.storage[0] = 1
+    machine.execute_transaction(make_transaction(SENDER, CONTRACT, INCREMENT))
+    assert machine.balance == 10_000 - 1_000 - 5
+    assert machine.storage == {0: 2, 1: 7}
+
+    with pytest.raises(Exception, match="out of gas"):
+        machine.execute_transaction(
+            make_transaction(SENDER, CONTRACT, INCREMENT, gas=40)
+        )
+    assert machine.balance == 10_000 - 1_000 - 5 - 40
+    assert machine.storage == {0: 2, 1: 7}
+
+    with pytest.raises(Exception, match="insufficient balance"):
+        Machine(balance=10).execute_transaction(
+            make_transaction(SENDER, CONTRACT, INCREMENT)
+        )
+
+
+def test_machine_failure_reverts_to_enclosing_checkpoint_only():
+    state = JournaledState(WorldState({SENDER: 10_000}))
+    outer = state.checkpoint()
+    state.store(CONTRACT, 3, 3)
+    with pytest.raises(Exception):
+        Machine().execute_transaction(
+            make_transaction(SENDER, CONTRACT, INCREMENT, gas=40), state
+        )
+    assert state.load(CONTRACT, 3) == 3
+    state.revert(outer)
+    assert state.changes == {}
+
+
+def test_insufficient_balance_changes_nothing():
+    state = WorldState({SENDER: 100})
+    result = execute_transaction(state, make_transaction(SENDER, CONTRACT, INCREMENT))
+    assert not result.success
+    assert result.writes == {} and result.gas_used == 0
+
+
+def random_block(rng: random.Random, count: int) -> tuple[dict, dict, list]:
+    balances = {bytes([1, i]) * 10: 10**6 for i in range(count)}
+    contracts = [bytes([2, i]) * 10 for i in range(4)]
+    storage = {contract: {0: i} for i, contract in enumerate(contracts)}
+    transactions = [
+        make_transaction(
+            sender,
+            rng.choice(contracts),
+            INCREMENT,
+            gas=rng.choice([40, 1_000]),
+            value=rng.randrange(10),
+        )
+        for sender in balances
+    ]
+    return balances, storage, transactions
+
+
+def persistent_state(path: str, balances: dict, storage: dict) -> PersistentState:
+    # half the state is in the database and half still in memory
+    state = PersistentState(Database(path))
+    writes = dict(balances)
+    writes.update(
+        ((address, key), value)
+        for address, slots in storage.items()
+        for key, value in slots.items()
+    )
+    locations = list(writes)
+    state.apply({location: writes[location] for location in locations[::2]})
+    with state.db.write_batch() as batch:  # type: ignore
+        state.flush(batch)
+    state.apply({location: writes[location] for location in locations[1::2]})
+    return state
+
+
+@pytest.mark.parametrize("pool", [ThreadPoolExecutor, ProcessPoolExecutor])
+def test_parallel_block_on_persistent_state(tmp_path, pool):
+    balances, storage, transactions = random_block(random.Random(24), 80)
+    copied = {address: dict(slots) for address, slots in storage.items()}
+    expected_state = WorldState(dict(balances), copied)
+    expected = execute_sequential(expected_state, transactions)
+
+    state = persistent_state(str(tmp_path / "state.db"), balances, storage)
+    with pool(2) as executor:
+        result = execute_block(state, transactions, executor=executor)
+    # the second chunk ran speculatively and conflicted with the first
+    assert result.reexecuted > 0
+    assert [(r.success, r.gas_used, r.writes) for r in result.results] == [
+        (r.success, r.gas_used, r.writes) for r in expected.results
+    ]
+    for address, balance in expected_state.balances.items():
+        assert state.balance(address) == balance
+    for address, slots in expected_state.storage.items():
+        for key, value in slots.items():
+            assert state.load(address, key) == value
+
+
+def test_subset_reads_only_what_is_touched(tmp_path):
+    state = PersistentState(Database(str(tmp_path / "state.db")))
+    state.apply({(CONTRACT, key): key for key in range(1_000)})
+    with state.db.write_batch() as batch:  # type: ignore
+        state.flush(batch)
+    state.apply({(CONTRACT, 5): 50, SENDER: 10})
+
+    subset = state.subset([make_transaction(SENDER, CONTRACT, b"")])
+    assert subset.overlay == {(CONTRACT, 5): 50, SENDER: 10}
+    assert subset.load(CONTRACT, 999) == 999
+    assert subset.load(CONTRACT, 5) == 50
+    assert subset.balance(CONTRACT) == 0
+
+    copy = pickle.loads(pickle.dumps(subset))
+    assert copy.load(CONTRACT, 7) == 7
+    assert copy.balance(SENDER) == 10
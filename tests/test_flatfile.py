@@ -0,0 +1,201 @@
+import os
+
+from pynim.blockstore import BlockStore
+from pynim.blocktree import BlockTree, heaviest_chain
+from pynim.chainstore import ChainStore
+from pynim.consensus import ConsensusEngine
+from pynim.database import NS_BLOCKS, Database, WriteBatch
+from pynim.datatypes import Block, Header
+from pynim.flatfile import SEGMENT_FILE, FlatFileBlockStore
+
+
+def body(height: int) -> bytes:
+    return bytes([height % 256]) * 40
+
+
+def block_hash(height: int) -> bytes:
+    return height.to_bytes(32, "big")
+
+
+def test_rollover_ignores_leftovers_in_the_next_segment(tmp_path):
+    directory = str(tmp_path)
+    store = FlatFileBlockStore(directory, segment_size=100)
+    for height in range(2):
+        store.append(height, block_hash(height), body(height))
+    # a crashed run wrote into the next segment without indexing it
+    with open(os.path.join(directory, SEGMENT_FILE.format(1)), "wb") as f:
+        f.write(b"\xff" * 30)
+
+    for height in range(2, 6):
+        store.append(height, block_hash(height), body(height))
+    for height in range(6):
+        assert bytes(store.get_by_height(height)) == body(height)  # type: ignore
+    store.close()
+
+    reopened = FlatFileBlockStore(directory, segment_size=100)
+    for height in range(6):
+        assert bytes(reopened.get_by_height(height)) == body(height)  # type: ignore
+    reopened.close()
+
+
+def test_truncate_drops_records_and_later_segments(tmp_path):
+    directory = str(tmp_path)
+    store = FlatFileBlockStore(directory, segment_size=100)
+    for height in range(10, 17):
+        store.append(height, block_hash(height), body(height))
+    store.truncate(3)
+    assert len(store) == 3 and store.next_height == 13
+    assert store.get_by_height(13) is None
+    assert store.height_of(block_hash(15)) is None
+    assert not os.path.exists(os.path.join(directory, SEGMENT_FILE.format(3)))
+
+    store.append(13, block_hash(13), b"new")
+    store.close()
+    reopened = FlatFileBlockStore(directory, segment_size=100)
+    assert bytes(reopened.get_by_height(13)) == b"new"  # type: ignore
+    assert bytes(reopened.get_by_height(12)) == body(12)  # type: ignore
+    reopened.close()
+
+
+def make_blocks(count: int) -> list[Block]:
+    blocks = []
+    parent_hash = b"\x00" * 32
+    for number in range(count):
+        block = Block(Header(number, parent_hash, number, 0, 0, 0), [], None)
+        blocks.append(block)
+        parent_hash = block.hash()
+    return blocks
+
+
+def test_open_cuts_bodies_whose_batch_never_committed(tmp_path):
+    path = str(tmp_path / "chain.db")
+    directory = str(tmp_path / "blocks")
+    blocks = make_blocks(6)
+    store = BlockStore(Database(path), bodies=FlatFileBlockStore(directory))
+    with store.db.write_batch() as batch:
+        for block in blocks[:4]:
+            store.put_block(block, batch)
+    # the process dies before this batch is applied
+    lost = WriteBatch()
+    for block in blocks[4:]:
+        store.put_block(block, lost)
+    store.bodies.close()  # type: ignore
+    store.db.close()
+
+    store = BlockStore(Database(path), bodies=FlatFileBlockStore(directory))
+    assert store.bodies.next_height == 4  # type: ignore
+    for block in blocks[:4]:
+        assert store.get_block(block.hash()).hash() == block.hash()  # type: ignore
+    assert store.get_block(blocks[4].hash()) is None
+
+    # the lost blocks take their heights in the flat files again
+    with store.db.write_batch() as batch:
+        for block in blocks[4:]:
+            store.put_block(block, batch)
+    assert store.bodies.next_height == 6  # type: ignore
+    assert store.db.read(blocks[5].hash(), NS_BLOCKS) is None
+
+
+def child(parent: Block, weight: int, salt: int = 0) -> Block:
+    header = Header(
+        parent.header.timestamp + 1,
+        parent.hash(),
+        parent.header.number + 1,
+        salt,
+        weight,
+        0,
+    )
+    return Block(header, [], None)
+
+
+def test_only_canonical_bodies_enter_the_flat_files(tmp_path):
+    store = BlockStore(
+        Database(str(tmp_path / "chain.db")),
+        bodies=FlatFileBlockStore(str(tmp_path / "blocks")),
+    )
+    validator = b"\x0a" * 20
+    engine = ConsensusEngine(
+        0, {validator: 1}, [validator], store, BlockTree(heaviest_chain)
+    )
+    genesis = Block(Header(0, b"\x00" * 32, 0, 0, 1, 0), [], None)
+    a1 = child(genesis, 5)
+    # a light fork reaches the next flat-file height before the canonical
+    # chain does
+    b1 = child(genesis, 1, salt=1)
+    b2 = child(b1, 1, salt=1)
+    a2 = child(a1, 1)
+    for block in (genesis, a1, b1, b2, a2):
+        assert engine.apply_block(block)
+    bodies = store.bodies
+    assert [bodies.hash_at(n) for n in range(3)] == [  # type: ignore
+        genesis.hash(),
+        a1.hash(),
+        a2.hash(),
+    ]
+    for block in (b1, b2):
+        assert store.db.read(block.hash(), NS_BLOCKS) == block.serialize()
+    for block in (genesis, a1, a2):
+        assert store.db.read(block.hash(), NS_BLOCKS) is None
+        assert bytes(store.get_block_bytes(block.hash())) == block.serialize()
+
+    # after a reorg the new branch extends the files where it can
+    b3 = child(b2, 5, salt=1)
+    b4 = child(b3, 1, salt=1)
+    for block in (b3, b4):
+        assert engine.apply_block(block)
+    assert engine.block_tree.head == b4.hash()
+    assert bodies.hash_at(3) == b3.hash()  # type: ignore
+    assert bodies.hash_at(4) == b4.hash()  # type: ignore
+    for block in (genesis, a1, a2, b1, b2, b3, b4):
+        assert bytes(store.get_block_bytes(block.hash())) == block.serialize()
+
+
+def segments(directory: str) -> list[str]:
+    return sorted(name for name in os.listdir(directory) if name.endswith(".dat"))
+
+
+def test_pruned_segments_go_only_after_the_batch_commits(tmp_path):
+    path = str(tmp_path / "chain.db")
+    directory = str(tmp_path / "blocks")
+
+    def open_store() -> ChainStore:
+        return ChainStore(
+            Database(path), bodies=FlatFileBlockStore(directory, segment_size=100)
+        )
+
+    store = open_store()
+    blocks = make_blocks(12)
+    for block in blocks:
+        store.put_block(block)
+    store.set_head(blocks[-1].hash())
+    before = segments(directory)
+    assert len(before) > 2
+
+    # the process dies before the prune's batch is applied
+    store.prune_history(8, WriteBatch())
+    assert segments(directory) == before
+    store.close()
+    store = open_store()
+    assert store.pruned_below == 0
+    for block in blocks:
+        assert bytes(store.get_block_bytes(block.hash())) == block.serialize()
+
+    # the batch commits, but the process dies before the segments go
+    with store.db.write_batch() as batch:
+        store.prune_history(8, batch)
+    assert segments(directory) == before
+    store.close()
+    store = open_store()
+    assert store.pruned_below == 8
+    after = segments(directory)
+    assert after and set(after) < set(before)
+    for block in blocks[8:]:
+        assert bytes(store.get_block_bytes(block.hash())) == block.serialize()
+
+    with store.db.write_batch() as batch:
+        store.prune_history(10, batch)
+    assert store.pruned_below == 8
+    store.finish_pruning()
+    assert store.pruned_below == 10
+    assert set(segments(directory)) <= set(after)
+    store.close()
@@ -0,0 +1,95 @@
+import os
+import time
+
+from pynim.datatypes import Transaction
+from pynim.journal import JOURNAL_FILE, TransactionJournal
+from pynim.transaction_pool import ShardedTransactionPool, TransactionPool
+
+
+def make_transaction(sender: int, nonce: int, timestamp: int = 0) -> Transaction:
+    return Transaction(
+        timestamp or int(time.time()),
+        None,
+        nonce,
+        b"\xee" * 20,
+        bytes([sender + 1]) * 20,
+        1,
+        None,
+        None,
+        21_000,
+        10 + nonce,
+    )
+
+
+def pooled(pool) -> set[bytes]:
+    return {transaction.hash for transaction in pool.get_all()}
+
+
+def test_restore_replays_adds_and_removes(tmp_path):
+    path = str(tmp_path / JOURNAL_FILE)
+    pool = TransactionPool(journal=TransactionJournal(path))
+    transactions = [make_transaction(s, n) for s in range(3) for n in range(4)]
+    for transaction in transactions:
+        pool.add(transaction)
+    pool.remove(transactions[3].hash)
+    pool.journal.close()  # type: ignore
+
+    # the first sender's transactions were mined while the node was down
+    mined = {transaction.hash for transaction in transactions[:2]}
+    restored = TransactionPool(journal=TransactionJournal(path))
+    count = restored.restore(lambda h: h in mined)
+    expected = {transaction.hash for transaction in transactions[4:]}
+    expected.add(transactions[2].hash)
+    assert count == len(expected)
+    assert pooled(restored) == expected
+    # the journal was rewritten with just the survivors
+    assert restored.journal.records == len(expected)  # type: ignore
+    restored.journal.close()  # type: ignore
+
+    again = TransactionPool(journal=TransactionJournal(path))
+    assert again.restore() == len(expected)
+    assert pooled(again) == expected
+
+
+def test_restore_drops_a_torn_record(tmp_path):
+    path = str(tmp_path / JOURNAL_FILE)
+    pool = TransactionPool(journal=TransactionJournal(path))
+    for nonce in range(3):
+        pool.add(make_transaction(0, nonce))
+    pool.journal.close()  # type: ignore
+    size = os.path.getsize(path)
+    with open(path, "r+b") as f:
+        f.truncate(size - 5)
+
+    restored = TransactionPool(journal=TransactionJournal(path))
+    assert restored.restore() == 2
+    assert [tx.nonce for tx in restored.get_pending()] == [0, 1]
+
+
+def test_restore_skips_expired_transactions(tmp_path):
+    path = str(tmp_path / JOURNAL_FILE)
+    journal = TransactionJournal(path)
+    journal.append_add(make_transaction(0, 0), time.time() - 7_200)
+    journal.append_add(make_transaction(1, 0), time.time())
+    journal.close()
+
+    restored = TransactionPool(ttl=3_600, journal=TransactionJournal(path))
+    assert restored.restore() == 1
+    assert [tx.sender for tx in restored.get_all()] == [bytes([2]) * 20]
+
+
+def test_sharded_restore_reroutes_after_shard_count_change(tmp_path):
+    journal_dir = str(tmp_path)
+    pool = ShardedTransactionPool(shards=8, journal_dir=journal_dir)
+    transactions = [make_transaction(s, n) for s in range(20) for n in range(2)]
+    for transaction in transactions:
+        pool.add(transaction)
+    for shard in pool.shards:
+        shard.journal.close()  # type: ignore
+
+    restored = ShardedTransactionPool(shards=3, journal_dir=journal_dir)
+    assert restored.restore() == len(transactions)
+    assert {tx.hash for tx in restored.get_pending()} == {
+        tx.hash for tx in transactions
+    }
+    assert len(os.listdir(journal_dir)) == 3
@@ -0,0 +1,109 @@
+import pickle
+import random
+
+import pytest
+
+from pynim import rlp
+from pynim.datatypes import Block, Header, Transaction
+from pynim.hashes import keccak256
+
+
+def reference_encode(item) -> bytes:
+    # the specification, written out without any fast paths
+    def prefix(length: int, offset: int) -> bytes:
+        if length <= 55:
+            return bytes([offset + length])
+        length_bytes = length.to_bytes((length.bit_length() + 7) // 8, "big")
+        return bytes([offset + 55 + len(length_bytes)]) + length_bytes
+
+    if isinstance(item, bytes):
+        if len(item) == 1 and item[0] < 0x80:
+            return item
+        return prefix(len(item), 0x80) + item
+    payload = b"".join(reference_encode(x) for x in item)
+    return prefix(len(payload), 0xC0) + payload
+
+
+def random_item(rng: random.Random, depth: int = 0):
+    if depth < 3 and rng.random() < 0.3:
+        return [random_item(rng, depth + 1) for _ in range(rng.randint(0, 6))]
+    size = rng.choice([0, 1, 1, 2, 20, 55, 56, 64, 255, 256, 1_100])
+    return bytes(rng.randrange(256) for _ in range(size))
+
+
+def test_encoding_matches_reference_and_round_trips():
+    rng = random.Random(7)
+    for _ in range(2_000):
+        item = random_item(rng)
+        encoded = rlp.encode(item)
+        assert encoded == reference_encode(item)
+        assert rlp.decode(encoded) == item
+        if isinstance(item, list):
+            spans = rlp.list_spans(encoded)
+            assert [rlp.decode(encoded[a:b]) for a, b in spans] == item
+
+
+@pytest.mark.parametrize(
+    "encoded",
+    [
+        bytes([0xC2, 0x81, 0x05]),  # single byte not encoded as itself
+        bytes([0xC3, 0xB8, 0x01, 0x00]),  # long form for a short string
+        bytes([0xC2, 0xB8, 0x40]),  # long string past the end of the list
+        bytes([0xC1, 0xB8]),  # length byte missing
+        bytes([0xC2, 0x83, 0x01]),  # short string past the end of the list
+    ],
+)
+def test_non_canonical_or_truncated_lists_are_rejected(encoded):
+    with pytest.raises(rlp.DecodingError):
+        rlp.decode(encoded)
+    with pytest.raises(rlp.DecodingError):
+        for a, b in rlp.list_spans(encoded):
+            rlp.decode(encoded[a:b])
+
+
+def make_block() -> Block:
+    header = Header(1_700_000_000, b"\x01" * 32, 5, 30_000_000, 42_000, 7)
+    transactions = [
+        Transaction(
+            1_700_000_000, None, i, b"\xee" * 20, b"\x11" * 20, 10**18, None,
+            b"\x07" * 64, 21_000, 10 + i,
+        )
+        for i in range(3)
+    ]
+    return Block(header, transactions, None)
+
+
+def test_decoded_transactions_hash_their_received_bytes():
+    encoded = make_block().serialize()
+
+    block = Block.deserialize(encoded)
+    assert block.serialize() == encoded
+    assert block.hash() == keccak256(rlp.split(encoded)[0])
+    raw_transactions = rlp.split(rlp.split(encoded)[1])
+    assert [t.hash for t in block.transactions] == [
+        keccak256(raw) for raw in raw_transactions
+    ]
+
+
+
+def test_hashes_cannot_be_handed_in_or_invalidated():
+    block = make_block()
+    transaction = block.transactions[0]
+    with pytest.raises(AttributeError):
+        block.transactions.append(transaction)  # type: ignore[attr-defined]
+
+    fields = (
+        transaction.nonce, transaction.recipient, transaction.sender,
+        transaction.value, transaction.input_data, transaction.signature,
+        transaction.gas, transaction.gas_price,
+    )
+    assert Transaction(transaction.timestamp, transaction.hash, *fields).hash
+    with pytest.raises(ValueError):
+        Transaction(transaction.timestamp, b"\x00" * 32, *fields)
+    with pytest.raises(ValueError):
+        Block(block.header, block.transactions, b"\x00" * 32)
+
+    # pickled hand-offs keep the hash without recomputing it
+    copy = pickle.loads(pickle.dumps(transaction))
+    assert copy._hash == transaction.hash
+    assert copy.serialize() == transaction.serialize()
@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from pynim.stake import StakeTree
+
+
+def validator(i: int) -> bytes:
+    return i.to_bytes(20, "big")
+
+
+def linear_find(stakes: dict[bytes, int], target: int) -> bytes:
+    # first validator, in insertion order, whose cumulative weight exceeds
+    # the target
+    cumulative = 0
+    for v, weight in stakes.items():
+        cumulative += weight
+        if cumulative > target:
+            return v
+    raise IndexError(target)
+
+
+def check(tree: StakeTree, stakes: dict[bytes, int]) -> None:
+    assert tree.total == sum(stakes.values())
+    assert list(tree) == list(stakes)
+    assert len(tree) == len(stakes)
+    for v, weight in stakes.items():
+        assert tree.weight(v) == weight
+    # both sides of every cumulative boundary, where off-by-ones would show
+    targets = set()
+    cumulative = 0
+    for weight in stakes.values():
+        cumulative += weight
+        targets.update((cumulative - 1, cumulative))
+    for target in sorted(t for t in targets if 0 <= t < tree.total):
+        assert tree.find(target) == linear_find(stakes, target)
+    with pytest.raises(IndexError):
+        tree.find(tree.total)
+    with pytest.raises(IndexError):
+        tree.find(-1)
+
+
+def test_find_matches_a_linear_scan_through_updates_and_removals():
+    rng = random.Random(17)
+    stakes = {validator(i): rng.choice([0, 0, 1, 5, 100]) for i in range(40)}
+    tree = StakeTree.from_weights(stakes.items())
+    check(tree, stakes)
+    compacted = False
+    next_id = 40
+    for _ in range(600):
+        op = rng.random()
+        if op < 0.35 or not stakes:
+            v = validator(next_id)
+            next_id += 1
+            weight = rng.choice([0, 1, 3, rng.randrange(1_000)])
+            tree.add(v, weight)
+            stakes[v] = weight
+        elif op < 0.7:
+            v = rng.choice(list(stakes))
+            weight = rng.choice([0, 2, rng.randrange(1_000)])
+            # adding a known validator updates it in place
+            (tree.add if op < 0.5 else tree.update)(v, weight)
+            stakes[v] = weight
+        else:
+            v = rng.choice(list(stakes))
+            slots = len(tree.slots)
+            tree.remove(v)
+            del stakes[v]
+            compacted = compacted or len(tree.slots) < slots
+        if stakes and tree.total:
+            check(tree, stakes)
+    assert compacted
+
+
+def test_removed_and_zero_weight_validators_are_never_found():
+    a, b, c, d = (validator(i) for i in range(4))
+    tree = StakeTree.from_weights([(a, 2), (b, 0), (c, 3), (d, 1)])
+    assert [tree.find(t) for t in range(6)] == [a, a, c, c, c, d]
+    tree.remove(c)
+    # the tombstone keeps its slot until a rebuild
+    assert len(tree.slots) == 4 and len(tree) == 3
+    assert [tree.find(t) for t in range(3)] == [a, a, d]
+    tree.remove(a)
+    assert tree.slots == [None, b, None, d]
+    assert tree.find(0) == d
+    # more than half the slots are tombstones, so the tree is rebuilt
+    tree.remove(b)
+    assert tree.slots == [d]
+    tree.add(c, 4)
+    assert [tree.find(t) for t in range(5)] == [d, c, c, c, c]
@@ -0,0 +1,209 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from pynim.account import Account
+from pynim.blockchain import Blockchain
+from pynim.chainstore import ChainStore
+from pynim.consensus import ConsensusEngine
+from pynim.database import NS_TX_INDEX
+from pynim.datatypes import Block, Header, Transaction
+from pynim.genesis import GenesisBlock
+from pynim.net.node import Node
+from pynim.net.peer import Peer
+from pynim.net.sync import (
+    GET_BODIES,
+    ChainSync,
+    SyncConfig,
+    SyncError,
+    _answer,
+    recv_frame,
+    send_frame,
+)
+from pynim.vm.machine import Machine
+
+GENESIS_TIME = 1_700_000_000
+SOURCE_BLOCKS = 10_000
+# far below what a local sync reaches, so only a pipeline stall trips it
+MIN_BLOCKS_PER_SECOND = 100
+ACCOUNT = Account(None, {}, public_key=b"\x01" * 32)
+
+
+def make_genesis() -> GenesisBlock:
+    return GenesisBlock(GENESIS_TIME, ACCOUNT, transactions=[])
+
+
+def build_source(datadir: str, blocks: int) -> list[Block]:
+    store = ChainStore.open(datadir)
+    parent: Block = make_genesis()
+    chain: list[Block] = []
+    with store.db.write_batch() as batch:
+        for i in range(blocks):
+            header = Header(
+                parent.header.timestamp + 1,
+                parent.hash(),
+                parent.header.number + 1,
+                30_000_000,
+                0,
+                1,
+            )
+            transactions = [
+                Transaction(
+                    GENESIS_TIME, None, i, b"\xee" * 20, bytes([s]) * 20, 1, None,
+                    b"\x07" * 64, 21_000, 10,
+                )
+                for s in range(1, 3)
+            ]
+            parent = Block(header, transactions, None)
+            store.put_block(parent, batch)
+            chain.append(parent)
+        store.set_head(parent.hash(), batch)
+    store.close()
+    return chain
+
+
+@pytest.fixture(scope="module")
+def source(tmp_path_factory) -> tuple[str, list[Block]]:
+    datadir = str(tmp_path_factory.mktemp("source"))
+    return datadir, build_source(datadir, SOURCE_BLOCKS)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve(datadir: str) -> Node:
+    node = Node("127.0.0.1", free_port(), ChainStore.open(datadir))
+    node.start()
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", node.port), timeout=1).close()
+            return node
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("node never started listening")
+
+
+def make_chain(datadir: str) -> Blockchain:
+    store = ChainStore.open(datadir)
+    consensus = ConsensusEngine(0, {ACCOUNT.address: 1}, [ACCOUNT.address], store)
+    return Blockchain(
+        "test", make_genesis(), None, store, store.db, [ACCOUNT], Machine(), consensus
+    )
+
+
+def dropping_peer(datadir: str, bodies_served: int) -> int:
+    # serves headers like any node but hangs up on the body request after
+    # the given number, as a peer that goes away mid-sync would
+    store = ChainStore.open(datadir)
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+
+    def handle(conn: socket.socket) -> None:
+        served = 0
+        buf = b""
+        with conn:
+            while True:
+                try:
+                    kind, payload, buf = recv_frame(conn, buf)
+                except OSError:
+                    return
+                if kind == GET_BODIES:
+                    if served == bodies_served:
+                        # lets the sync fill its window before it notices
+                        time.sleep(0.2)
+                        return
+                    served += 1
+                with store.lock:
+                    reply, data = _answer(store, kind, payload)
+                send_frame(conn, reply, data)
+
+    def accept() -> None:
+        while True:
+            conn, _ = server.accept()
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    return server.getsockname()[1]
+
+
+def sync_threads() -> list[threading.Thread]:
+    return [t for t in threading.enumerate() if t.name.startswith("sync-")]
+
+
+def test_sync_from_two_peers(source, tmp_path, record_property):
+    datadir, blocks = source
+    servers = [serve(datadir) for _ in range(2)]
+
+    chain = make_chain(str(tmp_path / "client"))
+    config = SyncConfig(header_batch=500, body_batch=32, max_in_flight=8)
+    client = Node("127.0.0.1", 0)
+    client.peers = [Peer("127.0.0.1", node.port) for node in servers]
+    stats = client.sync(chain, config)
+
+    record_property("blocks_per_second", round(stats.blocks_per_second))
+    assert stats.blocks == stats.headers == len(blocks)
+    assert stats.blocks_per_second > MIN_BLOCKS_PER_SECOND
+    store = chain.block_by_hash
+    assert chain.current_block.hash() == blocks[-1].hash()
+    assert store.head_hash == blocks[-1].hash()
+    for block in blocks:
+        assert store.get_block_hash(block.header.number) == block.hash()
+    for block in blocks[:: len(blocks) // 50]:
+        assert bytes(store.get_block_bytes(block.hash())) == block.serialize()
+        for transaction in block.transactions:
+            assert store.db.read(transaction.hash, NS_TX_INDEX) == block.hash()
+
+    # a synced chain has nothing left to fetch
+    assert client.sync(chain, config).blocks == 0
+    assert not sync_threads()
+    store.close()
+
+
+def test_sync_survives_a_peer_dropping(source, tmp_path):
+    datadir, blocks = source
+    peers = [
+        ("127.0.0.1", dropping_peer(datadir, 3)),
+        ("127.0.0.1", serve(datadir).port),
+    ]
+
+    chain = make_chain(str(tmp_path / "client"))
+    config = SyncConfig(header_batch=200, body_batch=16, max_in_flight=4)
+    stats = ChainSync(chain, peers, config).run()
+    assert stats.blocks == len(blocks)
+    assert chain.current_block.hash() == blocks[-1].hash()
+    assert not sync_threads()
+    chain.block_by_hash.close()
+
+
+def test_sync_stops_every_thread_when_all_peers_drop(source, tmp_path):
+    datadir, blocks = source
+    peers = [("127.0.0.1", dropping_peer(datadir, 2)) for _ in range(2)]
+
+    chain = make_chain(str(tmp_path / "client"))
+    # the header thread fills the window long before the bodies stop
+    config = SyncConfig(
+        header_batch=200, body_batch=16, max_in_flight=2, commit_batch=16
+    )
+    with pytest.raises(SyncError):
+        ChainSync(chain, peers, config).run()
+    assert not sync_threads()
+    # what was imported before the peers went away stays imported
+    base = chain.genesis_block.header.number
+    number = chain.current_block.header.number
+    assert base < number < blocks[-1].header.number
+    expected = blocks[number - base - 1].hash()
+    assert chain.block_by_hash.get_block_hash(number) == expected
+    chain.block_by_hash.close()
+
+
+def test_sync_without_reachable_peers(tmp_path):
+    chain = make_chain(str(tmp_path / "client"))
+    with pytest.raises(SyncError):
+        ChainSync(chain, [("127.0.0.1", free_port())]).run()
+    chain.block_by_hash.close()
@@ -0,0 +1,237 @@
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Optional
+
+import pytest
+
+from pynim.datatypes import Transaction
+from pynim.transaction_pool import (
+    EXPIRY_BUCKET_SECONDS,
+    ShardedTransactionPool,
+    TransactionPool,
+    TransactionPoolError,
+    _priority,
+)
+
+RECIPIENT = b"\xee" * 20
+
+
+def make_transaction(sender: bytes, nonce: int, gas_price: int) -> Transaction:
+    return Transaction(
+        int(time.time()), None, nonce, RECIPIENT, sender, 1, b"", b"", 21_000, gas_price
+    )
+
+
+def sender(i: int) -> bytes:
+    return bytes([i + 1]) * 20
+
+
+def summary(transactions: list[Transaction]) -> list[tuple[bytes, int, int]]:
+    return [(tx.sender, tx.nonce, tx.gas_price) for tx in transactions]
+
+
+def reference_pending(
+    transactions: list[Transaction], account_nonces: Optional[dict[bytes, int]]
+) -> list[Transaction]:
+    # greedy best-first: of every sender's next executable transaction,
+    # take the best one, until none are left
+    queues: dict[bytes, list[Transaction]] = {}
+    for tx in sorted(transactions, key=lambda tx: tx.nonce):
+        queues.setdefault(tx.sender, []).append(tx)
+    runs = {}
+    for account, queue in queues.items():
+        if account_nonces is None:
+            runs[account] = queue
+            continue
+        nonce = account_nonces.get(account, 0)
+        run = []
+        for tx in queue:
+            if tx.nonce == nonce:
+                run.append(tx)
+                nonce += 1
+        runs[account] = run
+    pending = []
+    while any(runs.values()):
+        account = min((a for a in runs if runs[a]), key=lambda a: _priority(runs[a][0]))
+        pending.append(runs[account].pop(0))
+    return pending
+
+
+def test_account_nonce_reranks_sender():
+    # A's pooled nonce 0 is already mined, so its next transaction pays 9
+    # and must come before B's, which pays 5
+    a, b = sender(0), sender(1)
+    pool = TransactionPool()
+    for tx in (make_transaction(a, 0, 1), make_transaction(a, 1, 9)):
+        pool.add(tx)
+    pool.add(make_transaction(b, 0, 5))
+    pending = pool.get_pending(account_nonces={a: 1, b: 0})
+    assert summary(pending) == [(a, 1, 9), (b, 0, 5)]
+
+
+@pytest.mark.parametrize("sharded", [False, True])
+def test_pending_order_matches_greedy_reference(sharded):
+    rng = random.Random(12)
+    for _ in range(200):
+        pool = ShardedTransactionPool(shards=4) if sharded else TransactionPool()
+        prices = rng.sample(range(1, 10_000), 60)
+        transactions = []
+        for i in range(rng.randint(1, 8)):
+            nonces = rng.sample(range(8), rng.randint(1, 6))
+            for nonce in nonces:
+                if not prices:
+                    break
+                transactions.append(make_transaction(sender(i), nonce, prices.pop()))
+        for tx in transactions:
+            pool.add(tx)
+
+        account_nonces = None
+        if rng.random() < 0.8:
+            account_nonces = {
+                sender(i): rng.randrange(4) for i in range(8) if rng.random() < 0.7
+            }
+        expected = reference_pending(transactions, account_nonces)
+        pending = pool.get_pending(account_nonces=account_nonces)
+        assert summary(pending) == summary(expected)
+        limit = rng.randint(1, 10)
+        limited = pool.get_pending(limit, account_nonces=account_nonces)
+        assert summary(limited) == summary(expected[:limit])
+
+
+def make_pool(sharded: bool, max_size: int):
+    if sharded:
+        return ShardedTransactionPool(shards=4, max_size=max_size)
+    return TransactionPool(max_size=max_size)
+
+
+@pytest.mark.parametrize("sharded", [False, True])
+def test_full_pool_evicts_cheapest_with_dependents(sharded):
+    a, b = sender(0), sender(1)
+    pool = make_pool(sharded, 4)
+    for nonce, price in enumerate((3, 50, 60)):
+        pool.add(make_transaction(a, nonce, price))
+    pool.add(make_transaction(b, 0, 10))
+
+    # a's nonce 0 is cheapest; nonces 1 and 2 cannot run without it
+    pool.add(make_transaction(b, 1, 20))
+    assert summary(pool.get_all()) == [(b, 0, 10), (b, 1, 20)]
+    assert pool.get_transactions_by_sender(a) == []
+    assert summary(pool.get_pending()) == [(b, 0, 10), (b, 1, 20)]
+
+
+@pytest.mark.parametrize("sharded", [False, True])
+def test_full_pool_rejects_cheaper_transaction(sharded):
+    pool = make_pool(sharded, 2)
+    pool.add(make_transaction(sender(0), 0, 10))
+    pool.add(make_transaction(sender(1), 0, 10))
+    with pytest.raises(TransactionPoolError):
+        pool.add(make_transaction(sender(2), 0, 10))
+    assert len(pool) == 2
+
+
+def test_sharded_capacity_does_not_depend_on_how_senders_spread():
+    pool = ShardedTransactionPool(shards=4, max_size=40)
+    # every sender lands in the same shard
+    senders = [s for s in map(sender, range(200)) if pool._index(s) == 0][:40]
+    for i, s in enumerate(senders):
+        pool.add(make_transaction(s, 0, 10 + i))
+    assert len(pool) == 40 == len(pool.shards[0].transactions)
+
+    # a full pool evicts the cheapest transaction, whichever shard has it
+    other = next(s for s in map(sender, range(200)) if pool._index(s) == 1)
+    pool.add(make_transaction(other, 0, 100))
+    assert len(pool) == 40
+    assert not pool.get_transactions_by_sender(senders[0])
+    with pytest.raises(TransactionPoolError):
+        pool.add(make_transaction(other, 1, 5))
+
+
+def test_sharded_pool_stays_bounded_under_concurrent_admission():
+    max_size = 300
+    pool = ShardedTransactionPool(shards=4, max_size=max_size)
+    errors: list[BaseException] = []
+    sizes: list[int] = []
+    done = threading.Event()
+
+    def admit(thread: int) -> None:
+        rng = random.Random(thread)
+        try:
+            for i in range(40):
+                account = bytes([thread + 1]) + i.to_bytes(19, "big")
+                batch = [
+                    make_transaction(account, nonce, rng.randrange(1, 1_000))
+                    for nonce in range(5)
+                ]
+                if i % 2:
+                    pool.add_batch(batch)
+                    continue
+                for transaction in batch:
+                    try:
+                        pool.add(transaction)
+                    except TransactionPoolError:
+                        pass
+        except BaseException as e:
+            errors.append(e)
+
+    def watch() -> None:
+        # a consistent count needs every shard locked, as get_pending does
+        while not done.is_set():
+            for lock in pool.locks:
+                lock.acquire()
+            sizes.append(pool.size())
+            for lock in pool.locks:
+                lock.release()
+            pool.get_pending(limit=10)
+
+    threads = [threading.Thread(target=admit, args=(t,)) for t in range(8)]
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done.set()
+    watcher.join()
+
+    assert not errors
+    assert sizes and max(sizes) <= max_size
+    # an eviction takes the evicted sender's later nonces along, up to five
+    # here, and the pool stays short if what follows is too cheap to admit
+    assert max_size - 5 <= len(pool) <= max_size
+    for shard in pool.shards:
+        queued = sum(len(q) for q in shard.transactions_by_sender.values())
+        assert queued == len(shard.transactions) == len(shard.transaction_hashes)
+    assert {tx.hash for tx in pool.get_all()} == {
+        h for shard in pool.shards for h in shard.transactions
+    }
+
+
+def test_expiry_is_never_early_and_at_most_one_slot_late(monkeypatch):
+    width = EXPIRY_BUCKET_SECONDS
+    ttl = 5 * width
+    # a slot boundary, so arrivals land at both ends of one slot
+    base = int(time.time()) // width * width
+    clock = SimpleNamespace(time=lambda: base)
+    monkeypatch.setattr("pynim.transaction_pool.time", clock)
+
+    pool = TransactionPool(ttl=ttl)
+    arrivals = {}
+    for i, offset in enumerate([0, width - 1, width, 2 * width + 3]):
+        transaction = make_transaction(sender(i), 0, 1)
+        pool.add(transaction, arrival=base + offset)
+        arrivals[transaction.hash] = base + offset
+
+    # every admission runs expiry, so probes advance the clock second by
+    # second across several slot boundaries
+    for step in range(1, ttl + 4 * width):
+        now = base + step
+        clock.time = lambda: now
+        pool.add(make_transaction(sender(100 + step % 100), step, 1))
+        for h, arrival in arrivals.items():
+            if pool.contains(h):
+                assert now < arrival + ttl + width
+            else:
+                assert now >= arrival + ttl
+    assert not any(pool.contains(h) for h in arrivals)
@@ -0,0 +1,134 @@
+import random
+
+import pytest
+
+from pynim.vm.machine import GAS_COST, Machine
+from pynim.vm.opcode import OP_ADD, OP_LOAD, OP_PUSH, OP_PUSH32, OP_STORE
+
+BLOCK_ENV = {"blockhash": 7, "timestamp": 8, "number": 9, "gaslimit": 10, "basefee": 11}
+
+
+def push32(byte: int = 1) -> list[int]:
+    # PUSH32 reads its data one byte past the opcode
+    return [OP_PUSH32] + [byte] * 33
+
+
+def random_program(rng: random.Random) -> bytes:
+    # half the programs open with a run of PUSH32s long enough to take the
+    # stack past the limit unchecked, so that the ops after it overflow
+    opcodes = list(GAS_COST) + [0x99]
+    code: list[int] = []
+    if rng.random() < 0.5:
+        for _ in range(rng.randint(240, 270)):
+            code += push32(rng.randrange(3))
+    for _ in range(rng.randint(0, 400)):
+        opcode = rng.choice(opcodes)
+        code.append(opcode)
+        if opcode == OP_PUSH and rng.random() < 0.98:
+            code.append(rng.choice([0, 1, 2, rng.randrange(256)]))
+        if opcode == OP_PUSH32 and rng.random() < 0.9:
+            code += [rng.randrange(3)] * 33
+    return bytes(code)
+
+
+def execute(code: bytes, gas: int, predecode: bool, stepwise: bool) -> tuple:
+    machine = Machine(3, 100, 2, dict(BLOCK_ENV), predecode=predecode)
+    machine.storage = {0: 1, 1: 2, 2: 3}
+    machine.load(code, gas)
+    error = None
+    try:
+        if stepwise:
+            while not machine.stopped and machine.pc < len(machine.code):
+                machine.step()
+        else:
+            machine.run()
+    except Exception as e:
+        error = (type(e), str(e))
+    return (
+        machine.stack,
+        machine.storage,
+        machine.gas,
+        machine.pc,
+        machine.stopped,
+        error,
+    )
+
+
+@pytest.mark.parametrize("opcode", [OP_LOAD, OP_ADD])
+def test_overflow_after_unchecked_pushes(opcode):
+    # 259 PUSH32s leave the stack past the limit; the op that follows must
+    # overflow in every mode
+    code = bytes(push32() * 259 + [opcode])
+    expected = execute(code, 10**6, predecode=False, stepwise=False)
+    assert expected[5] is not None and expected[5][0].__name__ == "StackOverflow"
+    assert execute(code, 10**6, predecode=True, stepwise=True) == expected
+
+
+def test_predecoded_steps_match_interpreter():
+    rng = random.Random(21)
+    for _ in range(3000):
+        code = random_program(rng)
+        gas = rng.choice([rng.randint(0, 3000), 10**9])
+        expected = execute(code, gas, predecode=False, stepwise=True)
+        assert execute(code, gas, predecode=True, stepwise=True) == expected, (
+            code.hex(),
+            gas,
+        )
+
+
+def test_program_cache_reuses_decoded_code():
+    code = bytes([OP_PUSH, 2, OP_PUSH, 3, OP_ADD, OP_PUSH, 0, OP_STORE])
+    first = Machine()
+    first.load(code, 1000)
+    first.run()
+    second = Machine()
+    second.load(bytes(code), 1000)
+    second.run()
+    assert first.program is second.program
+    assert second.storage == {0: 5}
+
+
+@pytest.mark.parametrize("opcode", [OP_LOAD, OP_ADD])
+def test_block_bounds_reject_overflow_after_unchecked_pushes(opcode):
+    code = bytes(push32() * 259 + [opcode])
+    expected = execute(code, 10**6, predecode=False, stepwise=False)
+    assert execute(code, 10**6, predecode=True, stepwise=False) == expected
+
+
+def test_block_execution_matches_interpreter():
+    # run() takes whole basic blocks at once when their gas and stack
+    # bounds allow it; failures must still land on the same instruction
+    rng = random.Random(22)
+    for _ in range(5000):
+        code = random_program(rng)
+        gas = rng.choice([rng.randint(0, 3000), 10**9])
+        expected = execute(code, gas, predecode=False, stepwise=False)
+        assert execute(code, gas, predecode=True, stepwise=False) == expected, (
+            code.hex(),
+            gas,
+        )
+
+
+def test_block_execution_resumes_after_single_steps():
+    # step() can leave pc in the middle of a block; run() must pick up
+    # from there op by op until the next block starts
+    rng = random.Random(23)
+    for _ in range(1000):
+        code = random_program(rng)
+        steps = rng.randint(0, 5)
+        results = []
+        for predecode in (False, True):
+            machine = Machine(3, 100, 2, dict(BLOCK_ENV), predecode=predecode)
+            machine.storage = {0: 1}
+            machine.load(code, 10**9)
+            error = None
+            try:
+                for _ in range(steps):
+                    if machine.stopped or machine.pc >= len(machine.code):
+                        break
+                    machine.step()
+                machine.run()
+            except Exception as e:
+                error = str(e)
+            results.append((machine.stack, machine.gas, machine.pc, error))
+        assert results[0] == results[1], code.hex()